@@ -5,69 +5,49 @@ Connects Blood Donors with Requestors
 Version 2.0 - Enhanced with Request-Donor Matching Flow
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
-from datetime import datetime, timedelta
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, session, jsonify
+from werkzeug.security import check_password_hash, generate_password_hash
+from datetime import datetime
+import hmac
 import uuid
-import json
 import os
-from functools import wraps
+import contextvars
+from functools import partial
+from itertools import islice
+
+from compatibility import group_bit, recipient_mask
+from donor_import import FORMATS, donor_validation_error, guess_format, import_donor_file
+from matching import today_number
+from request_memo import MemoizedRepository, init_app as init_request_memo, memoize
+from storage import ConflictError, get_repository
+from storage.base import CRITICAL_UNITS, INVENTORY_GROUPS
 
 app = Flask(__name__)
 app.secret_key = 'bloodsync-secret-key-2024-enhanced'
+init_request_memo(app)
+
+# ============== DATA STORAGE ==============
+
+# Donors, requestors, requests, assignments, donations and inventory.
+# Backend is chosen by BLOODSYNC_BACKEND (memory, sqlite or dynamodb).
+# Reads are memoized for the rest of the HTTP request, so helpers asking for
+# the same records share one scan or query; writes clear the memo.
+repo = MemoizedRepository(get_repository())
+
+# Available requests shown per page on the donor dashboard
+REQUESTS_PER_PAGE = 20
 
-# ============== DATA STORAGE (Local - Will be replaced with AWS later) ==============
-
-# Donors dictionary: {donor_id: donor_data}
-donors_db = {}
-
-# Requestors dictionary: {requestor_id: requestor_data}
-requestors_db = {}
-
-# Blood requests dictionary: {request_id: request_data}
-blood_requests_db = {}
-
-# Donations dictionary: {donation_id: donation_data}
-donations_db = {}
-
-# Donor-Request assignments: {assignment_id: assignment_data}
-donor_request_assignments = {}
-
-# Blood inventory by blood group
-blood_inventory = {
-    'A+': {'units': 50, 'donors': []},
-    'A-': {'units': 30, 'donors': []},
-    'B+': {'units': 45, 'donors': []},
-    'B-': {'units': 25, 'donors': []},
-    'AB+': {'units': 20, 'donors': []},
-    'AB-': {'units': 15, 'donors': []},
-    'O+': {'units': 60, 'donors': []},
-    'O-': {'units': 40, 'donors': []}
-}
-
-# ============== BLOOD COMPATIBILITY MATRIX ==============
-# Who can DONATE TO whom (Donor Blood Group -> Recipient Blood Groups)
-BLOOD_COMPATIBILITY = {
-    'A+': ['A+', 'AB+'],
-    'A-': ['A+', 'A-', 'AB+', 'AB-'],
-    'B+': ['B+', 'AB+'],
-    'B-': ['B+', 'B-', 'AB+', 'AB-'],
-    'AB+': ['AB+'],
-    'AB-': ['AB+', 'AB-'],
-    'O+': ['O+', 'A+', 'B+', 'AB+'],
-    'O-': ['O+', 'O-', 'A+', 'A-', 'B+', 'B-', 'AB+', 'AB-']  # Universal donor
-}
-
-# Who can RECEIVE FROM whom (Recipient Blood Group -> Donor Blood Groups)
-RECEIVE_COMPATIBILITY = {
-    'A+': ['A+', 'A-', 'O+', 'O-'],
-    'A-': ['A-', 'O-'],
-    'B+': ['B+', 'B-', 'O+', 'O-'],
-    'B-': ['B-', 'O-'],
-    'AB+': ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-'],  # Universal recipient
-    'AB-': ['A-', 'B-', 'AB-', 'O-'],
-    'O+': ['O+', 'O-'],
-    'O-': ['O-']
-}
+# Rows per table on the admin dashboard
+ADMIN_PAGE_SIZE = 50
+
+# Where each site account role lands after /login
+ROLE_PAGES = {'admin': 'admin_dashboard', 'donor': 'donor_login', 'requestor': 'requestor_login'}
+
+# Roles /register may assign; admin accounts are created by an operator, never self-registered
+SELF_REGISTER_ROLES = ('donor', 'requestor')
+
+# Donor attributes shown in the admin dashboard's donor table
+DONOR_SUMMARY_FIELDS = ('donor_id', 'name', 'blood_group', 'city', 'available')
 
 # ============== HELPER FUNCTIONS ==============
 
@@ -91,247 +71,232 @@ def generate_assignment_id():
     """Generate unique assignment ID"""
     return f"ASGN-{uuid.uuid4().hex[:8].upper()}"
 
-def get_compatible_donor_blood_groups(recipient_blood_group):
-    """
-    Get list of donor blood groups that can donate to recipient
-    Example: For A+ recipient, returns ['A+', 'A-', 'O+', 'O-']
-    """
-    return RECEIVE_COMPATIBILITY.get(recipient_blood_group, [])
-
-def get_compatible_donors(recipient_blood_group, location=None):
-    """
-    Find compatible donors who can donate to recipient's blood group
-    Returns list of compatible donors
-    """
-    compatible_blood_groups = get_compatible_donor_blood_groups(recipient_blood_group)
-    compatible_donors = []
-    
-    for donor_id, donor in donors_db.items():
-        if donor['blood_group'] in compatible_blood_groups:
-            if donor['available'] and donor['status'] == 'active':
-                # Check location if specified
-                if location:
-                    if (location.lower() in donor.get('city', '').lower() or 
-                        location.lower() in donor.get('state', '').lower()):
-                        compatible_donors.append(donor)
-                else:
-                    compatible_donors.append(donor)
-    
-    # Sort by last donation date (most recent first)
-    # Use a fallback string when value is None to avoid TypeError during comparison
-    compatible_donors.sort(key=lambda x: (x.get('last_donation') or '1900-01-01'), reverse=True)
-    return compatible_donors
-
-def can_donate(last_donation_date):
-    """Check if donor can donate (56 days gap required)"""
-    if not last_donation_date:
-        return True
-    try:
-        last = datetime.strptime(last_donation_date, '%Y-%m-%d')
-        return (datetime.now() - last).days >= 56
-    except:
-        return True
-
-def calculate_donor_eligibility(donor):
-    """Calculate donor eligibility score"""
-    score = 100
-    
-    # Age factor
-    age = donor.get('age', 0)
-    if 25 <= age <= 45:
-        score += 10
-    elif age < 18 or age > 65:
-        score -= 50
-    
-    # Availability
-    if not donor.get('available', True):
-        score -= 100
-    
-    # Last donation recency
-    last_donation = donor.get('last_donation')
-    if last_donation:
-        try:
-            days_since = (datetime.now() - datetime.strptime(last_donation, '%Y-%m-%d')).days
-            if days_since > 90:
-                score += 5
-        except:
-            pass
-    else:
-        score += 10  # New donor bonus
-    
-    # Donation history
-    total_donations = donor.get('total_donations', 0)
-    score += min(total_donations * 2, 20)
-    
-    return max(0, min(score, 150))
-
 def get_donor_assigned_requests(donor_id):
     """Get all requests assigned to a donor"""
+    assignments = [a for a in repo.assignments_for_donor(donor_id)
+                   if a['status'] in ['pending', 'accepted']]
+    requests = {r['request_id']: r for r in repo.get_requests(a['request_id'] for a in assignments)}
     assigned = []
-    for assignment in donor_request_assignments.values():
-        if assignment['donor_id'] == donor_id and assignment['status'] in ['pending', 'accepted']:
-            request_data = blood_requests_db.get(assignment['request_id'])
-            if request_data:
-                assigned.append({
-                    **assignment,
-                    'request': request_data
-                })
+    for assignment in assignments:
+        request_data = requests.get(assignment['request_id'])
+        if request_data:
+            assigned.append({
+                **assignment,
+                'request': request_data
+            })
     return assigned
 
 def get_request_assigned_donors(request_id):
     """Get all donors assigned to a request"""
+    assignments = repo.assignments_for_request(request_id)
+    donors = {d['donor_id']: d for d in repo.get_donors(a['donor_id'] for a in assignments)}
     assigned = []
-    for assignment in donor_request_assignments.values():
-        if assignment['request_id'] == request_id:
-            donor_data = donors_db.get(assignment['donor_id'])
-            if donor_data:
-                assigned.append({
-                    **assignment,
-                    'donor': donor_data
-                })
+    for assignment in assignments:
+        donor_data = donors.get(assignment['donor_id'])
+        if donor_data:
+            assigned.append({
+                **assignment,
+                'donor': donor_data
+            })
     return assigned
 
-def get_available_requests_for_donor(donor_id):
-    """Get all requests that this donor can fulfill"""
-    donor = donors_db.get(donor_id)
+def get_available_requests_for_donor(donor_id, offset=0, limit=None):
+    """
+    Get requests that this donor can fulfill, by urgency then date
+    offset/limit select one page of the feed
+    """
+    donor = repo.get_donor(donor_id)
     if not donor:
         return []
     
-    donor_blood_group = donor['blood_group']
-    # Get blood groups this donor can donate to
-    can_donate_to = BLOOD_COMPATIBILITY.get(donor_blood_group, [])
+    # Open (pending/partial) requests of the blood groups this donor can donate to,
+    # merged from the per-group priority queues
+    open_requests = repo.open_requests(recipient_mask(donor['blood_group']))
+    # Skip requests this donor is already assigned to
+    assigned_ids = {a['request_id'] for a in repo.assignments_for_donor(donor_id)}
+    unassigned = (r for r in open_requests if r['request_id'] not in assigned_ids)
+    stop = None if limit is None else offset + limit
     
     available_requests = []
-    for request_id, request_data in blood_requests_db.items():
-        # Check if request blood group is in the list this donor can donate to
-        if request_data['blood_group'] in can_donate_to:
-            # Check if request is still pending or partial
-            if request_data['status'] in ['pending', 'partial']:
-                # Check if this donor is not already assigned
-                already_assigned = any(
-                    a['donor_id'] == donor_id and a['request_id'] == request_id 
-                    for a in donor_request_assignments.values()
-                )
-                if not already_assigned:
-                    # Calculate remaining units needed
-                    remaining = request_data['units_needed'] - request_data.get('fulfilled_units', 0)
-                    available_requests.append({
-                        **request_data,
-                        'remaining_units': remaining
-                    })
-    
-    # Sort by urgency and date (guard against missing/None created_at)
-    urgency_order = {'critical': 0, 'high': 1, 'normal': 2}
-    available_requests.sort(key=lambda x: (urgency_order.get(x.get('urgency'), 2), x.get('created_at') or '1900-01-01'))
+    for request_data in islice(unassigned, offset, stop):
+        # Calculate remaining units needed
+        remaining = request_data['units_needed'] - request_data.get('fulfilled_units', 0)
+        available_requests.append({
+            **request_data,
+            'remaining_units': remaining
+        })
     
     return available_requests
 
-def get_matching_donors_for_request(request_id):
-    """Get donors who have accepted this request (for display)"""
-    matching = []
-    for assignment in donor_request_assignments.values():
-        if assignment['request_id'] == request_id and assignment['status'] in ['accepted', 'confirmed_by_requestor', 'completed']:
-            donor_data = donors_db.get(assignment['donor_id'])
-            if donor_data:
-                matching.append({
-                    'donor': donor_data,
-                    'assignment': assignment
-                })
-    return matching
-
 def check_matching_donors(blood_group):
     """Check if there are available donors for a blood group"""
-    compatible_blood_groups = RECEIVE_COMPATIBILITY.get(blood_group, [])
-    for donor_id, donor in donors_db.items():
-        if donor['blood_group'] in compatible_blood_groups and donor['available'] and donor['status'] == 'active':
-            if can_donate(donor.get('last_donation')):
-                return True
-    return False
-
-def match_blood_request(request_data):
+    return repo.has_eligible_donor(blood_group)
+
+def rank_blood_request(request_data):
+    """
+    Score every compatible, available donor for a request
+    Returns a RankedMatches; ranking happens lazily as pages are read
+    """
+    return repo.rank_donors(request_data['blood_group'], request_data.get('location', ''))
+
+def enrich_matches(matches):
+    """Turn (donor_id, match_score, can_donate_now) tuples into donor dicts"""
+    donors = {d['donor_id']: d for d in repo.get_donors(donor_id for donor_id, _, _ in matches)}
+    return [{
+        **donors[donor_id],
+        'match_score': score,
+        'can_donate_now': can_donate_now
+    } for donor_id, score, can_donate_now in matches]
+
+def iter_matching_donors(request_data, page_size=10):
+    """
+    Lazily yield matching donors for a request, best match first
+    Lets callers page past the top results without re-scoring; donors are
+    read a page at a time as the iterator advances
+    """
+    ranked = rank_blood_request(request_data)
+    for offset in range(0, len(ranked), page_size):
+        yield from enrich_matches(ranked.page(offset, page_size))
+
+@memoize
+def match_blood_request(request_data, limit=10, offset=0):
     """
     Blood matching algorithm
-    Finds best matching donors for a blood request
+    Finds the `limit` best matching donors for a blood request, from rank `offset`
     """
     blood_group = request_data['blood_group']
     units_needed = request_data['units_needed']
-    location = request_data.get('location', '')
     urgency = request_data.get('urgency', 'normal')
     
-    # Get compatible donors
-    compatible_donors = get_compatible_donors(blood_group, location)
-    
-    # Calculate eligibility scores
-    scored_donors = []
-    for donor in compatible_donors:
-        score = calculate_donor_eligibility(donor)
-        scored_donors.append({
-            **donor,
-            'match_score': score,
-            'can_donate_now': can_donate(donor.get('last_donation'))
-        })
-    
-    # Sort by match score
-    scored_donors.sort(key=lambda x: x['match_score'], reverse=True)
+    # Ranks offset .. offset+limit by score, then most recent donation, then
+    # registration order; only the returned donors are copied into enriched dicts
+    ranked = rank_blood_request(request_data)
+    scored_donors = enrich_matches(ranked.page(offset, limit))
     
     # Check inventory first for exact match
-    inventory_available = blood_inventory.get(blood_group, {}).get('units', 0)
+    inventory_available = repo.inventory_units(blood_group)
     
     # Calculate remaining units needed
     remaining_units = units_needed - request_data.get('fulfilled_units', 0)
     
     return {
         'exact_match_inventory': inventory_available,
-        'compatible_donors': scored_donors[:10],  # Top 10 matches
-        'total_compatible': len(scored_donors),
-        'fulfillable': inventory_available >= remaining_units or len(scored_donors) > 0,
+        'compatible_donors': scored_donors,  # Top matches
+        'total_compatible': len(ranked),
+        'fulfillable': inventory_available >= remaining_units or len(ranked) > 0,
         'remaining_units': remaining_units
     }
 
+def match_requests(requests, limit=10):
+    """
+    Top `limit` matching donors for each distinct (blood group, location) of requests
+    Returns {(blood_group, location): donor dicts}; each pair is ranked once
+    and all matched donors are read in one batch
+    """
+    keys = {(r['blood_group'], r.get('location', '')) for r in requests}
+    pages = {key: repo.rank_donors(*key).page(0, limit) for key in keys}
+    donors = {d['donor_id']: d for d in enrich_matches([m for page in pages.values() for m in page])}
+    return {key: [donors[donor_id] for donor_id, _, _ in page] for key, page in pages.items()}
+
+def build_request_history(requests):
+    """
+    Dashboard rows for a requestor's requests, newest first: each request with
+    its assigned donors, donation history, suggested donors and stock.
+    Assignments, donations, matches and stock are read once for all requests,
+    grouped by request ID, by (blood group, location) and by blood group.
+    """
+    request_ids = [r['request_id'] for r in requests]
+    results = fetch(
+        assignments=lambda: repo.assignments_for_requests(request_ids),
+        donations=lambda: repo.donations_for_requests(request_ids),
+        matches=lambda: match_requests(requests),
+        inventory=lambda: {bg: repo.inventory_units(bg) for bg in {r['blood_group'] for r in requests}},
+    )
+    assignments = results['assignments']
+    # Assigned donors that were also matched are already read
+    donors = {d['donor_id']: d for matches in results['matches'].values() for d in matches}
+    donors.update((d['donor_id'], d) for d in repo.get_donors(
+        {a['donor_id'] for request_id in request_ids for a in assignments[request_id]} - donors.keys()))
+
+    request_history = []
+    for req in requests:
+        assigned_donors = [{**a, 'donor': donors[a['donor_id']]}
+                           for a in assignments[req['request_id']] if a['donor_id'] in donors]
+        # Suggested compatible donors (exclude already assigned)
+        assigned_ids = {a['donor_id'] for a in assigned_donors}
+        matches = results['matches'][(req['blood_group'], req.get('location', ''))]
+        request_history.append({
+            **req,
+            'assigned_donors': assigned_donors,
+            'donation_history': results['donations'][req['request_id']],
+            'suggested_donors': [d for d in matches if d['donor_id'] not in assigned_ids],
+            'remaining_units': req['units_needed'] - req.get('fulfilled_units', 0),
+            'inventory_available': results['inventory'][req['blood_group']]
+        })
+
+    # Sort by date (guard against missing/None created_at)
+    request_history.sort(key=lambda x: (x.get('created_at') or ''), reverse=True)
+    return request_history
+
 def update_inventory(blood_group, units, operation='add'):
     """Update blood inventory"""
-    if blood_group in blood_inventory:
+    if blood_group in INVENTORY_GROUPS:
         if operation == 'add':
-            blood_inventory[blood_group]['units'] += units
+            repo.adjust_inventory(blood_group, units)
         elif operation == 'remove':
-            blood_inventory[blood_group]['units'] = max(0, blood_inventory[blood_group]['units'] - units)
+            repo.adjust_inventory(blood_group, -units)
 
-def get_statistics():
-    """Get dashboard statistics"""
-    total_donors = len(donors_db)
-    total_requestors = len(requestors_db)
-    total_requests = len(blood_requests_db)
-    
-    active_requests = sum(1 for r in blood_requests_db.values() if r['status'] in ['pending', 'partial'])
-    fulfilled_requests = sum(1 for r in blood_requests_db.values() if r['status'] == 'fulfilled')
-    
-    total_units_available = sum(inv['units'] for inv in blood_inventory.values())
+def fetch(**reads):
+    """
+    Run independent zero-argument reads and return {name: result}.
+    On remote backends they run concurrently (see Repository.gather), each
+    in a copy of the current context so it can still use flask.g and request.
+    """
+    names = list(reads)
+    calls = [partial(contextvars.copy_context().run, reads[name]) for name in names]
+    return dict(zip(names, repo.gather(calls)))
+
+def statistics_reads():
+    """Reads behind get_statistics(), for pages that fetch them along with their own"""
+    return {
+        'total_donors': repo.count_donors,
+        'total_requestors': repo.count_requestors,
+        'total_requests': repo.count_requests,
+        'active_requests': lambda: repo.count_requests_by_status('pending', 'partial'),
+        'fulfilled_requests': lambda: repo.count_requests_by_status('fulfilled'),
+        'inventory': repo.get_inventory,
+    }
+
+def build_statistics(results):
+    """Dashboard statistics from the results of statistics_reads()"""
+    inventory = results['inventory']
+    total_units_available = sum(stock['units'] for stock in inventory.values())
     
     # Critical blood groups (less than 20 units)
-    critical_groups = [bg for bg, inv in blood_inventory.items() if inv['units'] < 20]
+    critical_groups = [bg for bg, stock in inventory.items() if stock['units'] < CRITICAL_UNITS]
     
     return {
-        'total_donors': total_donors,
-        'total_requestors': total_requestors,
-        'total_requests': total_requests,
-        'active_requests': active_requests,
-        'fulfilled_requests': fulfilled_requests,
+        'total_donors': results['total_donors'],
+        'total_requestors': results['total_requestors'],
+        'total_requests': results['total_requests'],
+        'active_requests': results['active_requests'],
+        'fulfilled_requests': results['fulfilled_requests'],
         'total_units': total_units_available,
         'critical_groups': critical_groups,
-        'inventory': blood_inventory
+        'inventory': inventory
     }
 
+def get_statistics():
+    """Get dashboard statistics (counters are maintained by the backend on each write)"""
+    return build_statistics(fetch(**statistics_reads()))
+
 # ============== ROUTES ==============
 
 @app.route('/')
 def home():
     """Home page"""
     stats = get_statistics()
-    recent_requests = sorted(
-        blood_requests_db.values(), 
-        key=lambda x: (x.get('created_at') or ''), 
-        reverse=True
-    )[:5]
+    recent_requests = repo.recent_requests(5)
     return render_template('index.html', stats=stats, recent_requests=recent_requests)
 
 @app.route('/about')
@@ -370,20 +335,16 @@ def donor_register():
             'preferred_contact_time': request.form.get('preferred_contact_time', 'Anytime')
         }
         
-        # Validate age
-        if donor_data['age'] < 18 or donor_data['age'] > 65:
-            flash('Donor age must be between 18 and 65 years!', 'error')
-            return redirect(url_for('donor_register'))
-        
-        # Validate weight
-        if donor_data['weight'] < 50:
-            flash('Donor weight must be at least 50kg!', 'error')
+        # Validate age and weight
+        error = donor_validation_error(donor_data)
+        if error:
+            flash(error, 'error')
             return redirect(url_for('donor_register'))
         
-        donors_db[donor_id] = donor_data
+        repo.put_donor(donor_data)
         
         # Update inventory donor list
-        blood_inventory[donor_data['blood_group']]['donors'].append(donor_id)
+        repo.add_inventory_donor(donor_data['blood_group'], donor_id)
         
         flash(f'Registration successful! Your Donor ID is: {donor_id}', 'success')
         return redirect(url_for('donor_dashboard', donor_id=donor_id))
@@ -393,28 +354,37 @@ def donor_register():
 @app.route('/donor/dashboard/<donor_id>')
 def donor_dashboard(donor_id):
     """Donor dashboard"""
-    donor = donors_db.get(donor_id)
+    donor = repo.get_donor(donor_id)
     if not donor:
         flash('Donor not found!', 'error')
         return redirect(url_for('home'))
     
-    # Get donation history
-    donation_history = [d for d in donations_db.values() if d['donor_id'] == donor_id]
-    
-    # Check eligibility
-    can_donate_now = can_donate(donor.get('last_donation'))
-    
-    # Get assigned requests
-    assigned_requests = get_donor_assigned_requests(donor_id)
-    
-    # Get available requests for this donor
-    available_requests = get_available_requests_for_donor(donor_id)
+    page = max(request.args.get('page', 1, type=int), 1)
+    results = fetch(
+        # Donation history
+        donation_history=lambda: repo.donations_for_donor(donor_id),
+        # Eligibility (cached per donor for the day)
+        can_donate_now=lambda: repo.donor_eligibility(donor_id, donor).can_donate_now,
+        # Assigned requests
+        assigned_requests=lambda: get_donor_assigned_requests(donor_id),
+        # One page of available requests for this donor (one extra to detect a next page)
+        available_requests=lambda: get_available_requests_for_donor(
+            donor_id, offset=(page - 1) * REQUESTS_PER_PAGE, limit=REQUESTS_PER_PAGE + 1),
+    )
+    donation_history = results['donation_history']
+    can_donate_now = results['can_donate_now']
+    assigned_requests = results['assigned_requests']
+    available_requests = results['available_requests']
+    has_more_requests = len(available_requests) > REQUESTS_PER_PAGE
+    available_requests = available_requests[:REQUESTS_PER_PAGE]
     
     return render_template('donor_dashboard.html', donor=donor, 
                           donation_history=donation_history, 
                           can_donate_now=can_donate_now,
                           assigned_requests=assigned_requests,
-                          available_requests=available_requests)
+                          available_requests=available_requests,
+                          page=page,
+                          has_more_requests=has_more_requests)
 
 @app.route('/donor/login', methods=['GET', 'POST'])
 def donor_login():
@@ -423,8 +393,9 @@ def donor_login():
         donor_id = request.form['donor_id']
         email = request.form['email']
         
-        donor = donors_db.get(donor_id)
-        if donor and donor['email'] == email:
+        donor = repo.get_donor(donor_id)
+        # Donors from the old AWS app have no email and can't log in this way
+        if donor and email and donor.get('email') == email:
             session['donor_id'] = donor_id
             flash('Login successful!', 'success')
             return redirect(url_for('donor_dashboard', donor_id=donor_id))
@@ -436,16 +407,24 @@ def donor_login():
 @app.route('/donor/update/<donor_id>', methods=['POST'])
 def donor_update(donor_id):
     """Update donor information"""
-    donor = donors_db.get(donor_id)
+    donor = repo.get_donor(donor_id)
     if not donor:
         flash('Donor not found!', 'error')
         return redirect(url_for('home'))
     
+    # Edit a copy; it is written only if no donation was recorded meanwhile
+    seen_donations = donor.get('total_donations', 0)
+    donor = dict(donor)
     donor['phone'] = request.form.get('phone', donor['phone'])
     donor['address'] = request.form.get('address', donor['address'])
     donor['available'] = request.form.get('available') == 'on'
     donor['city'] = request.form.get('city', donor['city'])
     donor['state'] = request.form.get('state', donor['state'])
+    try:
+        repo.put_donor(donor, donor_donations=seen_donations)
+    except ConflictError:
+        flash('✗ Your profile changed meanwhile. Please try again.', 'error')
+        return redirect(url_for('donor_dashboard', donor_id=donor_id))
     
     flash('Profile updated successfully!', 'success')
     return redirect(url_for('donor_dashboard', donor_id=donor_id))
@@ -453,19 +432,15 @@ def donor_update(donor_id):
 @app.route('/donor/donate/<donor_id>', methods=['POST'])
 def record_donation(donor_id):
     """Record a new donation to inventory"""
-    donor = donors_db.get(donor_id)
+    donor = repo.get_donor(donor_id)
     if not donor:
         flash('✗ Donor not found!', 'error')
         return redirect(url_for('home'))
     
-    if not can_donate(donor.get('last_donation')):
-        last_donation = donor.get('last_donation', '1900-01-01')
-        try:
-            days_passed = (datetime.now() - datetime.strptime(last_donation, '%Y-%m-%d')).days
-            days_remaining = max(0, 56 - days_passed)
-            flash(f'✗ You must wait {days_remaining} more days before donating again!', 'error')
-        except:
-            flash('✗ You must wait 56 days between donations!', 'error')
+    eligibility = repo.donor_eligibility(donor_id, donor)
+    if not eligibility.can_donate_now:
+        days_remaining = max(0, eligibility.next_eligible_day - today_number())
+        flash(f'✗ You must wait {days_remaining} more days before donating again!', 'error')
         return redirect(url_for('donor_dashboard', donor_id=donor_id))
     
     try:
@@ -494,11 +469,18 @@ def record_donation(donor_id):
         'status': 'completed'
     }
     
-    donations_db[donation_id] = donation_data
-    
-    # Update donor record
+    # Update donor record (a copy, written only if no other donation was recorded meanwhile)
+    seen_donations = donor.get('total_donations', 0)
+    donor = dict(donor)
     donor['last_donation'] = datetime.now().strftime('%Y-%m-%d')
-    donor['total_donations'] += 1
+    donor['total_donations'] = seen_donations + 1
+    try:
+        repo.put_donor(donor, donor_donations=seen_donations)
+    except ConflictError:
+        flash('✗ Another donation was recorded meanwhile. Please try again.', 'error')
+        return redirect(url_for('donor_dashboard', donor_id=donor_id))
+    
+    repo.put_donation(donation_data)
     
     # Update inventory
     update_inventory(donor['blood_group'], units, 'add')
@@ -511,8 +493,8 @@ def record_donation(donor_id):
 @app.route('/donor/accept-request/<donor_id>/<request_id>', methods=['POST'])
 def donor_accept_request(donor_id, request_id):
     """Donor accepts a blood request"""
-    donor = donors_db.get(donor_id)
-    request_data = blood_requests_db.get(request_id)
+    donor = repo.get_donor(donor_id)
+    request_data = repo.get_request(request_id)
     
     if not donor or not request_data:
         flash('Invalid donor or request!', 'error')
@@ -533,7 +515,7 @@ def donor_accept_request(donor_id, request_id):
         'notes': request.form.get('notes', '')
     }
     
-    donor_request_assignments[assignment_id] = assignment_data
+    repo.put_assignment(assignment_data)
     
     flash(f'You have accepted the request! Assignment ID: {assignment_id}', 'success')
     return redirect(url_for('donor_dashboard', donor_id=donor_id))
@@ -541,7 +523,7 @@ def donor_accept_request(donor_id, request_id):
 @app.route('/donor/confirm-donation/<assignment_id>', methods=['POST'])
 def donor_confirm_donation(assignment_id):
     """Donor confirms they have donated for an assigned request"""
-    assignment = donor_request_assignments.get(assignment_id)
+    assignment = repo.get_assignment(assignment_id)
     if not assignment:
         flash('✗ Assignment not found!', 'error')
         return redirect(url_for('home'))
@@ -553,8 +535,7 @@ def donor_confirm_donation(assignment_id):
     donor_id = assignment['donor_id']
     request_id = assignment['request_id']
     
-    donor = donors_db.get(donor_id)
-    request_data = blood_requests_db.get(request_id)
+    donor, request_data = repo.get_donor_and_request(donor_id, request_id)
     
     if not donor or not request_data:
         flash('✗ Invalid data!', 'error')
@@ -569,13 +550,20 @@ def donor_confirm_donation(assignment_id):
         flash('✗ Units must be a valid number!', 'error')
         return redirect(url_for('donor_dashboard', donor_id=donor_id))
     
-    # Update assignment
+    # The confirmation is written only if these are still current (no double confirmation)
+    seen_status = assignment['status']
+    seen_fulfilled = request_data.get('fulfilled_units', 0)
+    seen_donations = donor.get('total_donations', 0)
+    
+    # Update assignment (changes go to copies until the confirmation is written)
+    assignment = dict(assignment)
     assignment['status'] = 'completed'
     assignment['units_donated'] = units_donated
     assignment['donated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
     # Update request fulfilled units
-    request_data['fulfilled_units'] = request_data.get('fulfilled_units', 0) + units_donated
+    request_data = dict(request_data)
+    request_data['fulfilled_units'] = seen_fulfilled + units_donated
     
     # Update request status
     remaining = request_data['units_needed'] - request_data['fulfilled_units']
@@ -585,8 +573,9 @@ def donor_confirm_donation(assignment_id):
         request_data['status'] = 'partial'
     
     # Update donor stats
+    donor = dict(donor)
     donor['last_donation'] = datetime.now().strftime('%Y-%m-%d')
-    donor['total_donations'] = donor.get('total_donations', 0) + 1
+    donor['total_donations'] = seen_donations + 1
     
     # Create donation record
     donation_id = generate_donation_id()
@@ -605,7 +594,14 @@ def donor_confirm_donation(assignment_id):
         'assignment_id': assignment_id,
         'status': 'completed'
     }
-    donations_db[donation_id] = donation_data
+    
+    try:
+        repo.confirm_donation(assignment, request_data, donor, donation_data,
+                              assignment_status=seen_status, fulfilled_units=seen_fulfilled,
+                              donor_donations=seen_donations)
+    except ConflictError:
+        flash('✗ This donation was already confirmed or the request changed meanwhile. Please try again.', 'error')
+        return redirect(url_for('donor_dashboard', donor_id=donor_id))
     
     msg = f'✓ Donation confirmed! {units_donated} unit(s) donated to {request_data["patient_name"]}.'
     if remaining > 0:
@@ -637,7 +633,7 @@ def requestor_register():
             'total_requests': 0
         }
         
-        requestors_db[requestor_id] = requestor_data
+        repo.put_requestor(requestor_data)
         
         flash(f'Registration successful! Your Requestor ID is: {requestor_id}', 'success')
         return redirect(url_for('requestor_dashboard', requestor_id=requestor_id))
@@ -647,38 +643,13 @@ def requestor_register():
 @app.route('/requestor/dashboard/<requestor_id>')
 def requestor_dashboard(requestor_id):
     """Requestor dashboard"""
-    requestor = requestors_db.get(requestor_id)
+    requestor = repo.get_requestor(requestor_id)
     if not requestor:
         flash('Requestor not found!', 'error')
         return redirect(url_for('home'))
     
-    # Get request history with assigned donors
-    request_history = []
-    for req in blood_requests_db.values():
-        if req['requestor_id'] == requestor_id:
-            assigned_donors = get_request_assigned_donors(req['request_id'])
-            # Donation history for this request
-            donation_history = [d for d in donations_db.values() if d.get('request_id') == req['request_id']]
-
-            # Suggested compatible donors (exclude already assigned)
-            match_results = match_blood_request(req)
-            suggested = []
-            assigned_ids = {a['donor_id'] for a in assigned_donors}
-            for d in match_results.get('compatible_donors', [])[:10]:
-                if d['donor_id'] not in assigned_ids:
-                    suggested.append(d)
-
-            request_history.append({
-                **req,
-                'assigned_donors': assigned_donors,
-                'donation_history': donation_history,
-                'suggested_donors': suggested,
-                'remaining_units': req['units_needed'] - req.get('fulfilled_units', 0),
-                'inventory_available': blood_inventory.get(req['blood_group'], {}).get('units', 0)
-            })
-    
-    # Sort by date (guard against missing/None created_at)
-    request_history.sort(key=lambda x: (x.get('created_at') or ''), reverse=True)
+    # Get request history with assigned donors, built in one pass over all requests
+    request_history = build_request_history(repo.requests_for_requestor(requestor_id))
     
     return render_template('requestor_dashboard.html', requestor=requestor, 
                           request_history=request_history)
@@ -690,8 +661,8 @@ def requestor_login():
         requestor_id = request.form['requestor_id']
         email = request.form['email']
         
-        requestor = requestors_db.get(requestor_id)
-        if requestor and requestor['email'] == email:
+        requestor = repo.get_requestor(requestor_id)
+        if requestor and email and requestor.get('email') == email:
             session['requestor_id'] = requestor_id
             flash('Login successful!', 'success')
             return redirect(url_for('requestor_dashboard', requestor_id=requestor_id))
@@ -734,16 +705,16 @@ def request_blood():
             'inventory_used': 0
         }
         
-        blood_requests_db[request_id] = request_data
-        
         # Update requestor stats if registered
-        requestor_id = request_data['requestor_id']
-        if requestor_id in requestors_db:
-            requestors_db[requestor_id]['total_requests'] += 1
+        requestor = repo.get_requestor(request_data['requestor_id'])
+        if requestor:
+            requestor['total_requests'] += 1
+            repo.put_requestor(requestor)
         
         # Run matching algorithm to find compatible donors
         match_results = match_blood_request(request_data)
-        blood_requests_db[request_id]['matched_donors'] = [d['donor_id'] for d in match_results['compatible_donors']]
+        request_data['matched_donors'] = [d['donor_id'] for d in match_results['compatible_donors']]
+        repo.put_request(request_data)
         
         flash(f'Blood request created! Request ID: {request_id}', 'success')
         return redirect(url_for('request_details', request_id=request_id))
@@ -753,27 +724,32 @@ def request_blood():
 @app.route('/request/<request_id>')
 def request_details(request_id):
     """View request details with matched donors"""
-    request_data = blood_requests_db.get(request_id)
+    request_data = repo.get_request(request_id)
     if not request_data:
         flash('Request not found!', 'error')
         return redirect(url_for('home'))
     
-    # Get fresh match results
-    match_results = match_blood_request(request_data)
-    
-    # Get assigned donors
-    assigned_donors = get_request_assigned_donors(request_id)
-
-    # Donation history for this request
-    donation_history = [d for d in donations_db.values() if d.get('request_id') == request_id]
+    blood_group = request_data['blood_group']
+    results = fetch(
+        # Fresh match results
+        match_results=lambda: match_blood_request(request_data),
+        # Assigned donors
+        assigned_donors=lambda: get_request_assigned_donors(request_id),
+        # Donation history for this request
+        donation_history=lambda: repo.donations_for_request(request_id),
+        # Matching donors
+        has_matching_donors=lambda: check_matching_donors(blood_group),
+        inventory_available=lambda: repo.inventory_units(blood_group),
+    )
+    match_results = results['match_results']
+    assigned_donors = results['assigned_donors']
+    donation_history = results['donation_history']
+    has_matching_donors = results['has_matching_donors']
+    inventory_available = results['inventory_available']
     
     # Calculate remaining units
     remaining_units = request_data['units_needed'] - request_data.get('fulfilled_units', 0)
     
-    # Check for matching donors
-    has_matching_donors = check_matching_donors(request_data['blood_group'])
-    inventory_available = blood_inventory.get(request_data['blood_group'], {}).get('units', 0)
-    
     return render_template('request_details.html', request=request_data, 
                           match_results=match_results,
                           assigned_donors=assigned_donors,
@@ -794,21 +770,8 @@ def search_donors():
         
         search_performed = True
         
-        for donor in donors_db.values():
-            match = True
-            
-            if blood_group and donor['blood_group'] != blood_group:
-                match = False
-            
-            if location:
-                loc_match = (location.lower() in donor.get('city', '').lower() or 
-                           location.lower() in donor.get('state', '').lower() or
-                           location.lower() in donor.get('pincode', ''))
-                if not loc_match:
-                    match = False
-            
-            if match and donor['available'] and donor['status'] == 'active':
-                results.append(donor)
+        # Blood group bucket intersected with the city/state/pincode index
+        results = repo.search_donors(group_bit(blood_group) if blood_group else None, location)
     
     return render_template('search_donors.html', results=results, 
                           search_performed=search_performed)
@@ -817,21 +780,25 @@ def search_donors():
 def blood_inventory_view():
     """View blood inventory"""
     stats = get_statistics()
-    return render_template('blood_inventory.html', inventory=blood_inventory, stats=stats)
+    return render_template('blood_inventory.html', inventory=stats['inventory'], stats=stats)
 
 # ============== NEW: INVENTORY DONATION ROUTE ==============
 
 @app.route('/request/<request_id>/use-inventory', methods=['POST'])
 def use_inventory_for_request(request_id):
     """Use blood inventory to fulfill a request"""
-    request_data = blood_requests_db.get(request_id)
+    return withdraw_for_request(request_id, request.form.get('units_from_inventory', 0))
+
+def withdraw_for_request(request_id, units):
+    """Take units of stock towards a request, conditional on stock and the request being unchanged"""
+    request_data = repo.get_request(request_id)
     if not request_data:
         flash('✗ Request not found!', 'error')
         return redirect(url_for('home'))
     
     blood_group = request_data['blood_group']
     try:
-        units_from_inventory = int(request.form.get('units_from_inventory', 0))
+        units_from_inventory = int(units)
         if units_from_inventory <= 0:
             flash('✗ Units must be greater than 0!', 'error')
             return redirect(url_for('request_details', request_id=request_id))
@@ -840,7 +807,7 @@ def use_inventory_for_request(request_id):
         return redirect(url_for('request_details', request_id=request_id))
     
     # Check if inventory has enough
-    available = blood_inventory.get(blood_group, {}).get('units', 0)
+    available = repo.inventory_units(blood_group)
     
     if units_from_inventory > available:
         flash(f'✗ Not enough inventory! Available: {available} units, Requested: {units_from_inventory}', 'error')
@@ -851,8 +818,8 @@ def use_inventory_for_request(request_id):
         flash(f'✗ Units exceed remaining need! Only {remaining_needed} more unit(s) needed.', 'error')
         return redirect(url_for('request_details', request_id=request_id))
     
-    # Update inventory
-    update_inventory(blood_group, units_from_inventory, 'remove')
+    # The withdrawal is written only if the stock still covers it and the request is unchanged
+    seen_fulfilled = request_data.get('fulfilled_units', 0)
     
     # Create inventory transaction record
     transaction_id = generate_donation_id()
@@ -867,19 +834,26 @@ def use_inventory_for_request(request_id):
         'donor_id': 'INVENTORY',
         'status': 'completed'
     }
-    donations_db[transaction_id] = transaction_data
     
-    # Update request
-    request_data['fulfilled_units'] = request_data.get('fulfilled_units', 0) + units_from_inventory
+    # Update request (on a copy until the withdrawal is written)
+    request_data = dict(request_data)
+    request_data['fulfilled_units'] = seen_fulfilled + units_from_inventory
     request_data['inventory_used'] = request_data.get('inventory_used', 0) + units_from_inventory
     
     # Update status
     remaining = request_data['units_needed'] - request_data['fulfilled_units']
+    request_data['status'] = 'fulfilled' if remaining <= 0 else 'partial'
+    
+    try:
+        repo.use_inventory(request_data, transaction_data, units_from_inventory, fulfilled_units=seen_fulfilled)
+    except ConflictError:
+        flash(f'✗ Inventory or request changed meanwhile (available now: {repo.inventory_units(blood_group)} '
+              f'units). Please try again.', 'error')
+        return redirect(url_for('request_details', request_id=request_id))
+    
     if remaining <= 0:
-        request_data['status'] = 'fulfilled'
         flash(f'✓ Request fully fulfilled! {units_from_inventory} unit(s) taken from inventory.', 'success')
     else:
-        request_data['status'] = 'partial'
         flash(f'✓ {units_from_inventory} unit(s) taken from inventory. Remaining needed: {remaining} unit(s)', 'info')
     
     return redirect(url_for('request_details', request_id=request_id))
@@ -889,22 +863,30 @@ def use_inventory_for_request(request_id):
 @app.route('/request/<request_id>/confirm-donor/<assignment_id>', methods=['POST'])
 def requestor_confirm_donor(request_id, assignment_id):
     """Requestor confirms a donor's offer"""
-    request_data = blood_requests_db.get(request_id)
-    assignment = donor_request_assignments.get(assignment_id)
+    request_data = repo.get_request(request_id)
+    assignment = repo.get_assignment(assignment_id)
     
     if not request_data or not assignment:
         flash('✗ Invalid request or assignment!', 'error')
         return redirect(url_for('home'))
     
-    if assignment['status'] not in ['accepted', 'pending']:
+    confirmable = ('accepted', 'pending')
+    if assignment['status'] not in confirmable:
         flash(f'✗ Cannot confirm assignment in {assignment["status"]} status!', 'error')
         return redirect(url_for('request_details', request_id=request_id))
     
-    # Update assignment status
+    # Update assignment status (a copy, written only if the donor has not completed it meanwhile)
+    assignment = dict(assignment)
     assignment['status'] = 'confirmed_by_requestor'
     assignment['confirmed_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    try:
+        repo.put_assignment(assignment, assignment_statuses=confirmable)
+    except ConflictError:
+        current = repo.get_assignment(assignment_id)
+        flash(f'✗ Cannot confirm assignment in {current["status"] if current else "deleted"} status!', 'error')
+        return redirect(url_for('request_details', request_id=request_id))
     
-    donor = donors_db.get(assignment['donor_id'])
+    donor = repo.get_donor(assignment['donor_id'])
     flash(f'✓ Confirmed! Awaiting {donor["name"]} to complete donation of {assignment["units_offered"]} unit(s).', 'success')
     return redirect(url_for('request_details', request_id=request_id))
 
@@ -913,59 +895,197 @@ def requestor_confirm_donor(request_id, assignment_id):
 @app.route('/dashboard')
 def admin_dashboard():
     """Admin dashboard"""
-    stats = get_statistics()
-    
-    # Get all data for admin view
-    all_donors = list(donors_db.values())
-    all_requests = sorted(blood_requests_db.values(), 
-                         key=lambda x: (x.get('created_at') or ''), reverse=True)
-    all_donations = sorted(donations_db.values(),
-                          key=lambda x: (x.get('donation_date') or ''), reverse=True)
-    all_assignments = list(donor_request_assignments.values())
+    donors_after = request.args.get('donors_after')
+    
+    # Statistics, one page of donors, and the newest requests and donations, all at once
+    results = fetch(
+        **statistics_reads(),
+        donors_page=lambda: repo.page('donors', ADMIN_PAGE_SIZE, donors_after, fields=DONOR_SUMMARY_FIELDS),
+        recent_requests=lambda: repo.recent_requests(ADMIN_PAGE_SIZE),
+        recent_donations=lambda: repo.recent_donations(ADMIN_PAGE_SIZE),
+    )
+    stats = build_statistics(results)
+    donors, next_donors = results['donors_page']
     
     return render_template('admin_dashboard.html', stats=stats, 
-                          donors=all_donors, requests=all_requests,
-                          donations=all_donations, assignments=all_assignments)
+                          donors=donors, next_donors=next_donors, requests=results['recent_requests'],
+                          donations=results['recent_donations'])
 
 @app.route('/api/statistics')
 def api_statistics():
     """API endpoint for statistics"""
     return jsonify(get_statistics())
 
+def json_listing(kind):
+    """
+    JSON array of every record of kind, streamed as it is read.
+    With ?limit=N only one page is returned, and the cursor of the next page
+    (pass it back as ?cursor=) is sent in the X-Next-Cursor header.
+    """
+    limit = request.args.get('limit', type=int)
+    if limit:
+        records, next_cursor = repo.page(kind, min(limit, 1000), request.args.get('cursor'))
+        response = jsonify(records)
+        if next_cursor is not None:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+
+    def generate():
+        yield '['
+        for i, record in enumerate(repo.iter_records(kind)):
+            yield (',' if i else '') + app.json.dumps(record)
+        yield ']\n'
+    return Response(generate(), mimetype='application/json')
+
 @app.route('/api/donors')
 def api_donors():
     """API endpoint for donors"""
-    return jsonify(list(donors_db.values()))
+    return json_listing('donors')
 
 @app.route('/api/requests')
 def api_requests():
     """API endpoint for blood requests"""
-    return jsonify(list(blood_requests_db.values()))
+    return json_listing('requests')
+
+@app.route('/api/requests/<request_id>/matches')
+def api_request_matches(request_id):
+    """One page of a request's matching donors, best first (?offset=N&limit=N)"""
+    request_data = repo.get_request(request_id)
+    if not request_data:
+        return jsonify({'error': 'Request not found'}), 404
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    match = match_blood_request(request_data, limit, offset)
+    next_offset = offset + limit if offset + limit < match['total_compatible'] else None
+    return jsonify({'donors': match['compatible_donors'], 'total_compatible': match['total_compatible'],
+                    'next_offset': next_offset})
+
+@app.route('/api/donors/import', methods=['POST'])
+def api_import_donors():
+    """
+    Bulk donor import: a CSV or JSON Lines upload (form field 'file') or
+    request body, validated like the registration form. ?format=csv|jsonl
+    overrides the format guessed from the file name.
+    """
+    upload = request.files.get('file')
+    fmt = request.args.get('format') or guess_format(upload.filename if upload else None)
+    if fmt not in FORMATS:
+        return jsonify({'error': f'Unknown format {fmt!r}'}), 400
+    report = import_donor_file(repo, upload.stream if upload else request.stream, fmt)
+    return jsonify(report.to_dict()), 200
 
 @app.route('/request/<request_id>/fulfill', methods=['POST'])
 def fulfill_request(request_id):
-    """Mark request as fulfilled (legacy route)"""
-    request_data = blood_requests_db.get(request_id)
-    if not request_data:
-        flash('Request not found!', 'error')
-        return redirect(url_for('home'))
-    
-    units_fulfilled = int(request.form.get('units_fulfilled', 0))
-    
-    request_data['fulfilled_units'] = request_data.get('fulfilled_units', 0) + units_fulfilled
-    
-    if request_data['fulfilled_units'] >= request_data['units_needed']:
-        request_data['status'] = 'fulfilled'
-        flash('Request fully fulfilled!', 'success')
+    """Mark units of a request as fulfilled (legacy route): taken from inventory like use-inventory"""
+    return withdraw_for_request(request_id, request.form.get('units_fulfilled', 0))
+
+@app.route('/api/metrics')
+def api_metrics():
+    """Storage backend counters (e.g. DynamoDB call latencies)"""
+    return jsonify(repo.metrics())
+
+@app.route('/health')
+def health():
+    """Health check endpoint"""
+    try:
+        repo.count_donors()
+        return jsonify({'status': 'healthy', 'backend': type(repo.repository).__name__}), 200
+    except Exception as e:
+        return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
+
+@app.route('/inventory/update', methods=['POST'])
+def inventory_update():
+    """Add units to the stock of a blood group"""
+    blood_group = request.form.get('blood_group')
+    try:
+        units = int(request.form.get('units', 0))
+    except ValueError:
+        units = 0
+    if blood_group not in INVENTORY_GROUPS or units <= 0:
+        flash('Choose a blood group and a positive number of units!', 'error')
     else:
-        request_data['status'] = 'partial'
-        remaining = request_data['units_needed'] - request_data['fulfilled_units']
-        flash(f'Partially fulfilled! {remaining} units still needed.', 'info')
-    
-    # Update inventory
-    update_inventory(request_data['blood_group'], units_fulfilled, 'remove')
-    
-    return redirect(url_for('request_details', request_id=request_id))
+        update_inventory(blood_group, units, 'add')
+        flash(f'✓ Added {units} unit(s) of {blood_group} to the inventory.', 'success')
+    return redirect(url_for('admin_dashboard'))
+
+@app.route('/debug')
+def debug():
+    """Debug endpoint to check app status"""
+    debug_info = {
+        'status': 'running',
+        'backend': type(repo.repository).__name__,
+        'templates_path': app.template_folder,
+        'templates_exist': os.path.exists(app.template_folder) if app.template_folder else False,
+        'static_path': app.static_folder,
+        'static_exists': os.path.exists(app.static_folder) if app.static_folder else False,
+        'registered_routes': [str(rule) for rule in app.url_map.iter_rules()]
+    }
+    if app.template_folder:
+        try:
+            debug_info['templates_files'] = os.listdir(os.path.join(app.root_path, app.template_folder))
+        except OSError as e:
+            debug_info['templates_error'] = str(e)
+    return jsonify(debug_info), 200
+
+@app.route('/test')
+def test():
+    """Simple test endpoint"""
+    return jsonify({
+        'message': 'Flask is working!',
+        'backend': type(repo.repository).__name__,
+        'version': '2.0.0'
+    }), 200
+
+# ============== SITE ACCOUNT ROUTES ==============
+
+@app.route('/register', methods=['POST'])
+def register():
+    """Create a site account (name, email, password, donor or requestor role)"""
+    email = request.form.get('email', '').strip()
+    password = request.form.get('password', '')
+    role = request.form.get('role', '')
+    if not email or not password or role not in SELF_REGISTER_ROLES:
+        flash('Registration failed: email, password and a valid role are required!', 'error')
+    elif repo.get_user_by_email(email):
+        flash('An account with this email already exists!', 'error')
+    else:
+        repo.put_user({
+            'user_id': f"USR-{str(uuid.uuid4())[:8].upper()}",
+            'name': request.form.get('name', ''),
+            'email': email,
+            'password_hash': generate_password_hash(password),
+            'role': role,
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
+        flash('Registration successful!', 'success')
+    return redirect(url_for('home'))
+
+def check_user_password(user, password):
+    """
+    Check a site account's password. Accounts created by the old AWS app
+    keep it in plain text under 'password'; on their first successful login
+    it is replaced by a hash.
+    """
+    if 'password_hash' in user:
+        return check_password_hash(user['password_hash'], password)
+    legacy = user.get('password')
+    if not isinstance(legacy, str) or not hmac.compare_digest(legacy.encode(), password.encode()):
+        return False
+    rehashed = {k: v for k, v in user.items() if k != 'password'}
+    rehashed['password_hash'] = generate_password_hash(password)
+    repo.put_user(rehashed)
+    return True
+
+@app.route('/login', methods=['POST'])
+def login():
+    """Log in to a site account by email and password"""
+    user = repo.get_user_by_email(request.form.get('email', '').strip())
+    if not user or not check_user_password(user, request.form.get('password', '')):
+        flash('Invalid login!', 'error')
+        return redirect(url_for('home'))
+    session['user'] = {k: v for k, v in user.items() if k not in ('password', 'password_hash')}
+    flash('Login successful!', 'success')
+    return redirect(url_for(ROLE_PAGES.get(user['role'], 'home')))
 
 @app.route('/logout')
 def logout():
@@ -988,6 +1108,14 @@ def server_error(e):
 
 def init_sample_data():
     """Initialize sample data for testing"""
+    # Starting blood bank stock
+    sample_inventory = {
+        'A+': 50, 'A-': 30, 'B+': 45, 'B-': 25,
+        'AB+': 20, 'AB-': 15, 'O+': 60, 'O-': 40
+    }
+    for blood_group, units in sample_inventory.items():
+        repo.adjust_inventory(blood_group, units)
+    
     # Sample donors with various blood groups
     sample_donors = [
         {
@@ -1124,9 +1252,9 @@ def init_sample_data():
         }
     ]
     
+    repo.put_donors(sample_donors)
     for donor in sample_donors:
-        donors_db[donor['donor_id']] = donor
-        blood_inventory[donor['blood_group']]['donors'].append(donor['donor_id'])
+        repo.add_inventory_donor(donor['blood_group'], donor['donor_id'])
     
     # Sample requestors
     sample_requestors = [
@@ -1146,7 +1274,7 @@ def init_sample_data():
     ]
     
     for requestor in sample_requestors:
-        requestors_db[requestor['requestor_id']] = requestor
+        repo.put_requestor(requestor)
     
     # Sample blood requests - A+ request that can be fulfilled by A+, A-, O+, O- donors
     sample_requests = [
@@ -1177,11 +1305,11 @@ def init_sample_data():
         }
     ]
     
-    for req in sample_requests:
-        blood_requests_db[req['request_id']] = req
+    repo.put_requests(sample_requests)
 
-# Initialize sample data
-init_sample_data()
+# Initialize sample data (only into an empty local store)
+if repo.seed_sample_data and repo.count_donors() == 0:
+    init_sample_data()
 
 # ============== MAIN ==============
 
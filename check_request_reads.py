@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+BloodSync Duplicate Read Check
+Renders the main pages through the Flask test client and counts, per HTTP
+request, every storage read that reaches the backend: the repository's
+public reads and its primitive queries (SQL statements, DynamoDB get,
+query and scan calls). Fails if any read runs more than once with the same
+arguments within one request. On backends that can explain their queries
+(SQLite), also fails if an indexed query would scan a whole table.
+
+Runs against the configured backend (BLOODSYNC_BACKEND, see storage/__init__.py).
+
+Usage: python check_request_reads.py [-v]
+"""
+
+import sys
+import threading
+from collections import Counter
+from collections.abc import Iterator
+from functools import wraps
+
+import app as bloodsync
+from request_memo import REPOSITORY_READS, freeze
+
+# Backend-internal calls that each cost a query or round trip
+PRIMITIVE_READS = ('_query', '_select', '_all', '_get', '_get_many', '_scan', '_iter_scan',
+                   '_query_count', '_count')
+
+
+def signature(value):
+    """Hashable stand-in for an argument, by content (also for e.g. boto3 key conditions)"""
+    value = freeze(value)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        pass
+    if isinstance(value, tuple):
+        return tuple(signature(item) for item in value)
+    if hasattr(value, '__dict__'):
+        return (type(value).__name__, signature(vars(value)))
+    return repr(value)
+
+
+class ReadCounter:
+    """Counts calls by (method, arguments) on a repository instance"""
+
+    def __init__(self, repository):
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        for name in REPOSITORY_READS + PRIMITIVE_READS:
+            method = getattr(repository, name, None)
+            if callable(method):
+                setattr(repository, name, self._counted(name, method))
+
+    def _counted(self, name, method):
+        @wraps(method)
+        def counted(*args, **kwargs):
+            args = tuple(tuple(arg) if isinstance(arg, Iterator) else arg for arg in args)
+            key = (name, signature(args), signature(kwargs))
+            with self._lock:
+                self.calls[key] += 1
+            return method(*args, **kwargs)
+        return counted
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+
+    def duplicates(self):
+        return {key: count for key, count in self.calls.items() if count > 1}
+
+
+def pages(repo):
+    request = repo.list_requests()[0]
+    donor = repo.list_donors()[0]
+    yield '/'
+    yield '/dashboard'
+    yield '/api/statistics'
+    yield '/blood-inventory'
+    yield '/search-donors'
+    yield '/api/donors?limit=50'
+    yield f"/request/{request['request_id']}"
+    yield f"/donor/dashboard/{donor['donor_id']}"
+    yield f"/requestor/dashboard/{request['requestor_id']}"
+
+
+def main():
+    verbose = '-v' in sys.argv[1:]
+    repo = bloodsync.repo
+    if hasattr(repo, 'initialize_tables') and not repo.initialize_tables():
+        sys.exit("✗ Could not initialize tables")
+    if repo.count_requests() == 0:
+        bloodsync.init_sample_data()
+    counter = ReadCounter(repo.repository)
+    client = bloodsync.app.test_client()
+
+    print("=" * 70)
+    print(f"BloodSync Duplicate Read Check ({type(repo.repository).__name__})")
+    print("=" * 70)
+    failed = False
+    for path in list(pages(repo)):
+        counter.reset()
+        status = client.get(path).status_code
+        duplicates = counter.duplicates()
+        reads = sum(counter.calls.values())
+        mark = '✗' if duplicates or status != 200 else '✓'
+        print(f"{mark} {path:50} {status}  {reads:3} reads, {len(duplicates)} repeated")
+        for (name, args, _), count in duplicates.items():
+            print(f"    {name}{args if verbose else args[:2]} x{count}")
+        failed = failed or bool(duplicates) or status != 200
+    if hasattr(repo.repository, 'check_query_plans'):
+        try:
+            repo.repository.check_query_plans()
+            print("✓ All indexed queries use an index")
+        except AssertionError as e:
+            print(f"✗ {e}")
+            failed = True
+    if failed:
+        sys.exit(1)
+    print("✓ No read ran twice within a request")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+BloodSync - Blood Compatibility Engine
+Single source of truth for donor/recipient compatibility.
+
+Blood groups are encoded by their antigens (Rh = 1, A = 2, B = 4), so every
+group has a 3-bit code in 0..7. Both compatibility directions are precomputed
+as 8-bit masks over those codes, which turns a compatibility check into a
+bitwise AND.
+"""
+
+import numpy as np
+
+# ============== GROUP ENCODING ==============
+
+# Blood groups in code order: a group's code is its index (= its antigen bits)
+BLOOD_GROUPS = ('O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+')
+
+GROUP_CODE = {bg: code for code, bg in enumerate(BLOOD_GROUPS)}
+
+# Code stored for missing or unrecognised blood groups; it never matches
+UNKNOWN_CODE = 0xFF
+
+# ============== BLOOD COMPATIBILITY MATRIX ==============
+# Who can DONATE TO whom (Donor Blood Group -> Recipient Blood Groups)
+BLOOD_COMPATIBILITY = {
+    'A+': ['A+', 'AB+'],
+    'A-': ['A+', 'A-', 'AB+', 'AB-'],
+    'B+': ['B+', 'AB+'],
+    'B-': ['B+', 'B-', 'AB+', 'AB-'],
+    'AB+': ['AB+'],
+    'AB-': ['AB+', 'AB-'],
+    'O+': ['O+', 'A+', 'B+', 'AB+'],
+    'O-': ['O+', 'O-', 'A+', 'A-', 'B+', 'B-', 'AB+', 'AB-']  # Universal donor
+}
+
+# Who can RECEIVE FROM whom (Recipient Blood Group -> Donor Blood Groups)
+# Derived from BLOOD_COMPATIBILITY so the two directions cannot drift apart
+RECEIVE_COMPATIBILITY = {
+    recipient: [donor for donor in BLOOD_GROUPS if recipient in BLOOD_COMPATIBILITY[donor]]
+    for recipient in BLOOD_GROUPS
+}
+
+
+def _groups_to_mask(blood_groups):
+    mask = 0
+    for bg in blood_groups:
+        mask |= 1 << GROUP_CODE[bg]
+    return mask
+
+
+# DONATE_MASKS[donor_code] has bit r set if the donor can give to recipient code r
+DONATE_MASKS = tuple(_groups_to_mask(BLOOD_COMPATIBILITY[bg]) for bg in BLOOD_GROUPS)
+
+# RECEIVE_MASKS[recipient_code] has bit d set if the recipient can take from donor code d
+RECEIVE_MASKS = tuple(_groups_to_mask(RECEIVE_COMPATIBILITY[bg]) for bg in BLOOD_GROUPS)
+
+
+def _validate():
+    """
+    Check the chart against the antigen rule: a donor is compatible when the
+    recipient carries every antigen the donor carries.
+    """
+    if set(BLOOD_COMPATIBILITY) != set(BLOOD_GROUPS):
+        raise ValueError('BLOOD_COMPATIBILITY must list every blood group exactly once')
+    for donor in range(len(BLOOD_GROUPS)):
+        for recipient in range(len(BLOOD_GROUPS)):
+            expected = donor & ~recipient == 0
+            if bool(DONATE_MASKS[donor] >> recipient & 1) != expected:
+                raise ValueError(
+                    f'Compatibility chart is wrong for {BLOOD_GROUPS[donor]} -> {BLOOD_GROUPS[recipient]}'
+                )
+            if bool(RECEIVE_MASKS[recipient] >> donor & 1) != expected:
+                raise ValueError(
+                    f'Receive chart is wrong for {BLOOD_GROUPS[recipient]} <- {BLOOD_GROUPS[donor]}'
+                )
+
+
+_validate()
+
+# RECEIVE_LOOKUP[recipient_code][donor_code] -> bool, padded to 256 columns so
+# any uint8 code (including UNKNOWN_CODE) can be used as an index
+RECEIVE_LOOKUP = np.zeros((len(BLOOD_GROUPS), 256), dtype=bool)
+for _recipient, _mask in enumerate(RECEIVE_MASKS):
+    for _donor in range(len(BLOOD_GROUPS)):
+        RECEIVE_LOOKUP[_recipient, _donor] = bool(_mask >> _donor & 1)
+RECEIVE_LOOKUP.flags.writeable = False
+
+# ============== LOOKUPS ==============
+
+
+def group_code(blood_group):
+    """Get the code of a blood group, UNKNOWN_CODE if it isn't recognised"""
+    return GROUP_CODE.get(blood_group, UNKNOWN_CODE)
+
+
+def group_bit(blood_group):
+    """Get the single-bit mask of a blood group, 0 if it isn't recognised"""
+    code = group_code(blood_group)
+    return 0 if code == UNKNOWN_CODE else 1 << code
+
+
+def groups_in_mask(mask):
+    """Get the blood groups whose bits are set in mask (code order)"""
+    return [bg for code, bg in enumerate(BLOOD_GROUPS) if mask >> code & 1]
+
+
+def can_give(donor_code, recipient_code):
+    """Check if a donor with donor_code can donate to a recipient with recipient_code"""
+    if donor_code == UNKNOWN_CODE or recipient_code == UNKNOWN_CODE:
+        return False
+    return bool(DONATE_MASKS[donor_code] >> recipient_code & 1)
+
+
+def donor_mask(recipient_blood_group):
+    """Get the mask of donor codes a recipient blood group can receive from"""
+    code = group_code(recipient_blood_group)
+    return 0 if code == UNKNOWN_CODE else RECEIVE_MASKS[code]
+
+
+def recipient_mask(donor_blood_group):
+    """Get the mask of recipient codes a donor blood group can donate to"""
+    code = group_code(donor_blood_group)
+    return 0 if code == UNKNOWN_CODE else DONATE_MASKS[code]
+
+
+def filter_compatible(donor_codes, recipient_blood_group):
+    """
+    Vectorized compatibility filter
+    Takes an array of donor codes (uint8) and returns a boolean array that is
+    True where that donor can donate to recipient_blood_group
+    """
+    donor_codes = np.asarray(donor_codes, dtype=np.uint8)
+    code = group_code(recipient_blood_group)
+    if code == UNKNOWN_CODE:
+        return np.zeros(donor_codes.shape, dtype=bool)
+    return RECEIVE_LOOKUP[code][donor_codes]
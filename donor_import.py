@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+BloodSync - Bulk Donor Import
+Streams hospital and blood-drive donor lists (CSV with a header row, or
+JSON Lines) into the repository, applying the same rules as the donor
+registration form. Rows are written in batches through put_donors(), which
+is a batch_writer on DynamoDB and one transaction per batch on SQLite.
+
+Usage: python donor_import.py FILE [--format csv|jsonl] [--batch-size N]
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+from compatibility import BLOOD_GROUPS
+
+# Registration rules (shared with the donor_register form)
+MIN_DONOR_AGE = 18
+MAX_DONOR_AGE = 65
+MIN_DONOR_WEIGHT = 50
+
+# Columns every row must have
+REQUIRED_FIELDS = ('name', 'email', 'phone', 'age', 'gender', 'blood_group', 'weight',
+                   'address', 'city', 'state', 'pincode')
+
+# Optional columns and their defaults (as set by the registration form)
+OPTIONAL_FIELDS = {
+    'medical_history': 'None',
+    'emergency_contact': '',
+    'preferred_contact_time': 'Anytime',
+}
+
+# Donors written per put_donors() call
+BATCH_SIZE = 500
+
+FORMATS = ('csv', 'jsonl')
+
+
+def donor_validation_error(donor):
+    """Get the reason a donor may not register, or None if they may"""
+    if donor['age'] < MIN_DONOR_AGE or donor['age'] > MAX_DONOR_AGE:
+        return f'Donor age must be between {MIN_DONOR_AGE} and {MAX_DONOR_AGE} years!'
+    if donor['weight'] < MIN_DONOR_WEIGHT:
+        return f'Donor weight must be at least {MIN_DONOR_WEIGHT}kg!'
+    return None
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, row dict) from a text stream of CSV or JSON Lines"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as e:
+                    yield line_number, e
+    else:
+        raise ValueError(f'Unknown import format {fmt!r}; expected one of {", ".join(FORMATS)}')
+
+
+def guess_format(filename):
+    return 'jsonl' if filename and filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def build_donor(row, registered_at):
+    """Turn an import row into a donor record; raises ValueError with the reason it is rejected"""
+    if not isinstance(row, dict):
+        raise ValueError(f'Malformed row: {row}')
+    missing = [field for field in REQUIRED_FIELDS if row.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f'Missing {", ".join(missing)}')
+    try:
+        age = int(row['age'])
+        weight = float(row['weight'])
+    except (TypeError, ValueError):
+        raise ValueError('Age and weight must be numbers')
+    try:
+        total_donations = int(row.get('total_donations') or 0)
+    except (TypeError, ValueError):
+        raise ValueError(f'total_donations must be a whole number, not {row["total_donations"]!r}')
+    if total_donations < 0:
+        raise ValueError(f'total_donations must not be negative, not {total_donations}')
+    last_donation = row.get('last_donation') or None
+    if last_donation is not None:
+        try:
+            last_donation = datetime.strptime(str(last_donation), '%Y-%m-%d').strftime('%Y-%m-%d')
+        except ValueError:
+            raise ValueError(f'last_donation must be a YYYY-MM-DD date, not {last_donation!r}')
+        if last_donation > registered_at[:10]:
+            raise ValueError(f'last_donation {last_donation} is in the future')
+    blood_group = str(row['blood_group']).strip().upper()
+    if blood_group not in BLOOD_GROUPS:
+        raise ValueError(f'Unknown blood group {row["blood_group"]!r}')
+
+    donor = {
+        'donor_id': f"DON-{uuid.uuid4().hex[:8].upper()}",
+        'name': str(row['name']),
+        'email': str(row['email']),
+        'phone': str(row['phone']),
+        'age': age,
+        'gender': str(row['gender']),
+        'blood_group': blood_group,
+        'weight': weight,
+        'address': str(row['address']),
+        'city': str(row['city']),
+        'state': str(row['state']),
+        'pincode': str(row['pincode']),
+        'medical_history': row.get('medical_history') or OPTIONAL_FIELDS['medical_history'],
+        'available': True,
+        'status': 'active',
+        'total_donations': total_donations,
+        'last_donation': last_donation,
+        'registered_at': registered_at,
+        'emergency_contact': row.get('emergency_contact') or OPTIONAL_FIELDS['emergency_contact'],
+        'preferred_contact_time': (row.get('preferred_contact_time')
+                                   or OPTIONAL_FIELDS['preferred_contact_time']),
+    }
+    error = donor_validation_error(donor)
+    if error:
+        raise ValueError(error)
+    return donor
+
+
+class ImportReport:
+    """Outcome of an import: counts, the first rejected rows and throughput"""
+
+    # Rejections kept for the report; the rest are only counted
+    MAX_ERRORS = 100
+
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+        self.seconds = 0.0
+
+    def reject(self, line_number, reason):
+        self.rejected += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append({'line': line_number, 'error': str(reason)})
+
+    @property
+    def rows_per_second(self):
+        rows = self.imported + self.rejected
+        return rows / self.seconds if self.seconds else 0.0
+
+    def to_dict(self):
+        return {
+            'imported': self.imported,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+def import_donors(repo, rows, batch_size=BATCH_SIZE):
+    """
+    Validate and write (line number, row) pairs as donors, batch_size at a
+    time, keeping memory flat however long the input is. Returns an ImportReport.
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    registered_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    batch = []
+
+    def flush():
+        repo.put_donors(batch)
+        by_group = defaultdict(list)
+        for donor in batch:
+            by_group[donor['blood_group']].append(donor['donor_id'])
+        for blood_group, donor_ids in by_group.items():
+            repo.add_inventory_donors(blood_group, donor_ids)
+        report.imported += len(batch)
+        batch.clear()
+
+    for line_number, row in rows:
+        if isinstance(row, Exception):
+            report.reject(line_number, f'Invalid JSON: {row}')
+            continue
+        try:
+            batch.append(build_donor(row, registered_at))
+        except ValueError as e:
+            report.reject(line_number, e)
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def import_donor_file(repo, stream, fmt='csv', batch_size=BATCH_SIZE):
+    """Import from a binary or text stream"""
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    return import_donors(repo, read_rows(stream, fmt), batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import donors from CSV or JSON Lines')
+    parser.add_argument('file', help='donor list; - reads standard input')
+    parser.add_argument('--format', choices=FORMATS, help='default: from the file extension, else csv')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    from storage import get_repository
+    repo = get_repository()
+    if hasattr(repo, 'initialize_tables') and not repo.initialize_tables():
+        sys.exit("✗ Could not initialize tables")
+
+    fmt = args.format or guess_format(args.file)
+    print(f"Importing {args.file} ({fmt}) into {type(repo).__name__}...")
+    if args.file == '-':
+        report = import_donor_file(repo, sys.stdin.buffer, fmt, args.batch_size)
+    else:
+        with open(args.file, 'rb') as f:
+            report = import_donor_file(repo, f, fmt, args.batch_size)
+    if hasattr(repo, 'close'):
+        repo.close()
+
+    for error in report.errors[:20]:
+        print(f"  ✗ line {error['line']}: {error['error']}")
+    if report.rejected > 20:
+        print(f"  ... and {report.rejected - 20} more rejected rows")
+    print(f"✓ Imported {report.imported} donors, rejected {report.rejected} "
+          f"in {report.seconds:.2f}s ({report.rows_per_second:.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
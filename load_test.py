@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+BloodSync Load Test
+Starts serve.py with each given number of workers in turn, drives it with
+concurrent keep-alive HTTP clients for a fixed time, and reports requests
+per second and latency percentiles, so the gain from each extra worker is
+visible. Use a shared backend (BLOODSYNC_BACKEND=sqlite or dynamodb); the
+server inherits this process's environment.
+
+Client load runs in separate processes, so it isn't capped by the GIL of
+the process measuring it. On a host with fewer CPUs than workers, the
+clients and workers compete for the same cores.
+
+Usage: python load_test.py [--workers 1,2,4] [--threads 8] [--clients 32]
+                           [--seconds 10] [--port 5099] [--path /api/statistics ...]
+"""
+
+import argparse
+import http.client
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+# Read-heavy mix of pages and API calls that don't depend on existing IDs
+DEFAULT_PATHS = ('/', '/blood-inventory', '/api/statistics', '/search-donors', '/health')
+
+CLIENT_PROCESSES = max(1, min(4, os.cpu_count() or 1))
+
+
+def wait_until_up(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def client_process(port, paths, threads, seconds, results):
+    """Run `threads` keep-alive clients for `seconds`; put (latencies, errors) on results"""
+    stop_at = time.monotonic() + seconds
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def client(offset):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        mine = []
+        failed = 0
+        i = offset
+        while time.monotonic() < stop_at:
+            path = paths[i % len(paths)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 500:
+                    failed += 1
+                mine.append(time.perf_counter() - started)
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    results.put((latencies, errors[0]))
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def run_load(port, paths, clients, seconds):
+    """Drive the server with `clients` connections; returns (requests, errors, latencies)"""
+    results = multiprocessing.Queue()
+    per_process = [clients // CLIENT_PROCESSES + (i < clients % CLIENT_PROCESSES)
+                   for i in range(CLIENT_PROCESSES)]
+    processes = [multiprocessing.Process(target=client_process, args=(port, paths, n, seconds, results))
+                 for n in per_process if n]
+    for process in processes:
+        process.start()
+    latencies = []
+    errors = 0
+    for _ in processes:
+        mine, failed = results.get()
+        latencies.extend(mine)
+        errors += failed
+    for process in processes:
+        process.join()
+    latencies.sort()
+    return len(latencies), errors, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure BloodSync throughput per worker count')
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated worker counts')
+    parser.add_argument('--threads', type=int, default=8, help='request threads per worker')
+    parser.add_argument('--clients', type=int, default=32, help='concurrent client connections')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--path', action='append', dest='paths', help='URL path to request (repeatable)')
+    args = parser.parse_args()
+    paths = args.paths or list(DEFAULT_PATHS)
+    backend = os.environ.get('BLOODSYNC_BACKEND', 'memory')
+
+    print("=" * 70)
+    print(f"BloodSync Load Test: {args.clients} clients for {args.seconds:.0f}s per run, "
+          f"{backend} backend, {os.cpu_count()} CPUs")
+    print("=" * 70)
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    baseline = None
+    for workers in (int(n) for n in args.workers.split(',')):
+        server = subprocess.Popen(
+            [sys.executable, 'serve.py', '--bind', f'127.0.0.1:{args.port}',
+             '--workers', str(workers), '--threads', str(args.threads)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        try:
+            if not wait_until_up(args.port):
+                sys.exit(f"✗ Server with {workers} workers did not come up")
+            run_load(args.port, paths, args.clients, 1)  # warm-up
+            requests, errors, latencies = run_load(args.port, paths, args.clients, args.seconds)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+        rate = requests / args.seconds
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>10.0f} {rate / baseline:>7.2f}x "
+              f"{percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f} "
+              f"{errors:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""
+BloodSync - Vectorized Donor Matching
+Column-oriented mirror of the donor table and array versions of the
+eligibility rules used by match_blood_request.
+"""
+
+from collections import namedtuple
+from datetime import date, datetime
+
+import numpy as np
+
+from compatibility import UNKNOWN_CODE, filter_compatible, group_code
+
+# Days required between two donations
+DONATION_GAP_DAYS = 56
+
+# last_day markers for donors without a usable last_donation date
+NO_DONATION = 0
+BAD_DATE = -1
+
+
+def parse_donation_day(last_donation):
+    """Convert a 'YYYY-MM-DD' last_donation value into a day number (date ordinal)"""
+    if not last_donation:
+        return NO_DONATION
+    try:
+        if len(last_donation) == 10 and last_donation[4] == last_donation[7] == '-':
+            return date.fromisoformat(last_donation).toordinal()
+        return datetime.strptime(last_donation, '%Y-%m-%d').toordinal()
+    except (TypeError, ValueError):
+        return BAD_DATE
+
+
+def today_number():
+    """Get today's day number (date ordinal)"""
+    return date.today().toordinal()
+
+
+def next_eligible_day(last_day):
+    """Day number from which a donor may donate again (NO_DONATION if no deferral applies)"""
+    return last_day + DONATION_GAP_DAYS if last_day > NO_DONATION else NO_DONATION
+
+
+def base_score(donor, last_day):
+    """
+    Date-independent part of the eligibility score, unclipped
+    Only the "more than 90 days since last donation" bonus depends on today.
+    """
+    score = 100
+    age = donor.get('age', 0) or 0
+    if 25 <= age <= 45:
+        score += 10
+    elif age < 18 or age > 65:
+        score -= 50
+    if not donor.get('available', True):
+        score -= 100
+    if last_day == NO_DONATION:
+        score += 10
+    score += min((donor.get('total_donations', 0) or 0) * 2, 20)
+    return score
+
+
+class DonorColumns:
+    """
+    Array-backed copy of the donor fields used for matching, one row per donor.
+    Rows are appended on insert and swap-removed on delete. Per-donor parts of
+    the score and of the ranking key are computed once at write time, so a
+    match only evaluates the date-dependent terms over the candidate rows.
+    """
+
+    _COLUMNS = ('group_code', 'age', 'available', 'active', 'last_day', 'next_eligible_day',
+                'total_donations', 'seq', 'base_score', 'tie_key')
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.ids = []
+        self.rows = {}
+        # Bumped whenever rows move, so ranked results can detect stale row numbers
+        self.removals = 0
+        self.group_code = np.full(capacity, UNKNOWN_CODE, dtype=np.uint8)
+        self.age = np.zeros(capacity, dtype=np.int32)
+        self.available = np.zeros(capacity, dtype=bool)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.last_day = np.zeros(capacity, dtype=np.int32)
+        self.next_eligible_day = np.zeros(capacity, dtype=np.int32)
+        self.total_donations = np.zeros(capacity, dtype=np.int32)
+        self.seq = np.zeros(capacity, dtype=np.int64)
+        # Eligibility score without the date term
+        self.base_score = np.zeros(capacity, dtype=np.int16)
+        # Low bits of the ranking key: (last_day + 1) << 32 | inverted seq
+        self.tie_key = np.zeros(capacity, dtype=np.int64)
+
+    def _grow(self):
+        for name in self._COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros(len(column) * 2, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def put(self, donor_id, donor, seq):
+        """Insert or overwrite the row of a donor"""
+        row = self.rows.get(donor_id)
+        if row is None:
+            if self.size == len(self.seq):
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.ids.append(donor_id)
+            self.rows[donor_id] = row
+        last_day = parse_donation_day(donor.get('last_donation'))
+        self.group_code[row] = group_code(donor.get('blood_group'))
+        self.age[row] = donor.get('age', 0) or 0
+        self.available[row] = bool(donor.get('available'))
+        self.active[row] = donor.get('status') == 'active'
+        self.last_day[row] = last_day
+        self.next_eligible_day[row] = next_eligible_day(last_day)
+        self.total_donations[row] = donor.get('total_donations', 0) or 0
+        self.seq[row] = seq
+        self.base_score[row] = base_score(donor, last_day)
+        self.tie_key[row] = (last_day + 1) << 32 | (0xFFFFFFFF - seq)
+
+    def remove(self, donor_id):
+        """Drop a donor's row, moving the last row into its place"""
+        row = self.rows.pop(donor_id, None)
+        if row is None:
+            return
+        last = self.size - 1
+        if row != last:
+            for name in self._COLUMNS:
+                column = getattr(self, name)
+                column[row] = column[last]
+            moved_id = self.ids[last]
+            self.ids[row] = moved_id
+            self.rows[moved_id] = row
+        self.ids.pop()
+        self.size = last
+        self.removals += 1
+
+    def clear(self):
+        self.size = 0
+        self.ids = []
+        self.rows = {}
+        self.removals += 1
+
+    def rows_for(self, donor_ids):
+        """Get the row numbers of the given donor IDs"""
+        return np.fromiter((self.rows[d] for d in donor_ids if d in self.rows), dtype=np.int64)
+
+    def candidate_rows(self, recipient_blood_group, rows=None):
+        """
+        Get rows of available, active donors compatible with recipient_blood_group
+        rows restricts the search to a subset (e.g. a location match)
+        """
+        if rows is None:
+            n = self.size
+            keep = filter_compatible(self.group_code[:n], recipient_blood_group)
+            return np.flatnonzero(keep & self.available[:n] & self.active[:n])
+        keep = filter_compatible(self.group_code[rows], recipient_blood_group)
+        return rows[keep & self.available[rows] & self.active[rows]]
+
+    def can_donate(self, rows, today=None):
+        """Per row: is the 56-day deferral since the last donation over?"""
+        today = today_number() if today is None else today
+        return self.next_eligible_day[rows] <= today
+
+    def eligibility(self, rows, today=None):
+        """Eligibility score (0-150) per row"""
+        today = today_number() if today is None else today
+        last = self.last_day[rows]
+        score = self.base_score[rows]
+        score += ((last > NO_DONATION) & (last < today - 90)) * np.int16(5)
+        return np.clip(score, 0, 150, out=score)
+
+    def top_k(self, rows, scores, k):
+        """
+        Pick the k best rows: highest score, then most recent last donation,
+        then earliest registration. Returns positions into rows, best first.
+        """
+        if k <= 0:
+            return np.arange(0)
+        # Score in the high bits, precomputed tie-break key in the low bits
+        key = scores.astype(np.int64) << 52
+        key |= self.tie_key[rows]
+        if k < len(key):
+            best = np.argpartition(key, len(key) - k)[len(key) - k:]
+        else:
+            best = np.arange(len(key))
+        return best[np.argsort(-key[best])]
+
+
+Eligibility = namedtuple('Eligibility', ['match_score', 'can_donate_now', 'next_eligible_day'])
+
+
+def compute_eligibility(donor, today=None):
+    """Compute a donor's Eligibility (match score, deferral and next eligible day)"""
+    today = today_number() if today is None else today
+    last_day = parse_donation_day(donor.get('last_donation'))
+    score = base_score(donor, last_day)
+    if last_day > NO_DONATION and today - last_day > 90:
+        score += 5
+    next_day = next_eligible_day(last_day)
+    return Eligibility(max(0, min(score, 150)), next_day <= today, next_day)
+
+
+class EligibilityCache:
+    """
+    Per-donor eligibility for the current day.
+    Entries are keyed by donor ID and record version, so a rewritten donor is
+    recomputed; the whole cache is dropped when the date rolls over.
+    """
+
+    def __init__(self):
+        self._epoch = None
+        self._entries = {}
+
+    def get(self, donor_id, version, donor, today=None):
+        """Get the Eligibility of a donor, computing it on a miss"""
+        today = today_number() if today is None else today
+        if today != self._epoch:
+            self._entries.clear()
+            self._epoch = today
+        entry = self._entries.get(donor_id)
+        if entry is None or entry[0] != version:
+            entry = (version, compute_eligibility(donor, today))
+            self._entries[donor_id] = entry
+        return entry[1]
+
+    def invalidate(self, donor_id):
+        self._entries.pop(donor_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class RankedMatches:
+    """
+    Scored candidates of one match, ranked lazily.
+    Scores are computed once; the ranked prefix is extended by doubling
+    (argpartition over the scores already held), so paging past the first
+    results never re-scores and never fully sorts unless iterated to the end.
+    """
+
+    PAGE_SIZE = 10
+
+    def __init__(self, columns, rows, today=None):
+        today = today_number() if today is None else today
+        self.columns = columns
+        self.rows = rows
+        self.scores = columns.eligibility(rows, today)
+        self.can_donate_now = columns.can_donate(rows, today)
+        self._order = np.arange(0)
+        self._removals = columns.removals
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _rank(self, n):
+        n = min(n, len(self.rows))
+        if n > len(self._order):
+            n = min(max(n, 2 * len(self._order)), len(self.rows))
+            self._order = self.columns.top_k(self.rows, self.scores, n)
+
+    def page(self, offset=0, limit=PAGE_SIZE):
+        """Get (donor_id, match_score, can_donate_now) for ranks offset .. offset+limit"""
+        if self.columns.removals != self._removals:
+            raise RuntimeError('donor table changed since the match was scored')
+        self._rank(offset + limit)
+        return [
+            (self.columns.ids[self.rows[i]], int(self.scores[i]), bool(self.can_donate_now[i]))
+            for i in self._order[offset:offset + limit]
+        ]
+
+    def __iter__(self):
+        offset = 0
+        while offset < len(self.rows):
+            batch = self.page(offset, self.PAGE_SIZE)
+            yield from batch
+            offset += len(batch)
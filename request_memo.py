@@ -0,0 +1,150 @@
+"""
+BloodSync - Request-scoped Memoization
+Results computed while handling one HTTP request, keyed on function and
+arguments, so that helpers and pages asking for the same donors, matches or
+counts share one read. The memo lives on flask.g and is dropped at teardown;
+outside a request (startup, CLI scripts) nothing is memoized.
+"""
+
+import threading
+from collections.abc import Iterator
+from concurrent.futures import Future
+from functools import wraps
+
+from flask import g, has_app_context
+
+# Repository methods that only read and return a reusable value; open_requests
+# and iter_records return one-shot iterators and are never memoized
+REPOSITORY_READS = (
+    'get_donor', 'get_donors', 'list_donors', 'count_donors', 'search_donors', 'rank_donors',
+    'donor_eligibility', 'has_eligible_donor',
+    'get_user_by_email', 'get_requestor', 'count_requestors',
+    'get_request', 'get_requests', 'list_requests', 'count_requests', 'count_requests_by_status',
+    'requests_for_requestor', 'recent_requests',
+    'get_assignment', 'assignments_for_donor', 'assignments_for_request', 'assignments_for_requests',
+    'has_assignment', 'list_assignments',
+    'donations_for_donor', 'donations_for_request', 'donations_for_requests', 'list_donations',
+    'recent_donations',
+    'get_donor_and_request', 'page',
+    'get_inventory', 'inventory_units', 'total_units', 'critical_groups',
+)
+
+# Repository methods that write: they clear the memo, so reads after them see the change
+REPOSITORY_WRITE_PREFIXES = ('put_', 'adjust_', 'add_', 'confirm_', 'use_')
+
+
+def freeze(value):
+    """Hashable stand-in for an argument (dicts and lists by content)"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze(item) for item in value)
+    return value
+
+
+class RequestMemo:
+    """
+    Results by (function, arguments) for one request. Thread-safe: reads
+    fanned out to other threads share it, and a result being computed by
+    one thread is waited for, not recomputed, by the others.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        with self._lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = self._results[key] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+        if owner:
+            try:
+                future.set_result(compute())
+            except BaseException as e:
+                # Failures are not memoized: the next caller tries again
+                with self._lock:
+                    self._results.pop(key, None)
+                future.set_exception(e)
+        return future.result()
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+def current_memo():
+    """The memo of the request being handled, or None outside a request"""
+    if not has_app_context():
+        return None
+    memo = g.get('_request_memo')
+    if memo is None:
+        memo = g._request_memo = RequestMemo()
+    return memo
+
+
+def memoized_call(name, func, args, kwargs):
+    memo = current_memo()
+    if memo is None:
+        return func(*args, **kwargs)
+    # Iterator arguments (e.g. generators of IDs) can only be read once
+    args = tuple(tuple(arg) if isinstance(arg, Iterator) else arg for arg in args)
+    key = (name, freeze(args), freeze(kwargs))
+    return memo.get(key, lambda: func(*args, **kwargs))
+
+
+def memoize(func):
+    """
+    Memoize func for the rest of the current request. Callers get the same
+    result object, so they must not modify it.
+    """
+    name = f'{func.__module__}.{func.__qualname__}'
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return memoized_call(name, func, args, kwargs)
+    return wrapper
+
+
+class MemoizedRepository:
+    """
+    Wraps a repository so that its reads are memoized per request and its
+    writes clear the memo. Everything else passes through unchanged.
+    """
+
+    def __init__(self, repository, reads=REPOSITORY_READS):
+        self.repository = repository
+        self._reads = frozenset(reads)
+
+    def __getattr__(self, name):
+        attribute = getattr(self.repository, name)
+        if not callable(attribute):
+            return attribute
+        if name in self._reads:
+            def read(*args, **kwargs):
+                return memoized_call(f'repository.{name}', attribute, args, kwargs)
+            return read
+        if name.startswith(REPOSITORY_WRITE_PREFIXES):
+            def write(*args, **kwargs):
+                memo = current_memo()
+                try:
+                    return attribute(*args, **kwargs)
+                finally:
+                    if memo is not None:
+                        memo.clear()
+            return write
+        return attribute
+
+
+def init_app(app):
+    @app.teardown_appcontext
+    def drop_request_memo(exception=None):
+        g.pop('_request_memo', None)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+BloodSync - Production Server
+Serves app.py with gunicorn instead of the Werkzeug development server:
+a master process supervising WORKERS forked worker processes with THREADS
+request threads each (gthread workers).
+
+Several workers need a backend all of them can use (BLOODSYNC_BACKEND=sqlite
+or dynamodb). The app, its tables and any sample data are then loaded once
+in the master before forking, and each worker opens its own connections.
+The memory backend keeps its data inside one process, so it runs a single
+worker that loads the app itself.
+
+Usage: python serve.py [--bind 0.0.0.0:5000] [--workers N] [--threads N]
+
+    BLOODSYNC_WORKERS   worker processes (default 2 x CPUs + 1)
+    BLOODSYNC_THREADS   request threads per worker (default 8); also sizes
+                        the DynamoDB connection pool
+
+kill -HUP <master pid> (systemctl reload bloodsync) replaces the workers.
+On sqlite and dynamodb this is graceful: new workers start, old ones finish
+their requests and exit. The app code is preloaded, so deploying new code
+needs a restart. On the memory backend a reload is a restart of its worker:
+the old worker finishes its requests and exits (releasing the data
+directory of BLOODSYNC_DATA_DIR) before the new one starts, so requests
+wait while it loads, and without BLOODSYNC_DATA_DIR the data is reseeded.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import sys
+import time
+
+from gunicorn.app.base import BaseApplication
+
+from storage import SHARED_BACKENDS
+
+logger = logging.getLogger('bloodsync.serve')
+
+# Request threads per worker; requests mostly wait on storage, so more than one per CPU
+DEFAULT_THREADS = 8
+
+# Seconds a worker gets to finish its requests on reload or shutdown
+GRACEFUL_TIMEOUT = 30
+
+
+def default_workers(cpus=None):
+    """Worker processes for a host: two per CPU plus one, so a core is busy while another worker waits"""
+    return 2 * (cpus or os.cpu_count() or 1) + 1
+
+
+def load_app():
+    """Import the app and create its tables, before any worker starts serving"""
+    from app import app, repo
+    if hasattr(repo, 'initialize_tables') and not repo.initialize_tables():
+        sys.exit("✗ Could not initialize tables")
+    return app
+
+
+def post_fork(server, worker):
+    # Connections made while preloading belong to the master
+    from app import repo
+    repo.after_fork()
+    repo.warm_up()
+
+
+def stop_workers(arbiter):
+    """
+    on_reload hook for single-process backends: stop the running worker
+    before its replacement is spawned, so the two never hold the same data
+    """
+    arbiter.log.info("Stopping the worker before reloading (single-process backend)")
+    arbiter.kill_workers(signal.SIGTERM)
+    deadline = time.monotonic() + GRACEFUL_TIMEOUT
+    while arbiter.WORKERS and time.monotonic() < deadline:
+        arbiter.reap_workers()
+        time.sleep(0.1)
+    if arbiter.WORKERS:
+        arbiter.kill_workers(signal.SIGKILL)
+        while arbiter.WORKERS:
+            arbiter.reap_workers()
+            time.sleep(0.1)
+
+
+def worker_exit(server, worker):
+    from app import repo
+    if hasattr(repo, 'close'):
+        repo.close()
+
+
+class BloodSyncServer(BaseApplication):
+    """gunicorn application running app.py with the given settings"""
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for name, value in self.options.items():
+            self.cfg.set(name, value)
+
+    def load(self):
+        return load_app()
+
+
+def server_options(bind, workers, threads, backend):
+    shared = backend in SHARED_BACKENDS
+    options = {
+        'bind': bind,
+        'workers': workers,
+        'worker_class': 'gthread',
+        'threads': threads,
+        # Load once in the master and fork; the memory backend's single worker loads its own
+        'preload_app': shared,
+        'worker_exit': worker_exit,
+        'graceful_timeout': GRACEFUL_TIMEOUT,
+        'timeout': 60,
+        'keepalive': 5,
+        'accesslog': '-',
+        'errorlog': '-',
+    }
+    if shared:
+        options['post_fork'] = post_fork
+        # Recycle workers now and then, staggered so they don't all restart at once;
+        # a recycled memory backend worker would lose or reload all its data
+        options['max_requests'] = 10000
+        options['max_requests_jitter'] = 1000
+    else:
+        options['on_reload'] = stop_workers
+    return options
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run BloodSync with gunicorn')
+    parser.add_argument('--bind', default=os.environ.get('BLOODSYNC_BIND', '0.0.0.0:5000'))
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('BLOODSYNC_WORKERS', 0)) or None)
+    parser.add_argument('--threads', type=int,
+                        default=int(os.environ.get('BLOODSYNC_THREADS', DEFAULT_THREADS)))
+    args = parser.parse_args()
+
+    backend = os.environ.get('BLOODSYNC_BACKEND', 'memory').lower()
+    workers = args.workers or default_workers()
+    if backend not in SHARED_BACKENDS:
+        if args.workers and args.workers > 1:
+            sys.exit(f"✗ The {backend} backend keeps its data in one process: use --workers 1 "
+                     f"or BLOODSYNC_BACKEND={' or '.join(SHARED_BACKENDS)}")
+        workers = 1
+    # Read by the storage backends (DynamoDB connection pool size) when the app is loaded
+    os.environ['BLOODSYNC_THREADS'] = str(args.threads)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger.info(f"Serving BloodSync on {args.bind}: {workers} workers x {args.threads} threads, "
+                f"{backend} backend")
+    BloodSyncServer(server_options(args.bind, workers, args.threads, backend)).run()
+
+
+if __name__ == '__main__':
+    main()
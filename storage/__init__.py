@@ -0,0 +1,66 @@
+"""
+BloodSync - Storage Backends
+get_repository() picks the backend from the environment:
+
+    BLOODSYNC_BACKEND       memory (default), sqlite or dynamodb
+    BLOODSYNC_DATA_DIR      makes the memory backend durable (write-ahead log + snapshots)
+    BLOODSYNC_SNAPSHOT_EVERY  logged writes between memory snapshots (default 100000)
+    BLOODSYNC_SQLITE_PATH   database file for the sqlite backend
+    AWS_REGION              region for the dynamodb backend
+    DYNAMODB_ENDPOINT_URL   e.g. http://localhost:8000 for DynamoDB Local
+    BLOODSYNC_SCAN_SEGMENTS parallel segments of DynamoDB table scans (default 4)
+    BLOODSYNC_THREADS       request threads per process; sizes the DynamoDB connection pool (default 16)
+    BLOODSYNC_CACHE_TTL     DynamoDB read cache TTLs in seconds, e.g. inventory=5,donors=60
+                            (entities: inventory, donors, requests, open_requests,
+                            donor_groups; 0 disables)
+"""
+
+import os
+
+from storage.base import ConflictError, Repository
+
+BACKENDS = ('memory', 'sqlite', 'dynamodb')
+
+# Backends whose data several processes can use at once (multi-worker servers);
+# the memory backend's state lives in its process
+SHARED_BACKENDS = ('sqlite', 'dynamodb')
+
+
+def get_repository(backend=None):
+    """Create the configured storage backend"""
+    backend = (backend or os.environ.get('BLOODSYNC_BACKEND', 'memory')).lower()
+    # Backend modules are imported lazily so boto3 is only needed for DynamoDB
+    if backend == 'memory':
+        data_dir = os.environ.get('BLOODSYNC_DATA_DIR')
+        if data_dir:
+            from storage.memory import DurableMemoryRepository
+            return DurableMemoryRepository(
+                data_dir, snapshot_every=int(os.environ.get('BLOODSYNC_SNAPSHOT_EVERY', 100000)))
+        from storage.memory import MemoryRepository
+        return MemoryRepository()
+    if backend == 'sqlite':
+        from storage.sqlite import SQLiteRepository
+        return SQLiteRepository(os.environ.get('BLOODSYNC_SQLITE_PATH', 'bloodsync.db'))
+    if backend == 'dynamodb':
+        from storage.dynamodb import DynamoDBRepository
+        return DynamoDBRepository(
+            region_name=os.environ.get('AWS_REGION', 'ap-south-1'),
+            endpoint_url=os.environ.get('DYNAMODB_ENDPOINT_URL') or None,
+            scan_segments=int(os.environ.get('BLOODSYNC_SCAN_SEGMENTS', 4)),
+            threads=int(os.environ.get('BLOODSYNC_THREADS', 16)),
+            cache_ttls=parse_cache_ttls(os.environ.get('BLOODSYNC_CACHE_TTL', ''))
+        )
+    raise ValueError(f'Unknown storage backend {backend!r}; expected one of {", ".join(BACKENDS)}')
+
+
+def parse_cache_ttls(value):
+    """Parse 'entity=seconds,...' into {entity: seconds}"""
+    ttls = {}
+    for part in value.split(','):
+        if part.strip():
+            entity, _, seconds = part.partition('=')
+            ttls[entity.strip()] = float(seconds)
+    return ttls
+
+
+__all__ = ['BACKENDS', 'SHARED_BACKENDS', 'ConflictError', 'Repository', 'get_repository']
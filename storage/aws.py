@@ -0,0 +1,148 @@
+"""
+BloodSync - AWS Client Factory
+One boto3 session per process, and one DynamoDB resource (and its client)
+per region/endpoint shared by every repository and thread. Clients get a
+connection pool sized to the threads serving requests, adaptive retries and
+TCP keepalive, and record the latency of every API call.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Request threads per process when not configured (Flask's threaded server has no fixed size)
+DEFAULT_THREADS = 16
+
+# Attempts per call, including the first; adaptive mode also rate-limits client-side on throttling
+MAX_ATTEMPTS = 10
+
+_lock = threading.Lock()
+_session = None
+_resources = {}
+
+
+def get_session():
+    """Get the process-wide boto3 session (sessions are not thread-safe to create)"""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = boto3.session.Session()
+        return _session
+
+
+def reset():
+    """
+    Forget the session and resources, e.g. in a forked worker process:
+    their pooled connections (and possibly the lock) belong to the parent
+    """
+    global _lock, _session, _resources
+    _lock = threading.Lock()
+    _session = None
+    _resources = {}
+
+
+def client_config(max_pool_connections):
+    return Config(
+        max_pool_connections=max_pool_connections,
+        retries={'mode': 'adaptive', 'total_max_attempts': MAX_ATTEMPTS},
+        tcp_keepalive=True,
+        connect_timeout=5,
+        read_timeout=10,
+    )
+
+
+class CallMetrics:
+    """Per-operation call counts, errors and latency of a boto3 client"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def attach(self, client):
+        events = client.meta.events
+        events.register('before-call', self._before_call)
+        events.register('after-call', self._after_call)
+        events.register('after-call-error', self._after_call_error)
+
+    def _before_call(self, context, **kwargs):
+        context['bloodsync_started'] = time.perf_counter()
+
+    def _after_call(self, model, context, http_response, **kwargs):
+        # Retries happen inside the call, so this is the latency the caller saw
+        self._record(model.name, context, error=http_response.status_code >= 300)
+
+    def _after_call_error(self, model, context, **kwargs):
+        self._record(model.name, context, error=True)
+
+    def _record(self, operation, context, error):
+        started = context.get('bloodsync_started')
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            stats = self._calls.get(operation)
+            if stats is None:
+                stats = self._calls[operation] = {'calls': 0, 'errors': 0, 'total': 0.0, 'max': 0.0}
+            stats['calls'] += 1
+            stats['errors'] += error
+            stats['total'] += elapsed
+            stats['max'] = max(stats['max'], elapsed)
+
+    def snapshot(self):
+        """Get {operation: {'calls', 'errors', 'avg_ms', 'max_ms'}}"""
+        with self._lock:
+            return {
+                operation: {
+                    'calls': stats['calls'],
+                    'errors': stats['errors'],
+                    'avg_ms': round(stats['total'] / stats['calls'] * 1000, 2),
+                    'max_ms': round(stats['max'] * 1000, 2),
+                }
+                for operation, stats in sorted(self._calls.items())
+            }
+
+
+def dynamodb_resource(region_name, endpoint_url=None, max_pool_connections=DEFAULT_THREADS):
+    """
+    Get the shared DynamoDB resource for a region/endpoint. Its client
+    (resource.meta.client) is thread-safe and carries a .metrics CallMetrics.
+    The pool size of the first caller wins.
+    """
+    key = (region_name, endpoint_url)
+    with _lock:
+        resource = _resources.get(key)
+    if resource is not None:
+        return resource
+    resource = get_session().resource(
+        'dynamodb', region_name=region_name, endpoint_url=endpoint_url,
+        config=client_config(max_pool_connections)
+    )
+    metrics = CallMetrics()
+    metrics.attach(resource.meta.client)
+    resource.meta.client.metrics = metrics
+    with _lock:
+        return _resources.setdefault(key, resource)
+
+
+def warm_pool(client, connections, call):
+    """
+    Open up to `connections` pooled connections up front by running call(client)
+    that many times concurrently, so the first requests after a deploy don't
+    pay for TCP and TLS handshakes. Failures are logged, not raised.
+    """
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=connections, thread_name_prefix='aws-warmup') as pool:
+        futures = [pool.submit(call, client) for _ in range(connections)]
+    errors = [future.exception() for future in futures if future.exception() is not None]
+    failed = len(errors)
+    if failed:
+        logger.warning(f"Connection pool warm-up: {failed}/{connections} calls failed ({errors[0]})")
+    else:
+        logger.info(f"✓ Warmed {connections} AWS connections in {time.perf_counter() - started:.2f}s")
+    return connections - failed
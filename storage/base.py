@@ -0,0 +1,370 @@
+"""
+BloodSync - Storage Interface
+Repository contract shared by the in-memory, SQLite and DynamoDB backends.
+
+Records are plain dicts. Reads may return the stored object (in-memory) or a
+copy (SQLite, DynamoDB), so callers always write changes back with put_*().
+"""
+
+from heapq import nlargest
+from itertools import islice
+
+import numpy as np
+
+from compatibility import donor_mask, group_code
+from matching import DonorColumns, RankedMatches, compute_eligibility
+
+# Blood groups in inventory display order
+INVENTORY_GROUPS = ('A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-')
+
+# Blood groups with fewer units than this are reported as critical
+CRITICAL_UNITS = 20
+
+# Donor fields covered by location search
+LOCATION_FIELDS = ('city', 'state', 'pincode')
+
+# Every status a blood request moves through
+REQUEST_STATUSES = ('pending', 'partial', 'fulfilled')
+
+# Request statuses that still need donors
+OPEN_STATUSES = ('pending', 'partial')
+
+# Feed priority of request urgencies (unknown urgencies rank as normal)
+URGENCY_ORDER = {'critical': 0, 'high': 1, 'normal': 2}
+
+
+def with_group_code(record):
+    """Stamp a donor or request record with the code of its blood group"""
+    record['group_code'] = group_code(record.get('blood_group'))
+    return record
+
+
+def location_matches(record, location, fields=LOCATION_FIELDS):
+    """Check if location is a case-insensitive substring of any of the record's fields"""
+    location = location.lower()
+    return any(location in str(record.get(field) or '').lower() for field in fields)
+
+
+def open_request_key(request_data):
+    """Sort key of the donor request feed: urgency, then oldest first"""
+    return (URGENCY_ORDER.get(request_data.get('urgency'), 2),
+            request_data.get('created_at') or '1900-01-01')
+
+
+class ConflictError(Exception):
+    """A conditional write found its records changed since they were read"""
+
+
+class Repository:
+    """
+    Storage backend interface
+    Backends implement the abstract methods; the rest have generic
+    implementations that backends override when they can do better.
+    """
+
+    # Whether the app should load sample data into an empty store on startup
+    seed_sample_data = False
+
+    def warm_up(self):
+        """Open connections ahead of the first request (remote backends)"""
+
+    def after_fork(self):
+        """Drop connections inherited from the parent in a forked worker process"""
+
+    def gather(self, calls):
+        """
+        Run independent zero-argument reads and return their results in order.
+        Remote backends run them concurrently, so a page waits for the slowest
+        round trip instead of their sum. Calls must not call gather() themselves.
+        """
+        return [call() for call in calls]
+
+    def metrics(self):
+        """Get backend counters for /api/metrics, e.g. per-call latencies"""
+        return {}
+
+    # ---------- donors ----------
+
+    def get_donor(self, donor_id):
+        raise NotImplementedError
+
+    def get_donors(self, donor_ids):
+        """Batched get; missing IDs are skipped"""
+        donors = (self.get_donor(donor_id) for donor_id in donor_ids)
+        return [donor for donor in donors if donor is not None]
+
+    def put_donor(self, donor, donor_donations=None):
+        """
+        Write a donor. With donor_donations, only if the stored donor's
+        total_donations is still that count, else raise ConflictError.
+        """
+        raise NotImplementedError
+
+    def put_donors(self, donors):
+        """Batched put"""
+        for donor in donors:
+            self.put_donor(donor)
+
+    def list_donors(self):
+        raise NotImplementedError
+
+    def count_donors(self):
+        return len(self.list_donors())
+
+    def search_donors(self, mask=None, location=None, fields=LOCATION_FIELDS):
+        """
+        Find available, active donors whose group code bit is set in mask
+        (every group if None) and whose location fields contain location.
+        Returns donors in registration order.
+        """
+        raise NotImplementedError
+
+    def rank_donors(self, recipient_blood_group, location=None):
+        """Score compatible, available donors for a recipient; returns a RankedMatches"""
+        donors = self.search_donors(donor_mask(recipient_blood_group), location,
+                                    fields=('city', 'state'))
+        columns = DonorColumns(max(len(donors), 1))
+        for seq, donor in enumerate(donors):
+            columns.put(donor['donor_id'], donor, seq)
+        return RankedMatches(columns, np.arange(columns.size))
+
+    def donor_eligibility(self, donor_id, donor=None):
+        """
+        Get a donor's Eligibility (match_score, can_donate_now, next_eligible_day)
+        Pass the donor's record if it was already read, to save reading it again
+        """
+        return compute_eligibility(donor or self.get_donor(donor_id))
+
+    def has_eligible_donor(self, recipient_blood_group):
+        """Check if any compatible, available donor is past the donation gap"""
+        return any(compute_eligibility(donor).can_donate_now
+                   for donor in self.search_donors(donor_mask(recipient_blood_group)))
+
+    # ---------- users ----------
+
+    def get_user_by_email(self, email):
+        """Get the site account registered with an email address, or None"""
+        raise NotImplementedError
+
+    def put_user(self, user):
+        raise NotImplementedError
+
+    # ---------- requestors ----------
+
+    def get_requestor(self, requestor_id):
+        raise NotImplementedError
+
+    def put_requestor(self, requestor):
+        raise NotImplementedError
+
+    def count_requestors(self):
+        raise NotImplementedError
+
+    # ---------- blood requests ----------
+
+    def get_request(self, request_id):
+        raise NotImplementedError
+
+    def get_requests(self, request_ids):
+        """Batched get; missing IDs are skipped"""
+        requests = (self.get_request(request_id) for request_id in request_ids)
+        return [request_data for request_data in requests if request_data is not None]
+
+    def put_request(self, request_data):
+        raise NotImplementedError
+
+    def put_requests(self, requests):
+        """Batched put"""
+        for request_data in requests:
+            self.put_request(request_data)
+
+    def list_requests(self):
+        raise NotImplementedError
+
+    def count_requests(self):
+        return len(self.list_requests())
+
+    def count_requests_by_status(self, *statuses):
+        return sum(1 for r in self.list_requests() if r.get('status') in statuses)
+
+    def requests_for_requestor(self, requestor_id):
+        return [r for r in self.list_requests() if r.get('requestor_id') == requestor_id]
+
+    def recent_requests(self, limit):
+        """Get the newest requests by created_at"""
+        return sorted(self.list_requests(), key=lambda x: (x.get('created_at') or ''),
+                      reverse=True)[:limit]
+
+    def open_requests(self, mask):
+        """
+        Iterate open (pending/partial) requests whose group code bit is set in
+        mask, most urgent first, then oldest first
+        """
+        raise NotImplementedError
+
+    # ---------- donor-request assignments ----------
+
+    def get_assignment(self, assignment_id):
+        raise NotImplementedError
+
+    def put_assignment(self, assignment, assignment_statuses=None):
+        """
+        Write an assignment. With assignment_statuses, only if the stored
+        assignment's status is still one of them, else raise ConflictError.
+        """
+        raise NotImplementedError
+
+    def assignments_for_donor(self, donor_id):
+        raise NotImplementedError
+
+    def assignments_for_request(self, request_id):
+        raise NotImplementedError
+
+    def assignments_for_requests(self, request_ids):
+        """Get {request_id: assignments} for several requests (creation order)"""
+        return {request_id: self.assignments_for_request(request_id) for request_id in request_ids}
+
+    def has_assignment(self, donor_id, request_id):
+        return any(a['request_id'] == request_id for a in self.assignments_for_donor(donor_id))
+
+    def list_assignments(self):
+        raise NotImplementedError
+
+    # ---------- donations ----------
+
+    def put_donation(self, donation):
+        raise NotImplementedError
+
+    def get_donor_and_request(self, donor_id, request_id):
+        """Get (donor, request) in one round trip where the backend allows; either may be None"""
+        return self.get_donor(donor_id), self.get_request(request_id)
+
+    def confirm_donation(self, assignment, request_data, donor, donation,
+                         assignment_status, fulfilled_units, donor_donations=None):
+        """
+        Write a confirmed donation: the completed assignment, the request with
+        its new fulfilled units, the donor's updated stats and the donation.
+        Nothing is written, and ConflictError is raised, if the stored
+        assignment is no longer in assignment_status or the request's
+        fulfilled_units is no longer fulfilled_units (the values they were
+        read with), or, if donor_donations is given, the donor's
+        total_donations is no longer donor_donations.
+        Backends override this to make the check and the writes atomic.
+        """
+        self._check_confirmation(assignment, request_data, assignment_status, fulfilled_units,
+                                 donor, donor_donations)
+        self.put_assignment(assignment)
+        self.put_request(request_data)
+        self.put_donor(donor)
+        self.put_donation(donation)
+
+    def _check_confirmation(self, assignment, request_data, assignment_status, fulfilled_units,
+                            donor=None, donor_donations=None):
+        current_assignment = self.get_assignment(assignment['assignment_id'])
+        current_request = self.get_request(request_data['request_id'])
+        if current_assignment is None or current_assignment.get('status') != assignment_status:
+            raise ConflictError(f"Assignment {assignment['assignment_id']} is no longer {assignment_status}")
+        if current_request is None or current_request.get('fulfilled_units', 0) != fulfilled_units:
+            raise ConflictError(f"Request {request_data['request_id']} changed since it was read")
+        if donor_donations is not None:
+            self._check_donor(donor, donor_donations)
+
+    def _check_assignment(self, assignment, assignment_statuses):
+        current = self.get_assignment(assignment['assignment_id'])
+        if current is None or current.get('status') not in assignment_statuses:
+            raise ConflictError(f"Assignment {assignment['assignment_id']} is no longer "
+                                f"{' or '.join(assignment_statuses)}")
+
+    def _check_donor(self, donor, donor_donations):
+        current_donor = self.get_donor(donor['donor_id'])
+        if current_donor is None or current_donor.get('total_donations', 0) != donor_donations:
+            raise ConflictError(f"Donor {donor['donor_id']} changed since it was read")
+
+    def donations_for_donor(self, donor_id):
+        """Get a donor's donations ordered by donation date"""
+        raise NotImplementedError
+
+    def donations_for_request(self, request_id):
+        """Get the donations made towards a request ordered by donation date"""
+        raise NotImplementedError
+
+    def donations_for_requests(self, request_ids):
+        """Get {request_id: donations} for several requests (donation date order)"""
+        return {request_id: self.donations_for_request(request_id) for request_id in request_ids}
+
+    def list_donations(self):
+        raise NotImplementedError
+
+    def recent_donations(self, limit):
+        """Get the newest donations by donation_date"""
+        return nlargest(limit, self.iter_records('donations'),
+                        key=lambda d: d.get('donation_date') or '')
+
+    # ---------- inventory ----------
+
+    def get_inventory(self):
+        """Get {blood_group: {'units': n, 'donor_count': n, ...}} in INVENTORY_GROUPS order"""
+        raise NotImplementedError
+
+    def inventory_units(self, blood_group):
+        return self.get_inventory().get(blood_group, {}).get('units', 0)
+
+    def adjust_inventory(self, blood_group, delta):
+        """Add delta units (may be negative, floored at 0); returns the new unit count"""
+        raise NotImplementedError
+
+    def use_inventory(self, request_data, withdrawal, units, fulfilled_units):
+        """
+        Take units from the stock of the request's blood group towards the
+        request: the stock goes down, the request (with its new fulfilled
+        units) and the withdrawal donation record are written. Nothing is
+        written, and ConflictError is raised, if fewer than units are in
+        stock or the request's fulfilled_units is no longer fulfilled_units.
+        Backends override this to make the check and the writes atomic.
+        """
+        self._check_withdrawal(request_data, units, fulfilled_units)
+        self.adjust_inventory(request_data['blood_group'], -units)
+        self.put_donation(withdrawal)
+        self.put_request(request_data)
+
+    def _check_withdrawal(self, request_data, units, fulfilled_units):
+        available = self.inventory_units(request_data['blood_group'])
+        if available < units:
+            raise ConflictError(f"Only {available} {request_data['blood_group']} units in stock")
+        current_request = self.get_request(request_data['request_id'])
+        if current_request is None or current_request.get('fulfilled_units', 0) != fulfilled_units:
+            raise ConflictError(f"Request {request_data['request_id']} changed since it was read")
+
+    def add_inventory_donor(self, blood_group, donor_id):
+        """Record a registered donor against a blood group's stock"""
+        raise NotImplementedError
+
+    def add_inventory_donors(self, blood_group, donor_ids):
+        """Batched add_inventory_donor"""
+        for donor_id in donor_ids:
+            self.add_inventory_donor(blood_group, donor_id)
+
+    def total_units(self):
+        return sum(stock['units'] for stock in self.get_inventory().values())
+
+    def critical_groups(self):
+        return [bg for bg, stock in self.get_inventory().items() if stock['units'] < CRITICAL_UNITS]
+
+    # ---------- streaming and paging ----------
+
+    def iter_records(self, kind, fields=None):
+        """
+        Stream every record of kind ('donors', 'requests', 'assignments' or
+        'donations'). fields names the attributes the caller needs; backends
+        that can fetch less use it, the rest return whole records.
+        """
+        return iter(getattr(self, f'list_{kind}')())
+
+    def page(self, kind, limit, cursor=None, fields=None):
+        """
+        Get (records, next_cursor) for one page of kind. Cursors are opaque
+        strings; next_cursor is None on the last page.
+        """
+        offset = int(cursor) if cursor and cursor.isdigit() else 0
+        records = list(islice(self.iter_records(kind, fields), offset, offset + limit + 1))
+        return records[:limit], (str(offset + limit) if len(records) > limit else None)
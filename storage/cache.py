@@ -0,0 +1,180 @@
+"""
+BloodSync - Read Cache
+Bounded LRU caches with a time-to-live per entry, used by remote backends
+to serve hot, rarely changing reads (inventory, donor profiles, the open
+request feed) without a round trip. Writes through the same repository
+invalidate the affected entries; writes from other processes become visible
+when the entries expire.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Returned by TTLCache.get for absent or expired keys (None is a cacheable value)
+MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache of at most maxsize entries, each valid for ttl seconds"""
+
+    def __init__(self, maxsize, ttl, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Loads in progress by (key, generation), waited for by concurrent readers
+        # of the same key; a reader never joins a load that began before an invalidation
+        self._loading = {}
+        # Bumped by invalidate(); loads that started before it must not be stored
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, generation=None):
+        """Store value; skipped if the cache was invalidated since `generation` was read"""
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def loading(self, key):
+        """
+        (future, owner, generation): the load of key begun since the last
+        invalidation, or a new one that the caller must finish
+        """
+        with self._lock:
+            generation = self.generation
+            future = self._loading.get((key, generation))
+            if future is not None:
+                return future, False, generation
+            future = self._loading[key, generation] = Future()
+            return future, True, generation
+
+    def loaded(self, key, generation):
+        with self._lock:
+            self._loading.pop((key, generation), None)
+
+    def invalidate(self, *keys):
+        """Drop keys, or every entry if none are given"""
+        with self._lock:
+            self.generation += 1
+            if not keys:
+                self._entries.clear()
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+            }
+
+
+class ReadCache:
+    """
+    Named TTLCaches, one per entity, e.g.
+    ReadCache({'donors': (10000, 60), 'inventory': (1, 5)}).
+    Entities with a TTL of 0 are not cached. Values are copied in and out,
+    since callers edit the records they read before writing them back.
+    """
+
+    def __init__(self, entities):
+        self.caches = {name: TTLCache(maxsize, ttl)
+                       for name, (maxsize, ttl) in entities.items() if ttl > 0}
+
+    def read(self, entity, key, load):
+        """
+        Read-through: the cached value, else load() (cached unless None).
+        Concurrent misses on one key wait for a single load.
+        """
+        cache = self.caches.get(entity)
+        if cache is None:
+            return load()
+        value = cache.get(key)
+        if value is not MISSING:
+            return copy.deepcopy(value)
+        future, owner, generation = cache.loading(key)
+        if not owner:
+            return copy.deepcopy(future.result())
+        try:
+            value = load()
+            if value is not None:
+                cache.put(key, copy.deepcopy(value), generation)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            cache.loaded(key, generation)
+
+    def read_many(self, entity, keys, load_many, key_of):
+        """Read-through for a batch: load_many(missing keys) fetches only the misses"""
+        cache = self.caches.get(entity)
+        if cache is None:
+            return load_many(keys)
+        found = {}
+        missing = []
+        for key in keys:
+            value = cache.get(key)
+            if value is MISSING:
+                missing.append(key)
+            else:
+                found[key] = copy.deepcopy(value)
+        if missing:
+            generation = cache.generation
+            loaded = load_many(missing)
+            found.update((key_of(value), value) for value in loaded)
+            self.put_many(entity, loaded, key_of, generation)
+        return [found[key] for key in keys if key in found]
+
+    def cached(self, entity):
+        return entity in self.caches
+
+    def generation(self, entity):
+        """The entity's invalidation count, to read before loading values for put_many"""
+        cache = self.caches.get(entity)
+        return cache.generation if cache is not None else None
+
+    def put_many(self, entity, values, key_of, generation=None):
+        """Store values read by other means (e.g. a query), unless invalidated since `generation`"""
+        cache = self.caches.get(entity)
+        if cache is not None:
+            for value in values:
+                cache.put(key_of(value), copy.deepcopy(value), generation)
+
+    def invalidate(self, entity, *keys):
+        cache = self.caches.get(entity)
+        if cache is not None:
+            cache.invalidate(*keys)
+
+    def stats(self):
+        return {name: cache.stats() for name, cache in self.caches.items()}
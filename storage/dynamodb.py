@@ -0,0 +1,1076 @@
+"""
+BloodSync - DynamoDB Storage Backend
+One table per record type (BloodSync_*), keyed by the record's ID.
+Lookups by anything other than the ID go through global secondary indexes,
+so no request path scans a table; only the full admin listings do, as
+paginated, optionally parallel (segmented) scans that stream page by page.
+Record counts are atomic counters in one item of the stats table.
+Set endpoint_url to run against DynamoDB Local or a moto server.
+"""
+
+import logging
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from heapq import merge
+
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+
+from compatibility import BLOOD_GROUPS, group_code, groups_in_mask
+from storage import aws
+from storage.aws import DEFAULT_THREADS, dynamodb_resource, warm_pool
+from storage.cache import ReadCache
+from storage.base import (INVENTORY_GROUPS, LOCATION_FIELDS, OPEN_STATUSES, REQUEST_STATUSES,
+                          ConflictError, Repository, location_matches, open_request_key,
+                          with_group_code)
+
+logger = logging.getLogger(__name__)
+
+# Record type -> (table name, hash key)
+TABLES = {
+    'users': ('BloodSync_Users', 'user_id'),
+    'donors': ('BloodSync_Donors', 'donor_id'),
+    'requestors': ('BloodSync_Requestors', 'requestor_id'),
+    'requests': ('BloodSync_Requests', 'request_id'),
+    'inventory': ('BloodSync_Inventory', 'blood_group'),
+    'assignments': ('BloodSync_Assignments', 'assignment_id'),
+    'donations': ('BloodSync_Donations', 'donation_id'),
+    'stats': ('BloodSync_Stats', 'stat_id'),
+}
+
+# Record type -> global secondary indexes: (index name, hash key, range key or None)
+INDEXES = {
+    'users': [('email-index', 'email', None)],
+    'donors': [('blood_group-available-index', 'blood_group', 'available_flag')],
+    'requests': [('status-created_at-index', 'status', 'created_at'),
+                 ('requestor_id-index', 'requestor_id', None)],
+    'assignments': [('donor_id-index', 'donor_id', None),
+                    ('request_id-index', 'request_id', None)],
+    'donations': [('donor_id-index', 'donor_id', None),
+                  ('request_id-index', 'request_id', None),
+                  ('feed-donation_date-index', 'feed', 'donation_date')],
+}
+
+# Index keys can't be booleans, so donors carry a numeric copy of
+# "available and active"; it is stripped again when donors are read
+AVAILABLE_FLAG = 'available_flag'
+KEY_TYPES = {AVAILABLE_FLAG: 'N'}
+
+# Every donation carries the same feed key, so one index partition holds all
+# donations sorted by date for the newest-donations listing; stripped on read
+FEED_KEY = 'feed'
+DONATION_FEED = 'donations'
+
+# Record types counted in the stats table: ADDed to as records are created,
+# so the dashboard totals are one get_item instead of full-table scans.
+# Requests are also counted per status, moved along with each status change.
+COUNTED_KINDS = ('donors', 'requestors', 'requests')
+COUNTS_ID = 'record_counts'
+
+# Requests written by the old AWS app have no requestor; initialize_tables files them
+# under this placeholder requestor so the requestor index can reach them
+LEGACY_REQUESTOR = 'REQ-LEGACY'
+
+# BatchGetItem accepts at most 100 keys per call
+BATCH_GET_SIZE = 100
+
+# Parallel segments of full-table scans (listings and counts)
+SCAN_SEGMENTS = 4
+
+# Read cache per entity: (max entries, TTL seconds); a TTL of 0 disables caching.
+# Writes made through this process invalidate immediately, writes from other
+# processes show up within the TTL.
+CACHE_ENTITIES = {
+    'inventory': (1, 5),
+    # The stats item behind count_donors, count_requestors and count_requests
+    'record_counts': (1, 5),
+    'donors': (10000, 60),
+    'requests': (10000, 30),
+    'open_requests': (256, 10),
+    # IDs of each blood group's available donors; the donors themselves are in 'donors'
+    'donor_groups': (8, 10),
+}
+
+# Attempts at an inventory withdrawal that keeps racing other writers, and the
+# backoff between them (seconds, doubled per attempt, full jitter)
+INVENTORY_RETRIES = 8
+RETRY_BACKOFF = 0.02
+RETRY_BACKOFF_MAX = 1.0
+
+
+def to_dynamo(value):
+    """Convert floats to Decimal (recursively) so boto3 can serialize a record"""
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: to_dynamo(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [to_dynamo(v) for v in value]
+    return value
+
+
+def from_dynamo(value):
+    """Convert boto3's Decimals back to int/float (recursively)"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {k: from_dynamo(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [from_dynamo(v) for v in value]
+    return value
+
+
+def is_condition_failure(error):
+    return error.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException'
+
+
+def is_transaction_conflict(error):
+    """Check if a cancelled transaction failed one of its conditions"""
+    if error.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+        return False
+    reasons = error.response.get('CancellationReasons', [])
+    return any(reason.get('Code') == 'ConditionalCheckFailed' for reason in reasons)
+
+
+def status_counter(status):
+    """Name of the counter of requests in status"""
+    return f'requests_{status}'
+
+
+def count_deltas(kind, old, new):
+    """Counter changes for writing record new over old (None if there was none)"""
+    deltas = {}
+    if old is None:
+        deltas[kind] = 1
+    if kind == 'requests':
+        old_status = old.get('status') if old else None
+        if old_status != new.get('status'):
+            if old_status:
+                deltas[status_counter(old_status)] = -1
+            if new.get('status'):
+                deltas[status_counter(new['status'])] = 1
+    return deltas
+
+
+def hold_status(entry, status):
+    """Extend the condition of a transaction's request Put: the stored status is still status"""
+    put = entry['Put']
+    held = '#st = :st' if status is not None else 'attribute_not_exists(#st)'
+    put['ConditionExpression'] = f"({put['ConditionExpression']}) AND {held}"
+    put['ExpressionAttributeNames']['#st'] = 'status'
+    if status is not None:
+        put['ExpressionAttributeValues'][':st'] = status
+    return entry
+
+
+def seen_condition(seen):
+    """Condition that attribute #c still holds :seen (a missing attribute reads as 0)"""
+    return 'attribute_not_exists(#c) OR #c = :seen' if seen == 0 else '#c = :seen'
+
+
+def backoff(attempt):
+    """Sleep before retry number attempt (0-based): exponential with full jitter"""
+    time.sleep(random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** attempt)))
+
+
+def index_keys(kind):
+    """Get the attributes used as index keys of a record type"""
+    return {key for _, hash_key, range_key in INDEXES.get(kind, ())
+            for key in (hash_key, range_key) if key}
+
+
+def with_available_flag(donor):
+    """Stamp a donor item with the index flag of whether it can be matched"""
+    donor[AVAILABLE_FLAG] = int(bool(donor.get('available')) and donor.get('status') == 'active')
+    return donor
+
+
+def _key_schema(hash_key, range_key):
+    schema = [{'AttributeName': hash_key, 'KeyType': 'HASH'}]
+    if range_key:
+        schema.append({'AttributeName': range_key, 'KeyType': 'RANGE'})
+    return schema
+
+
+def _attribute_definitions(names):
+    return [{'AttributeName': name, 'AttributeType': KEY_TYPES.get(name, 'S')}
+            for name in dict.fromkeys(names)]
+
+
+def _index_definition(name, hash_key, range_key):
+    return {
+        'IndexName': name,
+        'KeySchema': _key_schema(hash_key, range_key),
+        'Projection': {'ProjectionType': 'ALL'}
+    }
+
+
+def _create_table_args(kind):
+    table_name, key = TABLES[kind]
+    indexes = INDEXES.get(kind, [])
+    args = {
+        'TableName': table_name,
+        'KeySchema': _key_schema(key, None),
+        'AttributeDefinitions': _attribute_definitions([key] + sorted(index_keys(kind))),
+        'BillingMode': 'PAY_PER_REQUEST'
+    }
+    if indexes:
+        args['GlobalSecondaryIndexes'] = [_index_definition(*index) for index in indexes]
+    return args
+
+
+def _wait_for_indexes(client, table_name, timeout=600):
+    """Wait until every index of a table is ACTIVE (new indexes backfill first)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        table = client.describe_table(TableName=table_name)['Table']
+        if all(index.get('IndexStatus', 'ACTIVE') == 'ACTIVE'
+               for index in table.get('GlobalSecondaryIndexes', [])):
+            return True
+        time.sleep(5)
+    return False
+
+
+def _add_missing_indexes(client, kind):
+    """Add the indexes an existing table was created without, one at a time"""
+    table_name, key = TABLES[kind]
+    table = client.describe_table(TableName=table_name)['Table']
+    existing = {index['IndexName'] for index in table.get('GlobalSecondaryIndexes', [])}
+    for name, hash_key, range_key in INDEXES.get(kind, []):
+        if name in existing:
+            continue
+        logger.info(f"  Adding index {name} to {table_name}")
+        # DynamoDB only accepts one index creation per update_table call
+        client.update_table(
+            TableName=table_name,
+            AttributeDefinitions=_attribute_definitions([key, hash_key] + ([range_key] if range_key else [])),
+            GlobalSecondaryIndexUpdates=[{'Create': _index_definition(name, hash_key, range_key)}]
+        )
+        if not _wait_for_indexes(client, table_name):
+            logger.error(f"  ✗ Timeout waiting for index {name} on {table_name}")
+            return False
+    return True
+
+
+def initialize_tables(client):
+    """Create the BloodSync tables if they don't exist and wait for them to be active"""
+    logger.info("Initializing DynamoDB tables...")
+    try:
+        existing_tables = set(client.list_tables()['TableNames'])
+        logger.info(f"✓ AWS connection successful, found {len(existing_tables)} existing tables")
+    except Exception as e:
+        logger.error(f"✗ AWS Connection Error: {type(e).__name__}: {e}")
+        logger.error("  Check AWS credentials (aws configure), region and IAM permissions")
+        return False
+
+    for kind, (table_name, _) in TABLES.items():
+        if table_name in existing_tables:
+            logger.info(f"  ✓ Table exists: {table_name}")
+            try:
+                if not _add_missing_indexes(client, kind):
+                    return False
+            except Exception as e:
+                logger.error(f"  ✗ Error adding indexes to {table_name}: {e}")
+                return False
+            continue
+        try:
+            logger.info(f"  Creating table: {table_name}")
+            client.create_table(**_create_table_args(kind))
+        except client.exceptions.ResourceInUseException:
+            logger.info(f"  ✓ Table already exists: {table_name}")
+        except Exception as e:
+            logger.error(f"  ✗ Error creating table {table_name}: {e}")
+            return False
+
+    logger.info("Waiting for tables to become active (max 60 seconds)...")
+    waiter = client.get_waiter('table_exists')
+    for table_name, _ in TABLES.values():
+        try:
+            waiter.wait(TableName=table_name, WaiterConfig={'Delay': 1, 'MaxAttempts': 60})
+        except Exception as e:
+            logger.error(f"  ✗ Timeout waiting for {table_name}: {e}")
+            return False
+
+    for table_name, _ in TABLES.values():
+        if not _wait_for_indexes(client, table_name):
+            logger.error(f"  ✗ Timeout waiting for the indexes of {table_name}")
+            return False
+
+    logger.info("✓ All tables ready!")
+    return True
+
+
+class DynamoDBRepository(Repository):
+    """Repository backed by DynamoDB tables"""
+
+    def __init__(self, region_name='ap-south-1', endpoint_url=None, scan_segments=SCAN_SEGMENTS,
+                 threads=DEFAULT_THREADS, cache_ttls=None):
+        self.scan_segments = max(1, scan_segments)
+        self.threads = max(1, threads)
+        self.cache = ReadCache({
+            entity: (maxsize, (cache_ttls or {}).get(entity, ttl))
+            for entity, (maxsize, ttl) in CACHE_ENTITIES.items()
+        })
+        self.region_name = region_name
+        self.endpoint_url = endpoint_url
+        self._connect()
+        # Runs gather() reads; created on first use, so forked workers start their own
+        self._read_pool = None
+        self._read_pool_lock = threading.Lock()
+
+    def _connect(self):
+        # Every request thread may run a segmented scan, each segment on its own connection
+        self.resource = dynamodb_resource(self.region_name, self.endpoint_url,
+                                          max_pool_connections=self.threads * self.scan_segments)
+        self.client = self.resource.meta.client
+        self.tables = {kind: self.resource.Table(name) for kind, (name, _) in TABLES.items()}
+
+    def after_fork(self):
+        aws.reset()
+        self._connect()
+        self._read_pool = None
+        self._read_pool_lock = threading.Lock()
+
+    def gather(self, calls):
+        calls = list(calls)
+        if len(calls) < 2:
+            return [call() for call in calls]
+        with self._read_pool_lock:
+            if self._read_pool is None:
+                # One reader per request thread; segmented scans bring their own threads
+                self._read_pool = ThreadPoolExecutor(max_workers=self.threads,
+                                                     thread_name_prefix='dynamodb-read')
+        futures = [self._read_pool.submit(call) for call in calls]
+        return [future.result() for future in futures]
+
+    def warm_up(self):
+        # One cheap read per request thread opens that many pooled connections
+        table_name = TABLES['inventory'][0]
+        warm_pool(self.client, self.threads,
+                  lambda client: client.get_item(TableName=table_name, Key={'blood_group': INVENTORY_GROUPS[0]}))
+
+    def metrics(self):
+        # Cache hits are reads (and read capacity) that never reached DynamoDB
+        return {'dynamodb_calls': self.client.metrics.snapshot(), 'cache': self.cache.stats()}
+
+    def initialize_tables(self):
+        if not initialize_tables(self.client):
+            return False
+        # Donors written before the index existed have no flag and would be invisible to search
+        unflagged = self._scan('donors', Attr(AVAILABLE_FLAG).not_exists())
+        if unflagged:
+            logger.info(f"  Indexing {len(unflagged)} existing donors")
+            self._put_many('donors', unflagged)
+        # Likewise donations written before the feed index, for the newest-donations listing
+        unfed = self._scan('donations', Attr(FEED_KEY).not_exists())
+        if unfed:
+            logger.info(f"  Indexing {len(unfed)} existing donations")
+            self._put_many('donations', unfed)
+        self._seed_counts()
+        # After seeding, so the placeholder requestor is added to seeded counters
+        self._key_legacy_requests()
+        return True
+
+    def _key_legacy_requests(self):
+        """
+        Give requests written by the old AWS app the index keys they lack:
+        created_at (from its requested_at), status and a requestor. Without
+        them the sparse indexes leave these requests out of the statistics,
+        the request feeds and the requestor lookups.
+        """
+        unkeyed = self._scan('requests', Attr('created_at').not_exists() | Attr('status').not_exists()
+                             | Attr('requestor_id').not_exists())
+        if not unkeyed:
+            return
+        logger.info(f"  Indexing {len(unkeyed)} existing requests")
+        for request_data in unkeyed:
+            if not request_data.get('created_at'):
+                # str(datetime) of the old app, cut to the seconds the app writes
+                request_data['created_at'] = str(request_data.get('requested_at') or '1900-01-01 00:00:00')[:19]
+            if not request_data.get('status'):
+                done = request_data.get('fulfilled_units', 0) >= request_data.get('units_needed', 0)
+                request_data['status'] = 'fulfilled' if done else 'pending'
+            if not request_data.get('requestor_id'):
+                request_data['requestor_id'] = LEGACY_REQUESTOR
+        if any(r['requestor_id'] == LEGACY_REQUESTOR for r in unkeyed) and not self.get_requestor(LEGACY_REQUESTOR):
+            self.put_requestor({'requestor_id': LEGACY_REQUESTOR, 'name': 'Requests from the old AWS app',
+                                'email': '', 'registered_at': '1900-01-01 00:00:00', 'total_requests': 0})
+        self.put_requests(unkeyed)
+
+    def _seed_counts(self):
+        """Count the records once, with a scan, if the stats table has no counters yet"""
+        if self._get('stats', COUNTS_ID) is not None:
+            return
+        counts = {kind: self._count(kind) for kind in COUNTED_KINDS}
+        # Scanned, not queried: requests lacking created_at are not in the status index yet
+        counts.update({status_counter(status): self._count('requests', Attr('status').eq(status))
+                       for status in REQUEST_STATUSES})
+        logger.info(f"  Counting existing records: {counts}")
+        try:
+            self.tables['stats'].put_item(Item={'stat_id': COUNTS_ID, **counts},
+                                          ConditionExpression=Attr('stat_id').not_exists())
+        except ClientError as e:
+            # Another process seeded them first
+            if not is_condition_failure(e):
+                raise
+        self.cache.invalidate('record_counts')
+
+    # ---------- generic item access ----------
+
+    def _item(self, kind, record):
+        """Convert a record to an item; empty index keys are left out (sparse index)"""
+        item = to_dynamo(record)
+        for key in index_keys(kind):
+            if key in item and item[key] is None:
+                del item[key]
+        if kind == 'donors':
+            with_available_flag(item)
+        elif kind == 'donations':
+            item[FEED_KEY] = DONATION_FEED
+        return item
+
+    def _record(self, kind, item, projected=False):
+        """Convert an item back to the record that was put (or the projected part of it)"""
+        record = from_dynamo(item)
+        if not projected:
+            for key in index_keys(kind):
+                record.setdefault(key, None)
+        record.pop(AVAILABLE_FLAG, None)
+        if kind == 'donations':
+            record.pop(FEED_KEY, None)
+        return record
+
+    def _get(self, kind, key):
+        item = self.tables[kind].get_item(Key={TABLES[kind][1]: key}).get('Item')
+        return self._record(kind, item) if item is not None else None
+
+    def _get_many(self, kind, keys):
+        table_name, key_name = TABLES[kind]
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        for i in range(0, len(keys), BATCH_GET_SIZE):
+            request = {table_name: {'Keys': [{key_name: k} for k in keys[i:i + BATCH_GET_SIZE]]}}
+            while request:
+                response = self.resource.batch_get_item(RequestItems=request)
+                for item in response['Responses'].get(table_name, []):
+                    found[item[key_name]] = self._record(kind, item)
+                request = response.get('UnprocessedKeys')
+        return [found[k] for k in keys if k in found]
+
+    def _put(self, kind, record, **condition):
+        if kind not in COUNTED_KINDS:
+            self.tables[kind].put_item(Item=self._item(kind, record), **condition)
+            return
+        # The old item comes back if there was one: new records and status changes are counted
+        response = self.tables[kind].put_item(Item=self._item(kind, record), ReturnValues='ALL_OLD',
+                                              **condition)
+        deltas = count_deltas(kind, response.get('Attributes'), record)
+        if deltas:
+            self._add_counts(deltas)
+
+    def _put_many(self, kind, records):
+        records = list(records)
+        deltas = {}
+        if kind in COUNTED_KINDS:
+            key_name = TABLES[kind][1]
+            # The last write of a key wins, and is what the counters move to
+            latest = {record[key_name]: record for record in records}
+            existing = self._existing(kind, latest)
+            for key, record in latest.items():
+                for name, delta in count_deltas(kind, existing.get(key), record).items():
+                    deltas[name] = deltas.get(name, 0) + delta
+        with self.tables[kind].batch_writer() as batch:
+            for record in records:
+                batch.put_item(Item=self._item(kind, record))
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if deltas:
+            self._add_counts(deltas)
+
+    def _existing(self, kind, keys):
+        """{key: item} of the keys that have an item, read as keys (and request statuses) only"""
+        table_name, key_name = TABLES[kind]
+        keys = list(keys)
+        names = {'#k': key_name}
+        if kind == 'requests':
+            names['#s'] = 'status'
+        existing = {}
+        for i in range(0, len(keys), BATCH_GET_SIZE):
+            request = {table_name: {'Keys': [{key_name: k} for k in keys[i:i + BATCH_GET_SIZE]],
+                                    'ProjectionExpression': ', '.join(names),
+                                    'ExpressionAttributeNames': names}}
+            while request:
+                response = self.resource.batch_get_item(RequestItems=request)
+                existing.update((item[key_name], item) for item in response['Responses'].get(table_name, []))
+                request = response.get('UnprocessedKeys')
+        return existing
+
+    def _counts_update(self, deltas):
+        """UpdateItem arguments that ADD deltas to the counters"""
+        names = list(deltas)
+        return {
+            'Key': {'stat_id': COUNTS_ID},
+            'UpdateExpression': 'ADD ' + ', '.join(f'#c{i} :c{i}' for i in range(len(names))),
+            'ExpressionAttributeNames': {f'#c{i}': name for i, name in enumerate(names)},
+            'ExpressionAttributeValues': {f':c{i}': deltas[name] for i, name in enumerate(names)},
+        }
+
+    def _add_counts(self, deltas):
+        self.tables['stats'].update_item(**self._counts_update(deltas))
+        self.cache.invalidate('record_counts')
+
+    def _status_transition(self, request_data):
+        """
+        (stored status, counter Updates) for a transaction that writes
+        request_data: the transaction's request Put must hold the stored
+        status (hold_status), so the counters move exactly once
+        """
+        item = self.tables['requests'].get_item(
+            Key={'request_id': request_data['request_id']}, ConsistentRead=True,
+            ProjectionExpression='#s', ExpressionAttributeNames={'#s': 'status'}).get('Item')
+        status = (item or {}).get('status')
+        deltas = count_deltas('requests', item, request_data)
+        updates = [{'Update': {'TableName': TABLES['stats'][0], **self._counts_update(deltas)}}] if deltas else []
+        return status, updates
+
+    def _counts(self):
+        # One cached read of the stats item serves every count of a page
+        return self.cache.read('record_counts', 'all', lambda: self._get('stats', COUNTS_ID))
+
+    def _record_count(self, kind):
+        counts = self._counts()
+        # Not seeded yet (initialize_tables not run): count the hard way
+        return counts.get(kind, 0) if counts is not None else self._count(kind)
+
+    def _query(self, kind, index_name, key_condition, **kwargs):
+        """Read every item of an index matching key_condition, following LastEvaluatedKey"""
+        kwargs.update(IndexName=index_name, KeyConditionExpression=key_condition)
+        items = []
+        while True:
+            response = self.tables[kind].query(**kwargs)
+            items.extend(self._record(kind, item) for item in response.get('Items', []))
+            if 'LastEvaluatedKey' not in response or len(items) >= kwargs.get('Limit', len(items) + 1):
+                return items
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def _query_count(self, kind, index_name, key_condition):
+        kwargs = {'IndexName': index_name, 'KeyConditionExpression': key_condition, 'Select': 'COUNT'}
+        count = 0
+        while True:
+            response = self.tables[kind].query(**kwargs)
+            count += response['Count']
+            if 'LastEvaluatedKey' not in response:
+                return count
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def _scan_args(self, kind, filter_expression=None, fields=None):
+        """Scan parameters; fields becomes a projection expression (always with the key)"""
+        kwargs = {}
+        if filter_expression is not None:
+            kwargs['FilterExpression'] = filter_expression
+        if fields:
+            # Placeholders, since names like 'name' and 'status' are reserved words
+            names = list(dict.fromkeys([TABLES[kind][1], *fields]))
+            kwargs['ProjectionExpression'] = ', '.join(f'#p{i}' for i in range(len(names)))
+            kwargs['ExpressionAttributeNames'] = {f'#p{i}': name for i, name in enumerate(names)}
+        return kwargs
+
+    def _scan_pages(self, kind, kwargs):
+        """Yield the records of each scan page, following LastEvaluatedKey"""
+        projected = 'ProjectionExpression' in kwargs
+        kwargs = dict(kwargs)
+        while True:
+            response = self.tables[kind].scan(**kwargs)
+            yield [self._record(kind, item, projected) for item in response.get('Items', [])]
+            if 'LastEvaluatedKey' not in response:
+                return
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def _iter_scan(self, kind, filter_expression=None, fields=None, segments=1):
+        """
+        Stream every matching record without holding the table in memory.
+        With segments > 1 the table is scanned as that many parallel segments
+        (Segment/TotalSegments), and records arrive in no particular order.
+        """
+        kwargs = self._scan_args(kind, filter_expression, fields)
+        if segments <= 1:
+            for records in self._scan_pages(kind, kwargs):
+                yield from records
+            return
+
+        # Bounded, so segment workers stay at most a couple of pages ahead of the reader
+        pages = queue.Queue(maxsize=2 * segments)
+        stop = threading.Event()
+
+        def hand_over(message):
+            while not stop.is_set():
+                try:
+                    pages.put(message, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def scan_segment(segment):
+            try:
+                for records in self._scan_pages(kind, dict(kwargs, Segment=segment, TotalSegments=segments)):
+                    if not hand_over(('page', records)):
+                        return
+                hand_over(('done', None))
+            except Exception as e:
+                hand_over(('error', e))
+
+        with ThreadPoolExecutor(max_workers=segments, thread_name_prefix='dynamodb-scan') as pool:
+            for segment in range(segments):
+                pool.submit(scan_segment, segment)
+            try:
+                finished = 0
+                while finished < segments:
+                    message, value = pages.get()
+                    if message == 'page':
+                        yield from value
+                    elif message == 'done':
+                        finished += 1
+                    else:
+                        raise value
+            finally:
+                # Also reached when the reader stops early; lets blocked workers exit
+                stop.set()
+
+    def _scan(self, kind, filter_expression=None, fields=None):
+        """Read every matching record into a list"""
+        return list(self._iter_scan(kind, filter_expression, fields, self.scan_segments))
+
+    def _count(self, kind, filter_expression=None):
+        kwargs = {'Select': 'COUNT'}
+        if filter_expression is not None:
+            kwargs['FilterExpression'] = filter_expression
+
+        def count_segment(segment):
+            segment_kwargs = dict(kwargs, Segment=segment, TotalSegments=self.scan_segments)
+            count = 0
+            while True:
+                response = self.tables[kind].scan(**segment_kwargs)
+                count += response['Count']
+                if 'LastEvaluatedKey' not in response:
+                    return count
+                segment_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        if self.scan_segments == 1:
+            return count_segment(0)
+        with ThreadPoolExecutor(max_workers=self.scan_segments, thread_name_prefix='dynamodb-count') as pool:
+            return sum(pool.map(count_segment, range(self.scan_segments)))
+
+    # ---------- donors ----------
+
+    def get_donor(self, donor_id):
+        return self.cache.read('donors', donor_id, lambda: self._get('donors', donor_id))
+
+    def get_donors(self, donor_ids):
+        return self._get_donors(list(donor_ids))
+
+    def _get_donors(self, donor_ids):
+        return self.cache.read_many('donors', donor_ids, lambda keys: self._get_many('donors', keys),
+                                    lambda donor: donor['donor_id'])
+
+    def put_donor(self, donor, donor_donations=None):
+        condition = {}
+        if donor_donations is not None:
+            condition = {'ConditionExpression': seen_condition(donor_donations),
+                         'ExpressionAttributeNames': {'#c': 'total_donations'},
+                         'ExpressionAttributeValues': {':seen': to_dynamo(donor_donations)}}
+        try:
+            self._put('donors', with_group_code(donor), **condition)
+        except ClientError as e:
+            if is_condition_failure(e):
+                raise ConflictError(f"Donor {donor['donor_id']} changed since it was read")
+            raise
+        finally:
+            self._invalidate_donors([donor['donor_id']])
+
+    def put_donors(self, donors):
+        donors = [with_group_code(donor) for donor in donors]
+        self._put_many('donors', donors)
+        self._invalidate_donors([donor['donor_id'] for donor in donors])
+
+    def list_donors(self):
+        return sorted(self._scan('donors'), key=lambda d: d.get('registered_at') or '')
+
+    def count_donors(self):
+        return self._record_count('donors')
+
+    def search_donors(self, mask=None, location=None, fields=LOCATION_FIELDS):
+        # One index query per compatible blood group, for its available, active donors;
+        # location is filtered here, so searches with and without one share the group's query
+        groups = BLOOD_GROUPS if mask is None else groups_in_mask(mask)
+        if self.cache.cached('donor_groups') and self.cache.cached('donors'):
+            donor_ids = [donor_id for blood_group in groups for donor_id in self.cache.read(
+                'donor_groups', blood_group, lambda: self._group_donor_ids(blood_group))]
+            donors = self._get_donors(donor_ids)
+        else:
+            donors = [d for blood_group in groups for d in self._group_donors(blood_group)]
+        results = [d for d in donors if not location or location_matches(d, location, fields)]
+        results.sort(key=lambda d: d.get('registered_at') or '')
+        return results
+
+    def _group_donors(self, blood_group):
+        return self._query('donors', 'blood_group-available-index',
+                           Key('blood_group').eq(blood_group) & Key(AVAILABLE_FLAG).eq(1))
+
+    def _group_donor_ids(self, blood_group):
+        """IDs of a group's donors for the group cache; the donors read with them go to the donor cache"""
+        generation = self.cache.generation('donors')
+        donors = self._group_donors(blood_group)
+        self.cache.put_many('donors', donors, lambda donor: donor['donor_id'], generation)
+        return [donor['donor_id'] for donor in donors]
+
+    def _invalidate_donors(self, donor_ids):
+        self.cache.invalidate('donors', *donor_ids)
+        # A donor may join, leave or change within their group's search results
+        self.cache.invalidate('donor_groups')
+
+    # ---------- users ----------
+
+    def get_user_by_email(self, email):
+        users = self._query('users', 'email-index', Key('email').eq(email), Limit=1)
+        return users[0] if users else None
+
+    def put_user(self, user):
+        self._put('users', user)
+
+    # ---------- requestors ----------
+
+    def get_requestor(self, requestor_id):
+        return self._get('requestors', requestor_id)
+
+    def put_requestor(self, requestor):
+        self._put('requestors', requestor)
+
+    def count_requestors(self):
+        return self._record_count('requestors')
+
+    # ---------- blood requests ----------
+
+    def get_request(self, request_id):
+        return self.cache.read('requests', request_id, lambda: self._get('requests', request_id))
+
+    def get_requests(self, request_ids):
+        return self.cache.read_many('requests', list(request_ids),
+                                    lambda keys: self._get_many('requests', keys),
+                                    lambda request_data: request_data['request_id'])
+
+    def put_request(self, request_data):
+        self._put('requests', with_group_code(request_data))
+        self._invalidate_requests([request_data['request_id']])
+
+    def put_requests(self, requests):
+        requests = [with_group_code(r) for r in requests]
+        self._put_many('requests', requests)
+        self._invalidate_requests([r['request_id'] for r in requests])
+
+    def _invalidate_requests(self, request_ids):
+        self.cache.invalidate('requests', *request_ids)
+        # Any request may enter, leave or move within any feed
+        self.cache.invalidate('open_requests')
+
+    def list_requests(self):
+        return self._scan('requests')
+
+    def count_requests(self):
+        return self._record_count('requests')
+
+    def count_requests_by_status(self, *statuses):
+        counts = self._counts() or {}
+        # Statuses without a seeded counter are counted off the index
+        return sum(counts[status_counter(status)] if status_counter(status) in counts
+                   else self._query_count('requests', 'status-created_at-index', Key('status').eq(status))
+                   for status in dict.fromkeys(statuses))
+
+    def requests_for_requestor(self, requestor_id):
+        requests = self._query('requests', 'requestor_id-index', Key('requestor_id').eq(requestor_id))
+        return sorted(requests, key=lambda r: r.get('created_at') or '')
+
+    def recent_requests(self, limit):
+        # Newest `limit` of each status, merged; ScanIndexForward=False reads newest first
+        newest = [
+            self._query('requests', 'status-created_at-index', Key('status').eq(status),
+                        ScanIndexForward=False, Limit=limit)[:limit]
+            for status in REQUEST_STATUSES
+        ]
+        return list(merge(*newest, key=lambda r: r.get('created_at') or '', reverse=True))[:limit]
+
+    def open_requests(self, mask):
+        return iter(self.cache.read('open_requests', mask, lambda: self._open_requests(mask)))
+
+    def _open_requests(self, mask):
+        codes = [group_code(bg) for bg in groups_in_mask(mask)]
+        if not codes:
+            return []
+        requests = []
+        for status in OPEN_STATUSES:
+            requests.extend(self._query('requests', 'status-created_at-index', Key('status').eq(status),
+                                        FilterExpression=Attr('group_code').is_in(codes)))
+        requests.sort(key=open_request_key)
+        return requests
+
+    # ---------- donor-request assignments ----------
+
+    def get_assignment(self, assignment_id):
+        return self._get('assignments', assignment_id)
+
+    def put_assignment(self, assignment, assignment_statuses=None):
+        condition = {}
+        if assignment_statuses is not None:
+            names = [f':s{i}' for i in range(len(assignment_statuses))]
+            condition = {'ConditionExpression': f'#s IN ({", ".join(names)})',
+                         'ExpressionAttributeNames': {'#s': 'status'},
+                         'ExpressionAttributeValues': dict(zip(names, assignment_statuses))}
+        try:
+            self._put('assignments', assignment, **condition)
+        except ClientError as e:
+            if is_condition_failure(e):
+                raise ConflictError(f"Assignment {assignment['assignment_id']} is no longer "
+                                    f"{' or '.join(assignment_statuses)}")
+            raise
+
+    def assignments_for_donor(self, donor_id):
+        assignments = self._query('assignments', 'donor_id-index', Key('donor_id').eq(donor_id))
+        return sorted(assignments, key=lambda a: a.get('accepted_at') or '')
+
+    def assignments_for_request(self, request_id):
+        assignments = self._query('assignments', 'request_id-index', Key('request_id').eq(request_id))
+        return sorted(assignments, key=lambda a: a.get('accepted_at') or '')
+
+    def assignments_for_requests(self, request_ids):
+        return self._for_each_request(self.assignments_for_request, request_ids)
+
+    def _for_each_request(self, read, request_ids):
+        """
+        {request_id: read(request_id)}: the request_id indexes take one key per
+        query, so the queries run concurrently, as many at once as scan segments
+        """
+        request_ids = list(dict.fromkeys(request_ids))
+        if self.scan_segments == 1 or len(request_ids) < 2:
+            return {request_id: read(request_id) for request_id in request_ids}
+        with ThreadPoolExecutor(max_workers=min(self.scan_segments, len(request_ids)),
+                                thread_name_prefix='dynamodb-batch') as pool:
+            return dict(zip(request_ids, pool.map(read, request_ids)))
+
+    def list_assignments(self):
+        return self._scan('assignments')
+
+    # ---------- donations ----------
+
+    def put_donation(self, donation):
+        self._put('donations', donation)
+
+    def get_donor_and_request(self, donor_id, request_id):
+        # Both items in a single BatchGetItem
+        request = {
+            TABLES['donors'][0]: {'Keys': [{'donor_id': donor_id}]},
+            TABLES['requests'][0]: {'Keys': [{'request_id': request_id}]},
+        }
+        found = {}
+        while request:
+            response = self.resource.batch_get_item(RequestItems=request)
+            for kind in ('donors', 'requests'):
+                for item in response['Responses'].get(TABLES[kind][0], []):
+                    found[kind] = self._record(kind, item)
+            request = response.get('UnprocessedKeys')
+        return found.get('donors'), found.get('requests')
+
+    def confirm_donation(self, assignment, request_data, donor, donation,
+                         assignment_status, fulfilled_units, donor_donations=None):
+        # One TransactWriteItems: all four writes land, or none do if any condition fails.
+        # The resource's client (de)serializes attribute values like the Table API does.
+        def put(kind, record, condition=None, attribute=None, seen=None):
+            entry = {'TableName': TABLES[kind][0], 'Item': self._item(kind, record)}
+            if condition:
+                entry.update(ConditionExpression=condition,
+                             ExpressionAttributeNames={'#c': attribute},
+                             ExpressionAttributeValues={':seen': to_dynamo(seen)})
+            return {'Put': entry}
+
+        request_status, counter_updates = self._status_transition(request_data)
+        try:
+            self.client.transact_write_items(TransactItems=[
+                put('assignments', assignment, '#c = :seen', 'status', assignment_status),
+                hold_status(put('requests', with_group_code(request_data), seen_condition(fulfilled_units),
+                                'fulfilled_units', fulfilled_units), request_status),
+                put('donors', with_group_code(donor),
+                    None if donor_donations is None else seen_condition(donor_donations),
+                    'total_donations', donor_donations),
+                put('donations', donation),
+                *counter_updates,
+            ])
+        except ClientError as e:
+            if is_transaction_conflict(e):
+                raise ConflictError(f"Assignment {assignment['assignment_id']} or request "
+                                    f"{request_data['request_id']} changed since they were read")
+            raise
+        finally:
+            # Also on conflict: the cached copies are what turned out to be stale
+            self._invalidate_donors([donor['donor_id']])
+            self._invalidate_requests([request_data['request_id']])
+            self.cache.invalidate('record_counts')
+
+    def donations_for_donor(self, donor_id):
+        donations = self._query('donations', 'donor_id-index', Key('donor_id').eq(donor_id))
+        return sorted(donations, key=lambda d: d.get('donation_date') or '')
+
+    def donations_for_request(self, request_id):
+        donations = self._query('donations', 'request_id-index', Key('request_id').eq(request_id))
+        return sorted(donations, key=lambda d: d.get('donation_date') or '')
+
+    def donations_for_requests(self, request_ids):
+        return self._for_each_request(self.donations_for_request, request_ids)
+
+    def list_donations(self):
+        return self._scan('donations')
+
+    def recent_donations(self, limit):
+        # Straight off the date-sorted feed index; ScanIndexForward=False reads newest first
+        return self._query('donations', 'feed-donation_date-index', Key(FEED_KEY).eq(DONATION_FEED),
+                           ScanIndexForward=False, Limit=limit)[:limit]
+
+    # ---------- streaming and paging ----------
+
+    def iter_records(self, kind, fields=None):
+        return self._iter_scan(kind, fields=fields, segments=self.scan_segments)
+
+    def page(self, kind, limit, cursor=None, fields=None):
+        # The cursor is the key of the previous page's last record
+        key_name = TABLES[kind][1]
+        kwargs = self._scan_args(kind, fields=fields)
+        if cursor:
+            kwargs['ExclusiveStartKey'] = {key_name: cursor}
+        records = []
+        while len(records) < limit:
+            kwargs['Limit'] = limit - len(records)
+            response = self.tables[kind].scan(**kwargs)
+            records.extend(self._record(kind, item, 'ProjectionExpression' in kwargs)
+                           for item in response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return records, None
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        return records, records[-1][key_name]
+
+    # ---------- inventory ----------
+
+    def get_inventory(self):
+        return self.cache.read('inventory', 'all', self._get_inventory)
+
+    def _get_inventory(self):
+        stock = {item['blood_group']: item for item in self._get_many('inventory', INVENTORY_GROUPS)}
+        return {
+            bg: {'units': stock.get(bg, {}).get('units', 0),
+                 'donor_count': stock.get(bg, {}).get('donor_count', 0)}
+            for bg in INVENTORY_GROUPS
+        }
+
+    def inventory_units(self, blood_group):
+        # Uncached: this is the stock check before a withdrawal
+        item = self._get('inventory', blood_group) or {}
+        return item.get('units', 0)
+
+    def adjust_inventory(self, blood_group, delta):
+        """
+        Atomic ADD in a single round trip; a withdrawal is conditional on
+        enough units being in stock, so concurrent writers never lose updates.
+        A withdrawal larger than the stock empties it (floored at 0 like the
+        other backends), conditional on the level it saw, retried with backoff.
+        """
+        try:
+            return self._adjust_inventory(blood_group, delta)
+        finally:
+            self.cache.invalidate('inventory')
+
+    def _adjust_inventory(self, blood_group, delta):
+        table = self.tables['inventory']
+        key = {'blood_group': blood_group}
+        for attempt in range(INVENTORY_RETRIES):
+            update = {'Key': key, 'UpdateExpression': 'ADD units :delta',
+                      'ExpressionAttributeValues': {':delta': delta}, 'ReturnValues': 'UPDATED_NEW'}
+            if delta < 0:
+                update['ConditionExpression'] = 'units >= :needed'
+                update['ExpressionAttributeValues'][':needed'] = -delta
+            try:
+                return from_dynamo(table.update_item(**update)['Attributes']['units'])
+            except ClientError as e:
+                if not is_condition_failure(e):
+                    raise
+
+            # Not enough stock: take what is left, unless another writer changed it meanwhile
+            item = table.get_item(Key=key, ConsistentRead=True).get('Item') or {}
+            units = item.get('units')
+            try:
+                table.update_item(
+                    Key=key,
+                    UpdateExpression='SET units = :zero',
+                    ConditionExpression='attribute_not_exists(units)' if units is None else 'units = :seen',
+                    ExpressionAttributeValues={':zero': 0, **({} if units is None else {':seen': units})}
+                )
+                return 0
+            except ClientError as e:
+                if not is_condition_failure(e):
+                    raise
+            backoff(attempt)
+        raise RuntimeError(f'Inventory update for {blood_group} kept conflicting; gave up after '
+                           f'{INVENTORY_RETRIES} attempts')
+
+    def use_inventory(self, request_data, withdrawal, units, fulfilled_units):
+        # One TransactWriteItems: the stock only goes down if the request write lands too
+        blood_group = request_data['blood_group']
+        fulfilled_condition = '#c = :seen'
+        if fulfilled_units == 0:
+            fulfilled_condition = 'attribute_not_exists(#c) OR #c = :seen'
+        request_status, counter_updates = self._status_transition(request_data)
+        try:
+            self.client.transact_write_items(TransactItems=[
+                {'Update': {
+                    'TableName': TABLES['inventory'][0],
+                    'Key': {'blood_group': blood_group},
+                    'UpdateExpression': 'ADD units :delta',
+                    'ConditionExpression': 'units >= :needed',
+                    'ExpressionAttributeValues': {':delta': -units, ':needed': units},
+                }},
+                hold_status({'Put': {
+                    'TableName': TABLES['requests'][0],
+                    'Item': self._item('requests', with_group_code(request_data)),
+                    'ConditionExpression': fulfilled_condition,
+                    'ExpressionAttributeNames': {'#c': 'fulfilled_units'},
+                    'ExpressionAttributeValues': {':seen': fulfilled_units},
+                }}, request_status),
+                {'Put': {'TableName': TABLES['donations'][0], 'Item': self._item('donations', withdrawal)}},
+                *counter_updates,
+            ])
+        except ClientError as e:
+            if is_transaction_conflict(e):
+                raise ConflictError(f"Fewer than {units} {blood_group} units in stock or request "
+                                    f"{request_data['request_id']} changed since it was read")
+            raise
+        finally:
+            self.cache.invalidate('inventory')
+            self._invalidate_requests([request_data['request_id']])
+            self.cache.invalidate('record_counts')
+
+    def add_inventory_donor(self, blood_group, donor_id):
+        self.tables['inventory'].update_item(
+            Key={'blood_group': blood_group},
+            UpdateExpression='ADD donor_count :one',
+            ExpressionAttributeValues={':one': 1}
+        )
+        self.cache.invalidate('inventory')
+
+    def add_inventory_donors(self, blood_group, donor_ids):
+        count = len(list(donor_ids))
+        if count:
+            self.tables['inventory'].update_item(
+                Key={'blood_group': blood_group},
+                UpdateExpression='ADD donor_count :n',
+                ExpressionAttributeValues={':n': count}
+            )
+            self.cache.invalidate('inventory')
@@ -0,0 +1,412 @@
+"""
+BloodSync - In-memory Storage Backend
+Process-local dictionaries with maintained secondary indexes (see stores.py),
+optionally made durable by a write-ahead log (see wal.py)
+"""
+
+import atexit
+import gc
+import logging
+import time
+from contextlib import contextmanager
+from sys import intern
+
+from matching import RankedMatches
+from storage.base import INVENTORY_GROUPS, LOCATION_FIELDS, Repository
+from storage.locks import LockStripes
+from storage.stores import (STORE_FORMAT, AssignmentStore, DonationStore, DonorStore,
+                            IndexedStore, InventoryStore, RequestStore, UserStore)
+from storage.wal import MutationLog, gc_paused
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryRepository(Repository):
+    """
+    Repository backed by the indexed in-memory stores.
+    Every write holds the lock stripe of each record it touches, keyed by
+    (kind, key) with inventory keyed by blood group; read-check-write
+    sequences hold them across the check, so writers to different records
+    run in parallel while those to the same record are serialized.
+    """
+
+    seed_sample_data = True
+
+    # Record type -> (store attribute, key field)
+    TABLES = {
+        'users': ('users', 'user_id'),
+        'donors': ('donors', 'donor_id'),
+        'requestors': ('requestors', 'requestor_id'),
+        'requests': ('requests', 'request_id'),
+        'donations': ('donations', 'donation_id'),
+        'assignments': ('assignments', 'assignment_id'),
+    }
+
+    def __init__(self):
+        # Per-record write locks
+        self._locks = LockStripes()
+        # Site accounts: {user_id: user_data}, indexed by email
+        self.users = UserStore()
+        # Donors dictionary: {donor_id: donor_data}, bucketed by blood group and availability
+        self.donors = DonorStore()
+        # Requestors dictionary: {requestor_id: requestor_data}
+        self.requestors = IndexedStore()
+        # Blood requests dictionary: {request_id: request_data}, with per-status counts
+        self.requests = RequestStore()
+        # Donations dictionary: {donation_id: donation_data}, indexed by donor and request
+        self.donations = DonationStore()
+        # Donor-Request assignments: {assignment_id: assignment_data}, indexed by donor and request
+        self.assignments = AssignmentStore()
+        # Blood inventory by blood group, with running unit totals
+        self.inventory = InventoryStore(
+            (bg, {'units': 0, 'donors': [], 'donor_count': 0}) for bg in INVENTORY_GROUPS
+        )
+
+    # ---------- donors ----------
+
+    def get_donor(self, donor_id):
+        return self.donors.get(donor_id)
+
+    def put_donor(self, donor, donor_donations=None):
+        with self._writing(('donors', donor['donor_id'])):
+            if donor_donations is not None:
+                self._check_donor(donor, donor_donations)
+            self._put('donors', donor)
+
+    def list_donors(self):
+        return list(self.donors.values())
+
+    def count_donors(self):
+        return len(self.donors)
+
+    def search_donors(self, mask=None, location=None, fields=LOCATION_FIELDS):
+        return self.donors.search(mask, location, fields)
+
+    def rank_donors(self, recipient_blood_group, location=None):
+        # Score straight off the maintained columnar table
+        columns = self.donors.columns
+        rows = None
+        if location:
+            rows = columns.rows_for(self.donors.location_ids(location, ('city', 'state')))
+        return RankedMatches(columns, columns.candidate_rows(recipient_blood_group, rows))
+
+    def donor_eligibility(self, donor_id, donor=None):
+        return self.donors.eligibility(donor_id)
+
+    def has_eligible_donor(self, recipient_blood_group):
+        # Deferral check is an integer compare against the precomputed next eligible day
+        columns = self.donors.columns
+        return bool(columns.can_donate(columns.candidate_rows(recipient_blood_group)).any())
+
+    # ---------- users ----------
+
+    def get_user_by_email(self, email):
+        return self.users.by_email(email)
+
+    def put_user(self, user):
+        self._put('users', user)
+
+    # ---------- requestors ----------
+
+    def get_requestor(self, requestor_id):
+        return self.requestors.get(requestor_id)
+
+    def put_requestor(self, requestor):
+        self._put('requestors', requestor)
+
+    def count_requestors(self):
+        return len(self.requestors)
+
+    # ---------- blood requests ----------
+
+    def get_request(self, request_id):
+        return self.requests.get(request_id)
+
+    def put_request(self, request_data):
+        self._put('requests', request_data)
+
+    def list_requests(self):
+        return list(self.requests.values())
+
+    def count_requests(self):
+        return len(self.requests)
+
+    def count_requests_by_status(self, *statuses):
+        return self.requests.count_status(*statuses)
+
+    def open_requests(self, mask):
+        return self.requests.open_requests(mask)
+
+    # ---------- donor-request assignments ----------
+
+    def get_assignment(self, assignment_id):
+        return self.assignments.get(assignment_id)
+
+    def put_assignment(self, assignment, assignment_statuses=None):
+        with self._writing(('assignments', assignment['assignment_id'])):
+            if assignment_statuses is not None:
+                self._check_assignment(assignment, assignment_statuses)
+            self._put('assignments', assignment)
+
+    def assignments_for_donor(self, donor_id):
+        return self.assignments.for_donor(donor_id)
+
+    def assignments_for_request(self, request_id):
+        return self.assignments.for_request(request_id)
+
+    def has_assignment(self, donor_id, request_id):
+        return self.assignments.has_pair(donor_id, request_id)
+
+    def list_assignments(self):
+        return list(self.assignments.values())
+
+    # ---------- donations ----------
+
+    def put_donation(self, donation):
+        self._put('donations', donation)
+
+    def donations_for_donor(self, donor_id):
+        return self.donations.for_donor(donor_id)
+
+    def confirm_donation(self, assignment, request_data, donor, donation,
+                         assignment_status, fulfilled_units, donor_donations=None):
+        records = [('assignments', assignment), ('requests', request_data),
+                   ('donors', donor), ('donations', donation)]
+        with self._writing(*self._record_keys(records)):
+            self._check_confirmation(assignment, request_data, assignment_status, fulfilled_units,
+                                     donor, donor_donations)
+            self._put_records(records)
+
+    # ---------- listings ----------
+
+    def page(self, kind, limit, cursor=None, fields=None):
+        if kind not in self.TABLES:
+            raise ValueError(f'Unknown record kind {kind!r}')
+        # The cursor is the sequence number of the previous page's last record
+        after = int(cursor) if cursor and cursor.isdigit() else -1
+        rows = getattr(self, self.TABLES[kind][0]).after(after, limit + 1)
+        records = [record for _, record in rows[:limit]]
+        return records, (str(rows[limit - 1][0]) if len(rows) > limit else None)
+
+    # ---------- record writes ----------
+
+    @contextmanager
+    def _writing(self, *keys):
+        """Hold the write locks of (kind, key) pairs"""
+        with self._locks.hold(*keys):
+            yield
+
+    def _record_keys(self, records):
+        return [(kind, record[self.TABLES[kind][1]]) for kind, record in records]
+
+    def _put(self, kind, record):
+        attr, key = self.TABLES[kind]
+        with self._writing((kind, record[key])):
+            getattr(self, attr)[record[key]] = record
+
+    def _put_records(self, records):
+        """Put (kind, record) pairs"""
+        with self._writing(*self._record_keys(records)):
+            for kind, record in records:
+                attr, key = self.TABLES[kind]
+                getattr(self, attr)[record[key]] = record
+
+    def donations_for_request(self, request_id):
+        return self.donations.for_request(request_id)
+
+    def list_donations(self):
+        return list(self.donations.values())
+
+    # ---------- inventory ----------
+
+    def get_inventory(self):
+        return self.inventory
+
+    def inventory_units(self, blood_group):
+        return self.inventory.get(blood_group, {}).get('units', 0)
+
+    def adjust_inventory(self, blood_group, delta):
+        with self._writing(('inventory', blood_group)):
+            return self._set_units(blood_group, delta)
+
+    def _set_units(self, blood_group, delta):
+        stock = self.inventory.get(blood_group)
+        if stock is None:
+            return 0
+        stock['units'] = max(0, stock['units'] + delta)
+        self.inventory.reindex(blood_group)
+        return stock['units']
+
+    def use_inventory(self, request_data, withdrawal, units, fulfilled_units):
+        blood_group = request_data['blood_group']
+        records = [('requests', request_data), ('donations', withdrawal)]
+        with self._writing(('inventory', blood_group), *self._record_keys(records)):
+            self._check_withdrawal(request_data, units, fulfilled_units)
+            self._set_units(blood_group, -units)
+            self._put_records(records)
+
+    def add_inventory_donor(self, blood_group, donor_id):
+        self.add_inventory_donors(blood_group, [donor_id])
+
+    def add_inventory_donors(self, blood_group, donor_ids):
+        with self._writing(('inventory', blood_group)):
+            self._add_inventory_donors(blood_group, donor_ids)
+
+    def _add_inventory_donors(self, blood_group, donor_ids):
+        stock = self.inventory.get(blood_group)
+        if stock is not None:
+            stock['donors'].extend(donor_ids)
+            stock['donor_count'] = len(stock['donors'])
+
+    def total_units(self):
+        return self.inventory.total_units
+
+    def critical_groups(self):
+        return self.inventory.critical_groups()
+
+
+class DurableMemoryRepository(MemoryRepository):
+    """
+    In-memory backend whose writes are recorded in a write-ahead log.
+    On startup the state is rebuilt from the latest snapshot plus the log;
+    reads never touch the disk. A snapshot is taken every snapshot_every
+    logged writes, which also truncates the log.
+    """
+
+    def __init__(self, directory, snapshot_every=100000, **log_options):
+        super().__init__()
+        self.snapshot_every = snapshot_every
+        # Writes are applied and logged under their records' locks, so each
+        # record's log order is its apply order
+        self.log = MutationLog(directory, **log_options)
+
+        started = time.perf_counter()
+        replayed = 0
+        with gc_paused():
+            state = self.log.load_snapshot()
+            if state is not None:
+                self._restore(state)
+            for entry in self.log.replay():
+                self._apply(entry)
+                replayed += 1
+        # The recovered records live for the whole process: keep them out of future collections
+        gc.freeze()
+        self.log.open()
+        atexit.register(self.close)
+        logger.info(f"Recovered {self.count_donors()} donors, {self.count_requests()} requests "
+                    f"({replayed} log entries replayed) in {time.perf_counter() - started:.2f}s")
+
+    # ---------- recovery ----------
+
+    def _state(self):
+        # The stores are pickled with their indexes, so loading needs no re-indexing
+        state = {attr: getattr(self, attr) for attr, _ in self.TABLES.values()}
+        state['inventory'] = self.inventory
+        state['format'] = STORE_FORMAT
+        return state
+
+    def _restore(self, state):
+        if state.get('format') == STORE_FORMAT:
+            # Stores added since the snapshot was taken start empty
+            for attr, _ in self.TABLES.values():
+                if attr in state:
+                    setattr(self, attr, state[attr])
+            self.inventory = state['inventory']
+            return
+        # Index layout changed since the snapshot: rebuild from the records
+        for attr, key in self.TABLES.values():
+            store = getattr(self, attr)
+            for record in state.get(attr, {}).values():
+                store[record[key]] = record
+        for blood_group, stock in state.get('inventory', {}).items():
+            self.inventory[blood_group] = stock
+
+    def _apply(self, entry):
+        op = entry['op']
+        if op == 'put':
+            self._apply_put(entry['kind'], entry['record'])
+        elif op == 'puts':
+            for kind, record in entry['records']:
+                self._apply_put(kind, record)
+        elif op == 'units':
+            stock = self.inventory[entry['blood_group']]
+            stock['units'] = entry['units']
+            self.inventory.reindex(entry['blood_group'])
+        elif op == 'donor':
+            self._add_inventory_donors(entry['blood_group'], [entry['donor_id']])
+        elif op == 'donors':
+            self._add_inventory_donors(entry['blood_group'], entry['donor_ids'])
+        elif op == 'withdraw':
+            for kind, record in entry['records']:
+                self._apply_put(kind, record)
+            stock = self.inventory[entry['blood_group']]
+            stock['units'] = entry['units']
+            self.inventory.reindex(entry['blood_group'])
+
+    def _apply_put(self, kind, record):
+        attr, key = self.TABLES[kind]
+        # Each log entry is unpickled separately; share the field names between records
+        record = {intern(field): value for field, value in record.items()}
+        getattr(self, attr)[record[key]] = record
+
+    # ---------- logged writes ----------
+
+    @contextmanager
+    def _writing(self, *keys):
+        with self._locks.hold(*keys):
+            yield
+        # Snapshots hold every lock: start one only once this thread holds none
+        if self.log.entries >= self.snapshot_every and not self._locks.depth():
+            self.snapshot()
+
+    def _log(self, entry):
+        self.log.append(entry)
+
+    def _put(self, kind, record):
+        with self._writing((kind, record[self.TABLES[kind][1]])):
+            super()._put(kind, record)
+            self._log({'op': 'put', 'kind': kind, 'record': record})
+
+    def _put_records(self, records):
+        # One log entry, so a crash never leaves part of the group applied
+        with self._writing(*self._record_keys(records)):
+            super()._put_records(records)
+            self._log({'op': 'puts', 'records': records})
+
+    def adjust_inventory(self, blood_group, delta):
+        with self._writing(('inventory', blood_group)):
+            units = super().adjust_inventory(blood_group, delta)
+            if blood_group in self.inventory:
+                # Log the resulting level, not the delta, so replay is idempotent
+                self._log({'op': 'units', 'blood_group': blood_group, 'units': units})
+            return units
+
+    def use_inventory(self, request_data, withdrawal, units, fulfilled_units):
+        blood_group = request_data['blood_group']
+        records = [('requests', request_data), ('donations', withdrawal)]
+        with self._writing(('inventory', blood_group), *self._record_keys(records)):
+            self._check_withdrawal(request_data, units, fulfilled_units)
+            level = MemoryRepository._set_units(self, blood_group, -units)
+            MemoryRepository._put_records(self, records)
+            self._log({'op': 'withdraw', 'blood_group': blood_group, 'units': level,
+                       'records': records})
+
+    def add_inventory_donors(self, blood_group, donor_ids):
+        donor_ids = list(donor_ids)
+        with self._writing(('inventory', blood_group)):
+            super().add_inventory_donors(blood_group, donor_ids)
+            if blood_group in self.inventory:
+                self._log({'op': 'donors', 'blood_group': blood_group, 'donor_ids': donor_ids})
+
+    # ---------- maintenance ----------
+
+    def snapshot(self):
+        """Write a compact snapshot of the whole state and truncate the log"""
+        with self._locks.hold_all():
+            started = time.perf_counter()
+            with gc_paused():
+                self.log.snapshot(self._state())
+            logger.info(f"Snapshot written in {time.perf_counter() - started:.2f}s")
+
+    def close(self):
+        self.log.close()
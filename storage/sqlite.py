@@ -0,0 +1,570 @@
+"""
+BloodSync - SQLite Storage Backend
+Embedded single-file database for single-node deployments.
+
+Records are stored as JSON documents next to indexed copies of the fields
+the app filters and sorts on. The database runs in WAL journal mode, so
+readers never block the writer, and each thread keeps its own connection.
+Location search goes through an FTS5 trigram index of the donor location
+fields, which serves case-insensitive substring matches.
+
+    python -m storage.sqlite [path]   prints the query plans and checks index usage
+"""
+
+import json
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+from compatibility import groups_in_mask, group_code
+from storage.base import (INVENTORY_GROUPS, LOCATION_FIELDS, OPEN_STATUSES, ConflictError,
+                          Repository, open_request_key, with_group_code)
+
+# Table -> (primary key, indexed columns copied out of each record)
+TABLES = {
+    'users': ('user_id', ('email',)),
+    'donors': ('donor_id', ('blood_group', 'group_code', 'available', 'status',
+                            'city', 'state', 'pincode')),
+    'requestors': ('requestor_id', ('email',)),
+    'requests': ('request_id', ('requestor_id', 'blood_group', 'group_code', 'status',
+                                'urgency_rank', 'created_at')),
+    'assignments': ('assignment_id', ('donor_id', 'request_id', 'status')),
+    'donations': ('donation_id', ('donor_id', 'request_id', 'donation_date')),
+}
+
+INDEXES = (
+    # search_donors: the available, active buckets of a blood group mask
+    'CREATE INDEX IF NOT EXISTS idx_donors_match ON donors (available, status, group_code)',
+    'CREATE INDEX IF NOT EXISTS idx_donors_blood_group ON donors (blood_group)',
+    'CREATE INDEX IF NOT EXISTS idx_requestors_email ON requestors (email)',
+    'CREATE INDEX IF NOT EXISTS idx_users_email ON users (email)',
+    # Status counters and the donor request feed
+    'CREATE INDEX IF NOT EXISTS idx_requests_status ON requests (status, group_code)',
+    'CREATE INDEX IF NOT EXISTS idx_requests_requestor ON requests (requestor_id)',
+    'CREATE INDEX IF NOT EXISTS idx_requests_created ON requests (created_at)',
+    # Dashboard histories
+    'CREATE INDEX IF NOT EXISTS idx_assignments_donor ON assignments (donor_id)',
+    'CREATE INDEX IF NOT EXISTS idx_assignments_request ON assignments (request_id)',
+    'CREATE INDEX IF NOT EXISTS idx_donations_donor ON donations (donor_id, donation_date)',
+    'CREATE INDEX IF NOT EXISTS idx_donations_request ON donations (request_id, donation_date)',
+    'CREATE INDEX IF NOT EXISTS idx_donations_date ON donations (donation_date)',
+)
+
+# Trigram index of the donor location fields, keyed by donors.rowid and kept in step by triggers
+LOCATION_INDEX = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS donor_locations USING fts5({fields}, tokenize='trigram')",
+    'CREATE TRIGGER IF NOT EXISTS donor_locations_insert AFTER INSERT ON donors BEGIN '
+    'INSERT INTO donor_locations (rowid, {fields}) VALUES (new.rowid, {new}); END',
+    'CREATE TRIGGER IF NOT EXISTS donor_locations_update AFTER UPDATE OF {fields} ON donors BEGIN '
+    'DELETE FROM donor_locations WHERE rowid = old.rowid; '
+    'INSERT INTO donor_locations (rowid, {fields}) VALUES (new.rowid, {new}); END',
+    'CREATE TRIGGER IF NOT EXISTS donor_locations_delete AFTER DELETE ON donors BEGIN '
+    'DELETE FROM donor_locations WHERE rowid = old.rowid; END',
+)
+
+# Queries that must be served by an index; {codes}, {statuses} and {ids} expand to IN lists
+QUERIES = {
+    'user_by_email': 'SELECT data FROM users WHERE email = ? ORDER BY rowid LIMIT 1',
+    'search_donors': 'SELECT data FROM donors INDEXED BY idx_donors_match '
+                     'WHERE available = 1 AND status = ? AND group_code IN ({codes})',
+    # CROSS JOIN keeps the trigram lookup as the outer loop; donors are then read by rowid
+    'search_donors_location': 'SELECT data FROM donor_locations CROSS JOIN donors '
+                              'ON donors.rowid = donor_locations.rowid '
+                              'WHERE donor_locations MATCH ? AND available = 1 AND status = ?',
+    'requests_for_requestor': 'SELECT data FROM requests WHERE requestor_id = ? ORDER BY rowid',
+    'recent_requests': 'SELECT data FROM requests ORDER BY created_at DESC LIMIT ?',
+    'count_requests_by_status': 'SELECT COUNT(*) FROM requests WHERE status IN ({statuses})',
+    'open_requests': 'SELECT data FROM requests WHERE status IN ({statuses}) '
+                     'AND group_code IN ({codes}) ORDER BY urgency_rank, created_at, rowid',
+    'assignments_for_donor': 'SELECT data FROM assignments WHERE donor_id = ? ORDER BY rowid',
+    'assignments_for_request': 'SELECT data FROM assignments WHERE request_id = ? ORDER BY rowid',
+    'assignments_for_requests': 'SELECT data FROM assignments WHERE request_id IN ({ids}) ORDER BY rowid',
+    'has_assignment': 'SELECT 1 FROM assignments WHERE donor_id = ? AND request_id = ? LIMIT 1',
+    'donations_for_donor': 'SELECT data FROM donations WHERE donor_id = ? ORDER BY donation_date',
+    'donations_for_request': 'SELECT data FROM donations WHERE request_id = ? ORDER BY donation_date',
+    'donations_for_requests': 'SELECT data FROM donations WHERE request_id IN ({ids}) '
+                              'ORDER BY donation_date',
+    'recent_donations': 'SELECT data FROM donations ORDER BY donation_date DESC LIMIT ?',
+}
+
+# Trigram matching needs at least three characters; shorter locations fall back to LIKE
+MIN_LOCATION_MATCH = 3
+LOCATION_FILTER = "{field} LIKE ? ESCAPE '\\'"
+
+
+def _column_value(record, column):
+    if column == 'available':
+        return int(bool(record.get('available')))
+    if column == 'urgency_rank':
+        return open_request_key(record)[0]
+    return record.get(column)
+
+
+def _placeholders(values):
+    return ','.join('?' * len(values))
+
+
+def _like_pattern(text):
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _location_query(text, fields):
+    """FTS5 query for text as a substring of any of fields"""
+    phrase = text.replace('"', '""')
+    return f'{{{" ".join(fields)}}} : "{phrase}"'
+
+
+class SQLiteRepository(Repository):
+    """Repository backed by a SQLite database file"""
+
+    seed_sample_data = True
+
+    def __init__(self, path='bloodsync.db'):
+        self.path = path
+        # Connection pool: one connection per thread, created on first use
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._create_schema()
+
+    # ---------- connections ----------
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly in _transaction
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # With WAL, NORMAL only syncs at checkpoints and is still crash-safe
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _query(self, sql, params=()):
+        return self._connection().execute(sql, params).fetchall()
+
+    @contextmanager
+    def _write_transaction(self):
+        """
+        Write transaction on this thread's connection, rolled back on error.
+        BEGIN IMMEDIATE takes the write lock up front, so reads made inside
+        see no concurrent writes until COMMIT.
+        """
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _transaction(self, statements):
+        """Run (sql, params) pairs in one write transaction"""
+        with self._write_transaction() as conn:
+            for sql, params in statements:
+                if isinstance(params, list):
+                    conn.executemany(sql, params)
+                else:
+                    conn.execute(sql, params)
+
+    def after_fork(self):
+        # The parent's connections (and their file locks) stay the parent's: abandon, don't close
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def close(self):
+        """Close the connections of every thread"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    # ---------- schema ----------
+
+    def _create_schema(self):
+        statements = []
+        for table, (key, columns) in TABLES.items():
+            column_defs = ''.join(f', {column}' for column in columns)
+            statements.append((
+                f'CREATE TABLE IF NOT EXISTS {table} ({key} TEXT PRIMARY KEY{column_defs}, data TEXT NOT NULL)',
+                ()
+            ))
+        statements.append((
+            'CREATE TABLE IF NOT EXISTS inventory ('
+            'blood_group TEXT PRIMARY KEY, units INTEGER NOT NULL DEFAULT 0, '
+            'donor_count INTEGER NOT NULL DEFAULT 0)',
+            ()
+        ))
+        statements.extend((sql, ()) for sql in INDEXES)
+        fields = ', '.join(LOCATION_FIELDS)
+        new = ', '.join(f'new.{field}' for field in LOCATION_FIELDS)
+        statements.extend((sql.format(fields=fields, new=new), ()) for sql in LOCATION_INDEX)
+        statements.append(('INSERT OR IGNORE INTO inventory (blood_group) VALUES (?)',
+                           [(bg,) for bg in INVENTORY_GROUPS]))
+        self._transaction(statements)
+
+    # ---------- generic document access ----------
+
+    def _get(self, table, key):
+        rows = self._query(f'SELECT data FROM {table} WHERE {TABLES[table][0]} = ?', (key,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def _get_many(self, table, keys):
+        keys = list(keys)
+        key_column = TABLES[table][0]
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            for key, data in self._query(
+                    f'SELECT {key_column}, data FROM {table} WHERE {key_column} IN ({_placeholders(chunk)})',
+                    chunk):
+                found[key] = json.loads(data)
+        return [found[key] for key in keys if key in found]
+
+    def _upsert_sql(self, table):
+        key, columns = TABLES[table]
+        names = (key,) + columns + ('data',)
+        updates = ', '.join(f'{name} = excluded.{name}' for name in names[1:])
+        # ON CONFLICT ... DO UPDATE keeps the original rowid, i.e. the insertion order
+        return (f'INSERT INTO {table} ({", ".join(names)}) VALUES ({_placeholders(names)}) '
+                f'ON CONFLICT({key}) DO UPDATE SET {updates}')
+
+    def _row(self, table, record):
+        key, columns = TABLES[table]
+        return ((record[key],) + tuple(_column_value(record, column) for column in columns)
+                + (json.dumps(record),))
+
+    def _put_many(self, table, records):
+        self._transaction([(self._upsert_sql(table), [self._row(table, r) for r in records])])
+
+    def _select(self, sql, params=()):
+        return [json.loads(data) for (data,) in self._query(sql, params)]
+
+    def _all(self, table):
+        # rowid order is insertion order
+        return self._select(f'SELECT data FROM {table} ORDER BY rowid')
+
+    def _count(self, table):
+        return self._query(f'SELECT COUNT(*) FROM {table}')[0][0]
+
+    # ---------- query plans ----------
+
+    def query_plans(self):
+        """Get {query name: [EXPLAIN QUERY PLAN detail lines]} for the indexed queries"""
+        codes = [0, 1]
+        request_ids = ['BR1', 'BR2']
+        params = {
+            'user_by_email': ['user@example.com'],
+            'search_donors': ['active'] + codes,
+            'search_donors_location': [_location_query('Mumbai', LOCATION_FIELDS), 'active'],
+            'requests_for_requestor': ['REQ'],
+            'recent_requests': [5],
+            'count_requests_by_status': list(OPEN_STATUSES),
+            'open_requests': list(OPEN_STATUSES) + codes,
+            'assignments_for_donor': ['DON'],
+            'assignments_for_request': ['BR'],
+            'assignments_for_requests': request_ids,
+            'has_assignment': ['DON', 'BR'],
+            'donations_for_donor': ['DON'],
+            'donations_for_request': ['BR'],
+            'donations_for_requests': request_ids,
+            'recent_donations': [5],
+        }
+        plans = {}
+        for name, sql in QUERIES.items():
+            sql = sql.format(codes=_placeholders(codes), statuses=_placeholders(OPEN_STATUSES),
+                             ids=_placeholders(request_ids))
+            rows = self._query(f'EXPLAIN QUERY PLAN {sql}', params[name])
+            plans[name] = [row[-1] for row in rows]
+        return plans
+
+    def check_query_plans(self):
+        """Raise AssertionError if an indexed query would scan a whole table"""
+        for name, details in self.query_plans().items():
+            # A virtual table scan with a MATCH constraint (":M") is a full-text index lookup
+            table_scans = [d for d in details if d.startswith('SCAN') and 'USING' not in d
+                           and ' VIRTUAL TABLE INDEX 0:M' not in d]
+            if table_scans or not any('INDEX' in d for d in details):
+                raise AssertionError(f'{name} does not use an index: {details}')
+
+    # ---------- donors ----------
+
+    def get_donor(self, donor_id):
+        return self._get('donors', donor_id)
+
+    def get_donors(self, donor_ids):
+        return self._get_many('donors', donor_ids)
+
+    def put_donor(self, donor, donor_donations=None):
+        if donor_donations is None:
+            self.put_donors([donor])
+            return
+        with self._write_transaction() as conn:
+            self._check_donor(conn, donor, donor_donations)
+            conn.execute(self._upsert_sql('donors'), self._row('donors', with_group_code(donor)))
+
+    def put_donors(self, donors):
+        self._put_many('donors', [with_group_code(donor) for donor in donors])
+
+    def list_donors(self):
+        return self._all('donors')
+
+    def count_donors(self):
+        return self._count('donors')
+
+    def search_donors(self, mask=None, location=None, fields=LOCATION_FIELDS):
+        codes = None if mask is None else [group_code(bg) for bg in groups_in_mask(mask)]
+        if codes == []:
+            return []
+        fields = [field for field in fields if field in LOCATION_FIELDS]
+        if location and fields and len(location) >= MIN_LOCATION_MATCH:
+            sql = QUERIES['search_donors_location']
+            params = [_location_query(location, fields), 'active']
+            if codes is not None:
+                sql += f' AND group_code IN ({_placeholders(codes)})'
+                params += codes
+        else:
+            if codes is None:
+                sql = 'SELECT data FROM donors WHERE available = 1 AND status = ?'
+                params = ['active']
+            else:
+                sql = QUERIES['search_donors'].format(codes=_placeholders(codes))
+                params = ['active'] + codes
+            if location and fields:
+                sql += ' AND (' + ' OR '.join(LOCATION_FILTER.format(field=f) for f in fields) + ')'
+                params += [_like_pattern(location)] * len(fields)
+        return self._select(sql + ' ORDER BY donors.rowid', params)
+
+    # ---------- users ----------
+
+    def get_user_by_email(self, email):
+        users = self._select(QUERIES['user_by_email'], (email,))
+        return users[0] if users else None
+
+    def put_user(self, user):
+        self._put_many('users', [user])
+
+    # ---------- requestors ----------
+
+    def get_requestor(self, requestor_id):
+        return self._get('requestors', requestor_id)
+
+    def put_requestor(self, requestor):
+        self._put_many('requestors', [requestor])
+
+    def count_requestors(self):
+        return self._count('requestors')
+
+    # ---------- blood requests ----------
+
+    def get_request(self, request_id):
+        return self._get('requests', request_id)
+
+    def get_requests(self, request_ids):
+        return self._get_many('requests', request_ids)
+
+    def put_request(self, request_data):
+        self.put_requests([request_data])
+
+    def put_requests(self, requests):
+        self._put_many('requests', [with_group_code(r) for r in requests])
+
+    def list_requests(self):
+        return self._all('requests')
+
+    def count_requests(self):
+        return self._count('requests')
+
+    def count_requests_by_status(self, *statuses):
+        if not statuses:
+            return 0
+        sql = QUERIES['count_requests_by_status'].format(statuses=_placeholders(statuses))
+        return self._query(sql, statuses)[0][0]
+
+    def requests_for_requestor(self, requestor_id):
+        return self._select(QUERIES['requests_for_requestor'], (requestor_id,))
+
+    def recent_requests(self, limit):
+        return self._select(QUERIES['recent_requests'], (limit,))
+
+    def open_requests(self, mask):
+        codes = [group_code(bg) for bg in groups_in_mask(mask)]
+        if not codes:
+            return iter(())
+        sql = QUERIES['open_requests'].format(statuses=_placeholders(OPEN_STATUSES),
+                                              codes=_placeholders(codes))
+        # Rows are decoded as the feed is consumed, so a page only reads what it shows
+        cursor = self._connection().execute(sql, list(OPEN_STATUSES) + codes)
+        return (json.loads(data) for (data,) in cursor)
+
+    # ---------- donor-request assignments ----------
+
+    def get_assignment(self, assignment_id):
+        return self._get('assignments', assignment_id)
+
+    def put_assignment(self, assignment, assignment_statuses=None):
+        if assignment_statuses is None:
+            self._put_many('assignments', [assignment])
+            return
+        with self._write_transaction() as conn:
+            status = conn.execute('SELECT status FROM assignments WHERE assignment_id = ?',
+                                  (assignment['assignment_id'],)).fetchone()
+            if status is None or status[0] not in assignment_statuses:
+                raise ConflictError(f"Assignment {assignment['assignment_id']} is no longer "
+                                    f"{' or '.join(assignment_statuses)}")
+            conn.execute(self._upsert_sql('assignments'), self._row('assignments', assignment))
+
+    def assignments_for_donor(self, donor_id):
+        return self._select(QUERIES['assignments_for_donor'], (donor_id,))
+
+    def assignments_for_request(self, request_id):
+        return self._select(QUERIES['assignments_for_request'], (request_id,))
+
+    def assignments_for_requests(self, request_ids):
+        return self._select_by_request('assignments_for_requests', request_ids)
+
+    def has_assignment(self, donor_id, request_id):
+        return bool(self._query(QUERIES['has_assignment'], (donor_id, request_id)))
+
+    def list_assignments(self):
+        return self._all('assignments')
+
+    # ---------- donations ----------
+
+    def put_donation(self, donation):
+        self._put_many('donations', [donation])
+
+    def donations_for_donor(self, donor_id):
+        return self._select(QUERIES['donations_for_donor'], (donor_id,))
+
+    def confirm_donation(self, assignment, request_data, donor, donation,
+                         assignment_status, fulfilled_units, donor_donations=None):
+        with self._write_transaction() as conn:
+            status = conn.execute('SELECT status FROM assignments WHERE assignment_id = ?',
+                                  (assignment['assignment_id'],)).fetchone()
+            if status is None or status[0] != assignment_status:
+                raise ConflictError(f"Assignment {assignment['assignment_id']} is no longer {assignment_status}")
+            fulfilled = conn.execute(
+                "SELECT COALESCE(json_extract(data, '$.fulfilled_units'), 0) FROM requests WHERE request_id = ?",
+                (request_data['request_id'],)).fetchone()
+            if fulfilled is None or fulfilled[0] != fulfilled_units:
+                raise ConflictError(f"Request {request_data['request_id']} changed since it was read")
+            if donor_donations is not None:
+                self._check_donor(conn, donor, donor_donations)
+            for table, record in (('assignments', assignment), ('requests', with_group_code(request_data)),
+                                  ('donors', with_group_code(donor)), ('donations', donation)):
+                conn.execute(self._upsert_sql(table), self._row(table, record))
+
+    def _check_donor(self, conn, donor, donor_donations):
+        donations = conn.execute(
+            "SELECT COALESCE(json_extract(data, '$.total_donations'), 0) FROM donors WHERE donor_id = ?",
+            (donor['donor_id'],)).fetchone()
+        if donations is None or donations[0] != donor_donations:
+            raise ConflictError(f"Donor {donor['donor_id']} changed since it was read")
+
+    def donations_for_request(self, request_id):
+        return self._select(QUERIES['donations_for_request'], (request_id,))
+
+    def donations_for_requests(self, request_ids):
+        return self._select_by_request('donations_for_requests', request_ids)
+
+    def _select_by_request(self, query, request_ids):
+        """Run an IN query over request IDs and group its rows by request, keeping their order"""
+        grouped = {request_id: [] for request_id in request_ids}
+        request_ids = list(grouped)
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(request_ids), 500):
+            chunk = request_ids[i:i + 500]
+            for record in self._select(QUERIES[query].format(ids=_placeholders(chunk)), chunk):
+                grouped[record['request_id']].append(record)
+        return grouped
+
+    def list_donations(self):
+        return self._all('donations')
+
+    def recent_donations(self, limit):
+        return self._select(QUERIES['recent_donations'], (limit,))
+
+    # ---------- streaming and paging ----------
+
+    def iter_records(self, kind, fields=None):
+        if kind not in TABLES:
+            raise ValueError(f'Unknown record kind {kind!r}')
+        # Documents are decoded as the cursor is consumed
+        cursor = self._connection().execute(f'SELECT data FROM {kind} ORDER BY rowid')
+        return (json.loads(data) for (data,) in cursor)
+
+    def page(self, kind, limit, cursor=None, fields=None):
+        if kind not in TABLES:
+            raise ValueError(f'Unknown record kind {kind!r}')
+        # The cursor is the rowid of the previous page's last record
+        after = int(cursor) if cursor and cursor.isdigit() else 0
+        rows = self._query(f'SELECT rowid, data FROM {kind} WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                           (after, limit + 1))
+        records = [json.loads(data) for _, data in rows[:limit]]
+        return records, (str(rows[limit - 1][0]) if len(rows) > limit else None)
+
+    # ---------- inventory ----------
+
+    def get_inventory(self):
+        rows = {bg: {'units': units, 'donor_count': donor_count}
+                for bg, units, donor_count in
+                self._query('SELECT blood_group, units, donor_count FROM inventory')}
+        return {bg: rows.get(bg, {'units': 0, 'donor_count': 0}) for bg in INVENTORY_GROUPS}
+
+    def inventory_units(self, blood_group):
+        rows = self._query('SELECT units FROM inventory WHERE blood_group = ?', (blood_group,))
+        return rows[0][0] if rows else 0
+
+    def adjust_inventory(self, blood_group, delta):
+        self._transaction([(
+            'UPDATE inventory SET units = MAX(0, units + ?) WHERE blood_group = ?',
+            (delta, blood_group)
+        )])
+        return self.inventory_units(blood_group)
+
+    def use_inventory(self, request_data, withdrawal, units, fulfilled_units):
+        blood_group = request_data['blood_group']
+        with self._write_transaction() as conn:
+            taken = conn.execute('UPDATE inventory SET units = units - ? WHERE blood_group = ? AND units >= ?',
+                                 (units, blood_group, units)).rowcount
+            if not taken:
+                raise ConflictError(f"Fewer than {units} {blood_group} units in stock")
+            fulfilled = conn.execute(
+                "SELECT COALESCE(json_extract(data, '$.fulfilled_units'), 0) FROM requests WHERE request_id = ?",
+                (request_data['request_id'],)).fetchone()
+            if fulfilled is None or fulfilled[0] != fulfilled_units:
+                raise ConflictError(f"Request {request_data['request_id']} changed since it was read")
+            for table, record in (('requests', with_group_code(request_data)), ('donations', withdrawal)):
+                conn.execute(self._upsert_sql(table), self._row(table, record))
+
+    def add_inventory_donor(self, blood_group, donor_id):
+        self._transaction([(
+            'UPDATE inventory SET donor_count = donor_count + 1 WHERE blood_group = ?',
+            (blood_group,)
+        )])
+
+    def add_inventory_donors(self, blood_group, donor_ids):
+        self._transaction([(
+            'UPDATE inventory SET donor_count = donor_count + ? WHERE blood_group = ?',
+            (len(list(donor_ids)), blood_group)
+        )])
+
+
+if __name__ == '__main__':
+    repo = SQLiteRepository(sys.argv[1] if len(sys.argv) > 1 else ':memory:')
+    for query_name, plan in repo.query_plans().items():
+        print(f'{query_name}:')
+        for detail in plan:
+            print(f'    {detail}')
+    repo.check_query_plans()
+    print('✓ All indexed queries use an index')
@@ -0,0 +1,496 @@
+"""
+BloodSync - In-memory Data Stores
+Dictionaries that keep their secondary indexes in sync on every write
+"""
+
+import threading
+from bisect import bisect_left, insort
+from heapq import merge
+
+from compatibility import UNKNOWN_CODE, group_code
+from matching import DonorColumns, EligibilityCache
+from storage.base import CRITICAL_UNITS, LOCATION_FIELDS, OPEN_STATUSES, open_request_key
+
+# Version of the index layout kept by the stores. Pickled stores (snapshots)
+# of another version are re-indexed from their records when loaded.
+STORE_FORMAT = 3
+
+
+def _add_posting(index, value, key):
+    """Add key to the set stored under value in a {value: {keys}} index"""
+    index.setdefault(value, set()).add(key)
+
+
+def _remove_posting(index, value, key):
+    """Remove key from a {value: {keys}} index, dropping empty sets"""
+    posting = index.get(value)
+    if posting is not None:
+        posting.discard(key)
+        if not posting:
+            del index[value]
+
+
+def _add_sorted(index, value, entry):
+    """Insert entry into the sorted list stored under value in a {value: [entries]} index"""
+    insort(index.setdefault(value, []), entry)
+
+
+def _remove_sorted(index, value, entry):
+    """Remove entry from a {value: [entries]} sorted index, dropping empty lists"""
+    entries = index.get(value)
+    if entries is None:
+        return
+    i = bisect_left(entries, entry)
+    if i < len(entries) and entries[i] == entry:
+        del entries[i]
+        if not entries:
+            del index[value]
+
+
+def _restore_store(cls, records, state):
+    store = cls.__new__(cls)
+    dict.update(store, records)
+    store.__dict__.update(state)
+    store._lock = threading.RLock()
+    return store
+
+
+class IndexedStore(dict):
+    """
+    Base class for the in-memory tables.
+    Behaves like a plain dict, but every insert, replace and delete is routed
+    through _index/_unindex so subclasses can maintain secondary indexes.
+    Records changed in place must be passed to reindex() afterwards.
+    Writes and multi-step index reads hold the store's lock, so threads
+    writing different records never see (or leave) half-updated indexes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self._lock = threading.RLock()
+        self._seq = {}
+        self._next_seq = 0
+        # Keys by sequence number (deleted keys stay behind as holes)
+        self._order = []
+        self._reset_indexes()
+        self.update(*args, **kwargs)
+
+    # ---------- index hooks (overridden by subclasses) ----------
+
+    def _reset_indexes(self):
+        pass
+
+    def _index(self, key, record):
+        pass
+
+    def _unindex(self, key):
+        pass
+
+    # ---------- dict write paths ----------
+
+    def __setitem__(self, key, record):
+        with self._lock:
+            if key in self:
+                self._unindex(key)
+            else:
+                self._seq[key] = self._next_seq
+                self._order.append(key)
+                self._next_seq += 1
+            super().__setitem__(key, record)
+            self._index(key, record)
+
+    def __delitem__(self, key):
+        with self._lock:
+            self._unindex(key)
+            del self._seq[key]
+            super().__delitem__(key)
+
+    def pop(self, key, *default):
+        with self._lock:
+            if key not in self:
+                if default:
+                    return default[0]
+                raise KeyError(key)
+            record = self[key]
+            del self[key]
+            return record
+
+    def popitem(self):
+        if not self:
+            raise KeyError('popitem(): dictionary is empty')
+        key = next(reversed(self))
+        return key, self.pop(key)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, record in dict(*args, **kwargs).items():
+            self[key] = record
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._seq.clear()
+            self._order.clear()
+            self._next_seq = 0
+            self._reset_indexes()
+
+    # ---------- helpers ----------
+
+    def __reduce__(self):
+        # Pickle the records together with the built indexes; the default
+        # dict-subclass protocol would replay every record through __setitem__
+        with self._lock:
+            state = {name: value for name, value in self.__dict__.items() if name != '_lock'}
+            return (_restore_store, (type(self), dict(self), state))
+
+    def reindex(self, key):
+        """Refresh the indexes after a record was modified in place"""
+        with self._lock:
+            self._unindex(key)
+            self._index(key, self[key])
+
+    def after(self, seq, limit):
+        """Return up to limit (seq, record) pairs inserted after sequence number seq, in insertion order"""
+        with self._lock:
+            found = []
+            for i in range(max(seq + 1, 0), len(self._order)):
+                key = self._order[i]
+                if self._seq.get(key) == i:
+                    found.append((i, self[key]))
+                    if len(found) == limit:
+                        break
+            return found
+
+    def ordered(self, keys):
+        """Return the records for keys in insertion order"""
+        with self._lock:
+            return [self[k] for k in sorted(keys, key=self._seq.__getitem__)]
+
+
+class NgramIndex:
+    """
+    Case-insensitive substring index over a short text field.
+    Keys are grouped by their lowercased value, and every 1..GRAM character
+    slice of a distinct value maps to the values containing it. Fields like
+    city repeat across many keys, so an insert is usually a single set add.
+    Short queries are a single lookup; longer ones intersect their GRAM-sized
+    slices and then verify the few remaining values.
+    """
+
+    GRAM = 3
+
+    def __init__(self):
+        self._grams = {}
+        self._keys = {}
+        self._values = {}
+
+    def _slices(self, text):
+        return {text[i:i + n] for n in range(1, self.GRAM + 1)
+                for i in range(len(text) - n + 1)}
+
+    def add(self, key, text):
+        text = str(text or '').lower()
+        self._values[key] = text
+        keys = self._keys.get(text)
+        if keys is None:
+            keys = self._keys[text] = set()
+            for gram in self._slices(text):
+                _add_posting(self._grams, gram, text)
+        keys.add(key)
+
+    def remove(self, key):
+        text = self._values.pop(key, None)
+        if text is None:
+            return
+        keys = self._keys[text]
+        keys.discard(key)
+        if not keys:
+            del self._keys[text]
+            for gram in self._slices(text):
+                _remove_posting(self._grams, gram, text)
+
+    def _matching_values(self, query):
+        if len(query) <= self.GRAM:
+            return self._grams.get(query, ())
+        postings = sorted(
+            (self._grams.get(query[i:i + self.GRAM], set())
+             for i in range(len(query) - self.GRAM + 1)),
+            key=len
+        )
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates &= posting
+        return [value for value in candidates if query in value]
+
+    def search(self, query):
+        """Get the set of keys whose value contains query (case-insensitive)"""
+        query = query.lower()
+        if not query:
+            return set(self._values)
+        keys = set()
+        for value in self._matching_values(query):
+            keys |= self._keys[value]
+        return keys
+
+
+class DonorStore(IndexedStore):
+    """
+    Donors dictionary: {donor_id: donor_data}
+    Each donor is stamped with its blood group code and bucketed by
+    (group_code, available, status) so that compatibility lookups only visit
+    the buckets whose code bit is set in the recipient's donor mask.
+    City, state and pincode are covered by substring indexes for location search,
+    and the matching fields are mirrored into columns for vectorized scoring.
+    Every write bumps the donor's version, invalidating its cached eligibility.
+    """
+
+    def _reset_indexes(self):
+        self._buckets = {}
+        self._bucket_of = {}
+        self._locations = {field: NgramIndex() for field in LOCATION_FIELDS}
+        self.columns = DonorColumns()
+        self._versions = {}
+        self._eligibility = EligibilityCache()
+
+    def _index(self, donor_id, donor):
+        donor['group_code'] = group_code(donor.get('blood_group'))
+        key = (donor['group_code'], bool(donor.get('available')), donor.get('status'))
+        _add_posting(self._buckets, key, donor_id)
+        self._bucket_of[donor_id] = key
+        for field, index in self._locations.items():
+            index.add(donor_id, donor.get(field))
+        self.columns.put(donor_id, donor, self._seq[donor_id])
+        self._versions[donor_id] = self._versions.get(donor_id, 0) + 1
+        self._eligibility.invalidate(donor_id)
+
+    def _unindex(self, donor_id):
+        _remove_posting(self._buckets, self._bucket_of.pop(donor_id), donor_id)
+        for index in self._locations.values():
+            index.remove(donor_id)
+
+    def __delitem__(self, donor_id):
+        # Rows are only dropped on delete; reindex() overwrites a donor's row in place
+        super().__delitem__(donor_id)
+        self.columns.remove(donor_id)
+        self._versions.pop(donor_id, None)
+        self._eligibility.invalidate(donor_id)
+
+    def eligibility(self, donor_id, today=None):
+        """Get a donor's (match_score, can_donate_now, next_eligible_day), cached for the day"""
+        return self._eligibility.get(donor_id, self._versions[donor_id], self[donor_id], today)
+
+    def bucket(self, blood_group, available=True, status='active'):
+        """Get the set of donor IDs in one (blood_group, available, status) bucket"""
+        return self._buckets.get((group_code(blood_group), available, status), set())
+
+    def active_ids(self, mask=None):
+        """
+        Get IDs of available, active donors whose group code bit is set in mask
+        A mask of None selects every group, including unrecognised ones
+        """
+        ids = set()
+        with self._lock:
+            for (code, available, status), bucket in self._buckets.items():
+                if not available or status != 'active':
+                    continue
+                if mask is None or (code != UNKNOWN_CODE and mask >> code & 1):
+                    ids |= bucket
+        return ids
+
+    def location_ids(self, location, fields=LOCATION_FIELDS):
+        """Get IDs of donors whose city/state/pincode contains location"""
+        ids = set()
+        with self._lock:
+            for field in fields:
+                ids |= self._locations[field].search(location)
+        return ids
+
+    def search(self, mask=None, location=None, fields=LOCATION_FIELDS):
+        """
+        Find available, active donors by blood group mask and location substring
+        Returns donors in registration order
+        """
+        ids = self.active_ids(mask)
+        if location and ids:
+            ids &= self.location_ids(location, fields)
+        return self.ordered(ids)
+
+
+class UserStore(IndexedStore):
+    """Site accounts: {user_id: user_data}, indexed by email"""
+
+    def _reset_indexes(self):
+        self._by_email = {}
+        self._email_of = {}
+
+    def _index(self, user_id, user):
+        email = user.get('email')
+        _add_posting(self._by_email, email, user_id)
+        self._email_of[user_id] = email
+
+    def _unindex(self, user_id):
+        _remove_posting(self._by_email, self._email_of.pop(user_id), user_id)
+
+    def by_email(self, email):
+        """Get the first account registered with an email, or None"""
+        with self._lock:
+            users = self.ordered(self._by_email.get(email, ()))
+        return users[0] if users else None
+
+
+class AssignmentStore(IndexedStore):
+    """
+    Donor-Request assignments: {assignment_id: assignment_data}
+    Indexed by donor_id, by request_id and by (donor_id, request_id) pair.
+    """
+
+    def _reset_indexes(self):
+        self._by_donor = {}
+        self._by_request = {}
+        self._by_pair = {}
+        self._keys_of = {}
+
+    def _index(self, assignment_id, assignment):
+        donor_id = assignment.get('donor_id')
+        request_id = assignment.get('request_id')
+        _add_posting(self._by_donor, donor_id, assignment_id)
+        _add_posting(self._by_request, request_id, assignment_id)
+        _add_posting(self._by_pair, (donor_id, request_id), assignment_id)
+        self._keys_of[assignment_id] = (donor_id, request_id)
+
+    def _unindex(self, assignment_id):
+        donor_id, request_id = self._keys_of.pop(assignment_id)
+        _remove_posting(self._by_donor, donor_id, assignment_id)
+        _remove_posting(self._by_request, request_id, assignment_id)
+        _remove_posting(self._by_pair, (donor_id, request_id), assignment_id)
+
+    def for_donor(self, donor_id):
+        """Get all assignments of a donor (creation order)"""
+        return self.ordered(self._by_donor.get(donor_id, ()))
+
+    def for_request(self, request_id):
+        """Get all assignments for a request (creation order)"""
+        return self.ordered(self._by_request.get(request_id, ()))
+
+    def has_pair(self, donor_id, request_id):
+        """Check if the donor already has an assignment for the request"""
+        return (donor_id, request_id) in self._by_pair
+
+
+class DonationStore(IndexedStore):
+    """
+    Donations dictionary: {donation_id: donation_data}
+    Indexed by donor_id and by request_id, each kept ordered by donation_date.
+    """
+
+    def _reset_indexes(self):
+        self._by_donor = {}
+        self._by_request = {}
+        self._keys_of = {}
+
+    def _index(self, donation_id, donation):
+        entry = (donation.get('donation_date') or '', self._seq[donation_id], donation_id)
+        donor_id = donation.get('donor_id')
+        request_id = donation.get('request_id')
+        if donor_id is not None:
+            _add_sorted(self._by_donor, donor_id, entry)
+        if request_id is not None:
+            _add_sorted(self._by_request, request_id, entry)
+        self._keys_of[donation_id] = (donor_id, request_id, entry)
+
+    def _unindex(self, donation_id):
+        donor_id, request_id, entry = self._keys_of.pop(donation_id)
+        _remove_sorted(self._by_donor, donor_id, entry)
+        _remove_sorted(self._by_request, request_id, entry)
+
+    def for_donor(self, donor_id):
+        """Get a donor's donations ordered by donation date"""
+        return [self[entry[-1]] for entry in self._by_donor.get(donor_id, ())]
+
+    def for_request(self, request_id):
+        """Get the donations made towards a request ordered by donation date"""
+        return [self[entry[-1]] for entry in self._by_request.get(request_id, ())]
+
+
+class RequestStore(IndexedStore):
+    """
+    Blood requests dictionary: {request_id: request_data}
+    Each request is stamped with its blood group code.
+    Keeps a running count of requests per status, and one priority queue of
+    open requests per blood group ordered by (urgency, created_at). Requests
+    leave their queue as soon as they are reindexed with a closed status.
+    """
+
+    def _reset_indexes(self):
+        self._status_counts = {}
+        self._status_of = {}
+        self._open_by_group = {}
+        self._open_entry_of = {}
+
+    def _index(self, request_id, request_data):
+        request_data['group_code'] = group_code(request_data.get('blood_group'))
+        status = request_data.get('status')
+        self._status_counts[status] = self._status_counts.get(status, 0) + 1
+        self._status_of[request_id] = status
+        if status in OPEN_STATUSES:
+            entry = (*open_request_key(request_data), self._seq[request_id], request_id)
+            _add_sorted(self._open_by_group, request_data['group_code'], entry)
+            self._open_entry_of[request_id] = (request_data['group_code'], entry)
+
+    def _unindex(self, request_id):
+        status = self._status_of.pop(request_id)
+        self._status_counts[status] -= 1
+        if not self._status_counts[status]:
+            del self._status_counts[status]
+        open_entry = self._open_entry_of.pop(request_id, None)
+        if open_entry is not None:
+            _remove_sorted(self._open_by_group, *open_entry)
+
+    def count_status(self, *statuses):
+        """Count requests in any of the given statuses"""
+        return sum(self._status_counts.get(status, 0) for status in statuses)
+
+    def open_requests(self, mask):
+        """
+        Iterate open requests whose group code bit is set in mask,
+        most urgent first, then oldest first (k-way merge of the group queues)
+        """
+        # Merge copies of the queues: they change as requests are written
+        with self._lock:
+            queues = [list(queue) for code, queue in self._open_by_group.items()
+                      if code != UNKNOWN_CODE and mask >> code & 1]
+        for entry in merge(*queues):
+            yield self[entry[-1]]
+
+
+class InventoryStore(IndexedStore):
+    """
+    Blood inventory by blood group: {blood_group: {'units': n, 'donors': [...]}}
+    Keeps the total unit count and the set of critical groups up to date.
+    """
+
+    def _reset_indexes(self):
+        self.total_units = 0
+        self._units_of = {}
+        self._critical = set()
+
+    def _index(self, blood_group, stock):
+        units = stock.get('units', 0)
+        self.total_units += units
+        self._units_of[blood_group] = units
+        if units < CRITICAL_UNITS:
+            self._critical.add(blood_group)
+
+    def _unindex(self, blood_group):
+        self.total_units -= self._units_of.pop(blood_group)
+        self._critical.discard(blood_group)
+
+    def critical_groups(self):
+        """Get blood groups below CRITICAL_UNITS (inventory order)"""
+        return [bg for bg in self if bg in self._critical]
@@ -0,0 +1,248 @@
+"""
+BloodSync - Write-ahead Log
+Append-only mutation log plus compact snapshots for the in-memory backend.
+
+Every write is appended to the log as one frame: a (length, crc32) header
+followed by the pickled entry. Frames are buffered and fsynced in batches:
+as soon as batch_size entries are pending, or by a background flusher every
+sync_interval seconds, so a crash loses at most that window of writes.
+A snapshot is a pickle of the full state; once it is in place the log is
+truncated. The first frame of a log carries its generation number; a log
+older than the snapshot is skipped on replay.
+"""
+
+import gc
+import logging
+import mmap
+import os
+import pickle
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single-process use only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LOG_FILE = 'wal.log'
+SNAPSHOT_FILE = 'snapshot.pickle'
+LOCK_FILE = 'LOCK'
+
+# Frame header: payload length and CRC32 of the payload
+FRAME = struct.Struct('<II')
+
+
+def encode_frame(entry):
+    payload = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+    return FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_frames(buffer):
+    """
+    Yield (entry, end_offset) for each intact frame in buffer.
+    Stops at the first short or corrupt frame (a torn append).
+    """
+    view = memoryview(buffer)
+    offset = 0
+    end = len(view)
+    while offset + FRAME.size <= end:
+        length, crc = FRAME.unpack_from(view, offset)
+        start = offset + FRAME.size
+        payload = view[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        offset = start + length
+        yield pickle.loads(payload), offset
+
+
+@contextmanager
+def gc_paused():
+    """
+    Pause the cyclic garbage collector around bulk loads and dumps
+    Recovery allocates millions of acyclic objects, and every collection
+    triggered on the way would traverse all of them.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _fsync_dir(path):
+    """Make a rename or file creation inside path durable"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class MutationLog:
+    """Append-only, fsync-batched log of mutations with snapshot support"""
+
+    def __init__(self, directory, batch_size=256, sync_interval=0.05):
+        self.directory = directory
+        self.log_path = os.path.join(directory, LOG_FILE)
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        self.batch_size = batch_size
+        self.sync_interval = sync_interval
+        self.generation = 0
+        # Entries appended since the last snapshot
+        self.entries = 0
+        self._pending = 0
+        self._file = None
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = None
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = self._acquire_directory_lock()
+
+    def _acquire_directory_lock(self):
+        """Make sure only one process at a time appends to this log"""
+        lock_file = open(os.path.join(self.directory, LOCK_FILE), 'w')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                raise RuntimeError(f'{self.directory} is in use by another BloodSync process')
+        return lock_file
+
+    # ---------- recovery ----------
+
+    def load_snapshot(self):
+        """Get the latest snapshot's state, or None if there is no snapshot"""
+        if not os.path.exists(self.snapshot_path):
+            return None
+        with open(self.snapshot_path, 'rb') as f:
+            snapshot = pickle.load(f)
+        self.generation = snapshot['generation']
+        return snapshot['state']
+
+    def replay(self):
+        """
+        Yield the entries logged since the loaded snapshot.
+        A torn final frame (crash mid-append) is truncated away.
+        """
+        if not os.path.exists(self.log_path) or os.path.getsize(self.log_path) == 0:
+            return
+        good = 0
+        with open(self.log_path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            frames = read_frames(buffer)
+            try:
+                header = next(frames, None)
+                generation = header[0].get('generation') if header else None
+                if generation is None or generation < self.generation:
+                    # Stale log left over from before the last snapshot
+                    logger.info(f"Skipping stale write-ahead log (generation {generation})")
+                    return
+                good = header[1]
+                for entry, good in frames:
+                    self.entries += 1
+                    yield entry
+                size = len(buffer)
+            finally:
+                # Release the generator's view of the mapping before it is closed
+                frames.close()
+        if good < size:
+            logger.warning(f"Truncating torn write-ahead log tail at byte {good}")
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(good)
+
+    def open(self):
+        """Start appending (call after replay) and start the background flusher"""
+        if self._log_generation() == self.generation:
+            self._file = open(self.log_path, 'ab')
+        else:
+            self._start_log()
+        self._flusher = threading.Thread(target=self._flush_loop, name='wal-flusher', daemon=True)
+        self._flusher.start()
+
+    def _log_generation(self):
+        if not os.path.exists(self.log_path):
+            return None
+        with open(self.log_path, 'rb') as f:
+            header = next(read_frames(f.read(64 * 1024)), None)
+        return header[0].get('generation') if header else None
+
+    def _start_log(self):
+        """Truncate the log and write a header for the current generation"""
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.log_path, 'wb')
+        self._file.write(encode_frame({'generation': self.generation}))
+        self._sync()
+        _fsync_dir(self.directory)
+        self.entries = 0
+
+    # ---------- appending ----------
+
+    def append(self, entry):
+        """Append one mutation; durable once the current batch is synced"""
+        frame = encode_frame(entry)
+        with self._lock:
+            self._file.write(frame)
+            self._pending += 1
+            self.entries += 1
+            if self._pending >= self.batch_size:
+                self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def sync(self):
+        """Flush and fsync any buffered entries"""
+        with self._lock:
+            if self._pending:
+                self._sync()
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.sync_interval):
+            self.sync()
+
+    # ---------- snapshots ----------
+
+    def snapshot(self, state):
+        """
+        Write state as the new snapshot and start an empty log.
+        The caller must hold off writers until this returns.
+        """
+        with self._lock:
+            if self._pending:
+                self._sync()
+            generation = self.generation + 1
+            tmp_path = self.snapshot_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'generation': generation, 'state': state}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            _fsync_dir(self.directory)
+            self.generation = generation
+            self._start_log()
+
+    def close(self):
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+BloodSync Inventory Concurrency Check
+Runs many parallel writers adding and withdrawing units of one blood group
+against the configured backend (BLOODSYNC_BACKEND, see storage/__init__.py)
+and checks that no update is lost. A second round only withdraws, asking for
+more than is in stock, so withdrawals hit the floor at 0 (on DynamoDB: the
+failed units >= :needed condition, the conditional SET to 0 and the retries).
+Point DYNAMODB_ENDPOINT_URL at DynamoDB Local to exercise the conditional
+DynamoDB updates.
+
+Usage: python stress_inventory.py [writers] [updates_per_writer] [blood_group]
+"""
+
+import random
+import sys
+import threading
+import time
+
+from storage import get_repository
+
+
+def run_writers(repo, blood_group, deltas):
+    """Apply each writer's deltas from its own thread; returns (levels, errors, seconds)"""
+    barrier = threading.Barrier(len(deltas))
+    levels = []
+    errors = []
+
+    def writer(my_deltas):
+        barrier.wait()
+        try:
+            for delta in my_deltas:
+                level = repo.adjust_inventory(blood_group, delta)
+                if level < 0:
+                    errors.append('negative stock')
+                levels.append((delta, level))
+        except Exception as e:
+            errors.append(f'{type(e).__name__}: {e}')
+
+    threads = [threading.Thread(target=writer, args=(d,)) for d in deltas]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return levels, errors, time.perf_counter() - started
+
+
+def report(expected, final, errors):
+    print(f"Expected: {expected} units")
+    print(f"Final:    {final} units")
+    for error in errors[:10]:
+        print(f"✗ {error}")
+    if errors or final != expected:
+        print(f"✗ Lost {expected - final} units" if final != expected else "✗ Writer errors")
+        return False
+    return True
+
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    blood_group = sys.argv[3] if len(sys.argv) > 3 else 'AB-'
+
+    repo = get_repository()
+    if hasattr(repo, 'initialize_tables') and not repo.initialize_tables():
+        sys.exit("✗ Could not initialize tables")
+
+    print("=" * 70)
+    print(f"BloodSync Inventory Check: {writers} writers x {updates} updates on {blood_group} "
+          f"({type(repo).__name__})")
+    print("=" * 70)
+
+    # Enough stock that withdrawals never hit the floor, so every delta must land
+    original = repo.inventory_units(blood_group)
+    start = repo.adjust_inventory(blood_group, writers * updates * 5)
+    deltas = [[random.choice((1, 2, 3, -1, -2, -3)) for _ in range(updates)] for _ in range(writers)]
+    _, errors, elapsed = run_writers(repo, blood_group, deltas)
+    final = repo.inventory_units(blood_group)
+    print(f"Updates:  {writers * updates} in {elapsed:.2f}s ({writers * updates / elapsed:.0f}/s)")
+    ok = report(start + sum(map(sum, deltas)), final, errors)
+
+    # Withdrawals only, about twice the stock: in whatever order they land, the
+    # stock ends at the serialized result floored at 0
+    start = repo.adjust_inventory(blood_group, writers * updates - final)
+    deltas = [[-random.randint(1, 3) for _ in range(updates)] for _ in range(writers)]
+    print("-" * 70)
+    print(f"Over-withdrawal: {start} units in stock, {-sum(map(sum, deltas))} withdrawn")
+    levels, errors, elapsed = run_writers(repo, blood_group, deltas)
+    final = repo.inventory_units(blood_group)
+    # The stock only goes down, so every withdrawal that did not empty it left a level no other one did
+    left = [level for _, level in levels if level > 0]
+    if len(left) != len(set(left)):
+        errors.append(f'{len(left) - len(set(left))} withdrawals reported a level another one had')
+    floored = sum(1 for delta, level in levels if level == 0)
+    print(f"Updates:  {len(levels)} in {elapsed:.2f}s, {floored} at the floor")
+    ok = report(max(0, start + sum(map(sum, deltas))), final, errors) and ok
+
+    # Restore the starting level
+    repo.adjust_inventory(blood_group, original - final)
+    if not ok:
+        sys.exit(1)
+    print("✓ No lost updates")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+BloodSync Locking Check
+Drives the donation confirmation and inventory withdrawal routes from many
+threads at once against a handful of shared requests, then checks that:
+every assignment was confirmed at most once, each request's fulfilled units
+equal the units donated or withdrawn for it, withdrawals never took more
+than a request needed, each donor's total_donations equals their
+donations, and no stock was lost or created.
+On the in-memory backends it then runs confirmations on disjoint requests
+(no shared records) at increasing thread counts, once under the per-record
+lock stripes and once under a single global lock, and reports how many
+lock acquisitions had to wait and for how long. A writer only waits while
+the holder is stalled inside its critical section: rarely on the plain
+in-memory backend, whose sections are short and share the GIL, but on
+every batched log fsync of the durable one (BLOODSYNC_DATA_DIR).
+
+Runs against the configured backend (BLOODSYNC_BACKEND, see
+storage/__init__.py) and writes test records to it: use a scratch store.
+
+Usage: python stress_locking.py [threads] [requests] [assignments_per_request]
+"""
+
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+import app as bloodsync
+from storage import ConflictError
+from storage.locks import LockStripes
+
+BLOOD_GROUP = 'AB+'
+
+
+def run_threads(count, target):
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def run(index):
+        barrier.wait()
+        try:
+            target(index)
+        except Exception as e:
+            errors.append(f'{type(e).__name__}: {e}')
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, errors
+
+
+def make_request(repo, units_needed):
+    request_id = f"REQ-{uuid.uuid4().hex.upper()}"
+    repo.put_request({
+        'request_id': request_id, 'requestor_id': 'STRESS', 'patient_name': 'Stress Test',
+        'blood_group': BLOOD_GROUP, 'units_needed': units_needed, 'fulfilled_units': 0,
+        'urgency': 'normal', 'hospital_name': 'Stress Hospital', 'status': 'pending',
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    })
+    return request_id
+
+
+def make_donor(repo):
+    donor_id = f"DON-{uuid.uuid4().hex.upper()}"
+    repo.put_donor({
+        'donor_id': donor_id, 'name': 'Stress Donor', 'blood_group': BLOOD_GROUP, 'age': 30,
+        'weight': 70, 'city': 'Stress City', 'state': 'Stress', 'pincode': '000000',
+        'available': True, 'status': 'active', 'total_donations': 0, 'last_donation': None,
+    })
+    return donor_id
+
+
+def make_assignment(repo, donor_id, request_id):
+    assignment_id = f"ASG-{uuid.uuid4().hex.upper()}"
+    repo.put_assignment({
+        'assignment_id': assignment_id, 'donor_id': donor_id, 'request_id': request_id,
+        'status': 'accepted', 'units_offered': 1,
+    })
+    return assignment_id
+
+
+def check_invariants(repo, request_ids, donor_ids, assignment_ids, stock_start, withdrawn):
+    problems = []
+    donations_by_donor = Counter()
+    confirmed = Counter()
+    for request_id in request_ids:
+        request_data = repo.get_request(request_id)
+        donations = repo.donations_for_request(request_id)
+        units = sum(d['units'] for d in donations)
+        if request_data['fulfilled_units'] != units:
+            problems.append(f"{request_id}: fulfilled_units {request_data['fulfilled_units']} "
+                            f"but {units} units donated or withdrawn")
+        # Donors may give past the need, the blood bank may not
+        from_stock = sum(d['units'] for d in donations if d.get('donation_type') == 'inventory_withdrawal')
+        if from_stock != request_data.get('inventory_used', 0):
+            problems.append(f"{request_id}: inventory_used {request_data.get('inventory_used', 0)} "
+                            f"but {from_stock} units withdrawn")
+        if from_stock > request_data['units_needed']:
+            problems.append(f"{request_id}: {from_stock} units withdrawn for a need of "
+                            f"{request_data['units_needed']}")
+        for donation in donations:
+            if donation.get('assignment_id'):
+                confirmed[donation['assignment_id']] += 1
+                donations_by_donor[donation['donor_id']] += 1
+    for assignment_id in assignment_ids:
+        if confirmed[assignment_id] > 1:
+            problems.append(f"{assignment_id}: confirmed {confirmed[assignment_id]} times")
+    for donor_id in donor_ids:
+        total = repo.get_donor(donor_id).get('total_donations', 0)
+        if total != donations_by_donor[donor_id]:
+            problems.append(f"{donor_id}: total_donations {total} but {donations_by_donor[donor_id]} donations")
+    stock_end = repo.inventory_units(BLOOD_GROUP)
+    if stock_start - stock_end != withdrawn:
+        problems.append(f"Stock went from {stock_start} to {stock_end} for {withdrawn} units withdrawn")
+    return problems
+
+
+def invariant_phase(repo, client_for, threads, request_count, per_request):
+    # Stock covers half the needs, so withdrawals compete for it and for what is left of each need
+    request_ids = [make_request(repo, per_request) for _ in range(request_count)]
+    donor_ids = [make_donor(repo) for _ in range(max(4, threads // 4))]
+    assignment_ids = [make_assignment(repo, random.choice(donor_ids), request_id)
+                      for request_id in request_ids for _ in range(per_request)]
+    stock_start = repo.adjust_inventory(BLOOD_GROUP, request_count * per_request // 2)
+
+    def worker(index):
+        client = client_for()
+        rng = random.Random(index)
+        for _ in range(len(assignment_ids) // threads * 4 + 4):
+            if rng.random() < 0.7:
+                client.post(f'/donor/confirm-donation/{rng.choice(assignment_ids)}',
+                            data={'units_donated': 1})
+            else:
+                client.post(f'/request/{rng.choice(request_ids)}/use-inventory',
+                            data={'units_from_inventory': 1})
+
+    elapsed, errors = run_threads(threads, worker)
+    total_withdrawn = sum(d['units'] for request_id in request_ids
+                          for d in repo.donations_for_request(request_id)
+                          if d.get('donation_type') == 'inventory_withdrawal')
+    problems = errors + check_invariants(repo, request_ids, donor_ids, assignment_ids,
+                                         stock_start, total_withdrawn)
+    completed = sum(repo.get_assignment(a)['status'] == 'completed' for a in assignment_ids)
+    print(f"Confirmed {completed}/{len(assignment_ids)} assignments, withdrew {total_withdrawn} "
+          f"units in {elapsed:.2f}s")
+    return problems
+
+
+def confirm(repo, assignment_id):
+    """The confirmation route's read-copy-write, retried on conflict"""
+    while True:
+        assignment = repo.get_assignment(assignment_id)
+        if assignment['status'] != 'accepted':
+            raise RuntimeError(f"{assignment_id} was confirmed by another writer")
+        donor, request_data = repo.get_donor_and_request(assignment['donor_id'], assignment['request_id'])
+        seen_fulfilled = request_data.get('fulfilled_units', 0)
+        seen_donations = donor.get('total_donations', 0)
+        request_data = dict(request_data, fulfilled_units=seen_fulfilled + 1, status='partial')
+        donor = dict(donor, total_donations=seen_donations + 1)
+        donation = {'donation_id': f"DNT-{uuid.uuid4().hex.upper()}", 'donor_id': donor['donor_id'],
+                    'request_id': request_data['request_id'], 'units': 1,
+                    'donation_date': time.strftime('%Y-%m-%d %H:%M:%S'), 'assignment_id': assignment_id}
+        try:
+            repo.confirm_donation(dict(assignment, status='completed'), request_data, donor, donation,
+                                  assignment_status='accepted', fulfilled_units=seen_fulfilled,
+                                  donor_donations=seen_donations)
+            return
+        except ConflictError:
+            continue
+
+
+def contention_phase(repo, thread_counts, confirmations):
+    """Lock waits of confirmations on disjoint requests, striped vs. one global lock"""
+    backend = repo.repository
+    striped = getattr(backend, '_locks', None)
+    if not isinstance(striped, LockStripes):
+        print(f"No lock stripes on {type(backend).__name__}; contention is not measured")
+        return []
+    print(f"{'':>8} {'striped':^30} {'global lock':^30}")
+    print(f"{'threads':>8}" + f" {'waits':>8} {'wait ms':>10} {'conf/s':>10}" * 2)
+    for threads in thread_counts:
+        per_thread = max(1, confirmations // threads)
+        row = ''
+        for locks in (LockStripes(), LockStripes(1)):
+            work = []
+            for _ in range(threads):
+                request_id, donor_id = make_request(repo, per_thread), make_donor(repo)
+                work.append([make_assignment(repo, donor_id, request_id) for _ in range(per_thread)])
+            backend._locks = locks
+            try:
+                elapsed, errors = run_threads(threads, lambda i: [confirm(repo, a) for a in work[i]])
+            finally:
+                backend._locks = striped
+            if errors:
+                return errors
+            row += f" {locks.waits:>8} {locks.wait_seconds * 1000:>10.1f} {threads * per_thread / elapsed:>10.0f}"
+        print(f"{threads:>8}{row}")
+    return []
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    request_count = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    per_request = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    repo = bloodsync.repo
+    if hasattr(repo, 'initialize_tables') and not repo.initialize_tables():
+        sys.exit("✗ Could not initialize tables")
+
+    print("=" * 70)
+    print(f"BloodSync Locking Check: {threads} threads on {request_count} requests "
+          f"({type(repo.repository).__name__})")
+    print("=" * 70)
+    problems = invariant_phase(repo, bloodsync.app.test_client, threads, request_count, per_request)
+    for problem in problems[:10]:
+        print(f"✗ {problem}")
+    if problems:
+        print(f"✗ {len(problems)} invariant violations")
+        sys.exit(1)
+    print("✓ Invariants hold")
+
+    print()
+    counts = sorted({1, 4, 16, threads})
+    problems = contention_phase(repo, counts, confirmations=threads * 50)
+    for problem in problems[:10]:
+        print(f"✗ {problem}")
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Shared fixtures. `repo` runs a test once per storage backend: in memory,
+SQLite in a temporary file, and DynamoDB in process through moto (skipped
+when moto or boto3 is not installed; see requirements-dev.txt).
+"""
+
+import threading
+
+import pytest
+
+from storage import get_repository
+
+BACKENDS = ('memory', 'sqlite', 'dynamodb')
+
+
+@pytest.fixture(params=BACKENDS)
+def repo(request, tmp_path, monkeypatch):
+    backend = request.param
+    if backend == 'sqlite':
+        monkeypatch.setenv('BLOODSYNC_SQLITE_PATH', str(tmp_path / 'bloodsync.db'))
+    if backend != 'dynamodb':
+        monkeypatch.delenv('BLOODSYNC_DATA_DIR', raising=False)
+        repository = get_repository(backend)
+        yield repository
+        if hasattr(repository, 'close'):
+            repository.close()
+        return
+
+    moto = pytest.importorskip('moto')
+    from moto.dynamodb.responses import DynamoHandler
+    from storage import aws
+    # moto applies a call in the calling thread without locking, and rolls back a failed
+    # transaction by restoring whole tables; one call at a time is what DynamoDB guarantees
+    # per item, which is all the conditional writes rely on
+    call_action = DynamoHandler.call_action
+    lock = threading.Lock()
+
+    def serialized(self):
+        with lock:
+            return call_action(self)
+    monkeypatch.setattr(DynamoHandler, 'call_action', serialized)
+    for name, value in (('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'),
+                        ('AWS_SESSION_TOKEN', 'testing'), ('AWS_DEFAULT_REGION', 'ap-south-1')):
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv('DYNAMODB_ENDPOINT_URL', raising=False)
+    # The shared session picks up the fake credentials only if it is created inside the mock
+    aws.reset()
+    with moto.mock_aws():
+        repository = get_repository(backend)
+        assert repository.initialize_tables()
+        yield repository
+    aws.reset()
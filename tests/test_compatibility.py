@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from compatibility import (BLOOD_COMPATIBILITY, BLOOD_GROUPS, RECEIVE_COMPATIBILITY, UNKNOWN_CODE,
+                           can_give, donor_mask, filter_compatible, group_bit, group_code,
+                           groups_in_mask, recipient_mask)
+
+
+def antigens_allow(donor, recipient):
+    """Reference rule: the recipient carries every antigen of the donor"""
+    antigens = lambda bg: {a for a in ('A', 'B') if a in bg[:-1]} | ({'Rh'} if bg.endswith('+') else set())
+    return antigens(donor) <= antigens(recipient)
+
+
+@pytest.mark.parametrize('donor', BLOOD_GROUPS)
+@pytest.mark.parametrize('recipient', BLOOD_GROUPS)
+def test_masks_follow_the_antigen_rule(donor, recipient):
+    expected = antigens_allow(donor, recipient)
+    assert can_give(group_code(donor), group_code(recipient)) == expected
+    assert bool(recipient_mask(donor) & group_bit(recipient)) == expected
+    assert bool(donor_mask(recipient) & group_bit(donor)) == expected
+    assert (recipient in BLOOD_COMPATIBILITY[donor]) == expected
+
+
+@pytest.mark.parametrize('blood_group', BLOOD_GROUPS)
+def test_masks_list_the_chart_groups(blood_group):
+    assert groups_in_mask(donor_mask(blood_group)) == RECEIVE_COMPATIBILITY[blood_group]
+    assert sorted(groups_in_mask(recipient_mask(blood_group))) == sorted(BLOOD_COMPATIBILITY[blood_group])
+
+
+def test_universal_donor_and_recipient():
+    assert recipient_mask('O-') == 0xFF
+    assert donor_mask('AB+') == 0xFF
+    assert groups_in_mask(donor_mask('O-')) == ['O-']
+    assert groups_in_mask(recipient_mask('AB+')) == ['AB+']
+
+
+@pytest.mark.parametrize('blood_group', [None, '', 'C+', 'ab+'])
+def test_unknown_groups_never_match(blood_group):
+    assert group_code(blood_group) == UNKNOWN_CODE
+    assert group_bit(blood_group) == 0
+    assert donor_mask(blood_group) == 0
+    assert recipient_mask(blood_group) == 0
+    assert not can_give(UNKNOWN_CODE, group_code('AB+'))
+    assert not can_give(group_code('O-'), UNKNOWN_CODE)
+    assert not filter_compatible(np.arange(len(BLOOD_GROUPS)), blood_group).any()
+
+
+@pytest.mark.parametrize('recipient', BLOOD_GROUPS)
+def test_filter_compatible_matches_can_give(recipient):
+    codes = np.array(list(range(len(BLOOD_GROUPS))) + [UNKNOWN_CODE], dtype=np.uint8)
+    expected = [can_give(int(code), group_code(recipient)) for code in codes]
+    assert filter_compatible(codes, recipient).tolist() == expected
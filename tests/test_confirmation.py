@@ -0,0 +1,157 @@
+import threading
+
+import pytest
+
+from storage import ConflictError
+
+TODAY = '2026-06-01'
+
+
+def seed(repo, units_needed=2, assignments=1):
+    repo.put_donor({'donor_id': 'DON-1', 'name': 'Asha', 'email': 'asha@example.com',
+                    'blood_group': 'O+', 'age': 30, 'weight': 60, 'city': 'Pune', 'state': 'MH',
+                    'pincode': '411001', 'available': True, 'status': 'active',
+                    'total_donations': 0, 'last_donation': None})
+    repo.put_request({'request_id': 'BR-1', 'requestor_id': 'REQ-1', 'patient_name': 'Ravi',
+                      'blood_group': 'O+', 'units_needed': units_needed, 'fulfilled_units': 0,
+                      'urgency': 'urgent', 'status': 'pending', 'created_at': f'{TODAY} 08:00:00'})
+    for i in range(1, assignments + 1):
+        repo.put_assignment({'assignment_id': f'ASGN-{i}', 'donor_id': 'DON-1', 'request_id': 'BR-1',
+                             'units_offered': 1, 'status': 'accepted'})
+
+
+def confirm(repo, assignment_id='ASGN-1', donation_id='DN-1', assignment_status='accepted'):
+    """The confirmation route's write, from freshly read records"""
+    assignment = repo.get_assignment(assignment_id)
+    request_data = repo.get_request('BR-1')
+    donor = repo.get_donor('DON-1')
+    fulfilled = request_data.get('fulfilled_units', 0)
+    donations = donor.get('total_donations', 0)
+    repo.confirm_donation(
+        {**assignment, 'status': 'completed'},
+        {**request_data, 'fulfilled_units': fulfilled + 1,
+         'status': 'fulfilled' if fulfilled + 1 >= request_data['units_needed'] else 'partial'},
+        {**donor, 'total_donations': donations + 1, 'last_donation': TODAY},
+        {'donation_id': donation_id, 'donor_id': 'DON-1', 'request_id': 'BR-1', 'units': 1,
+         'donation_date': f'{TODAY} 10:00:00', 'assignment_id': assignment_id},
+        assignment_status=assignment_status, fulfilled_units=fulfilled, donor_donations=donations)
+
+
+def state(repo):
+    return (repo.get_assignment('ASGN-1')['status'], repo.get_request('BR-1')['fulfilled_units'],
+            repo.get_request('BR-1')['status'], repo.get_donor('DON-1')['total_donations'],
+            sorted(d['donation_id'] for d in repo.donations_for_request('BR-1')),
+            repo.count_requests_by_status('pending'), repo.count_requests_by_status('partial'))
+
+
+def test_confirm_writes_every_record(repo):
+    seed(repo)
+    confirm(repo)
+    assert state(repo) == ('completed', 1, 'partial', 1, ['DN-1'], 0, 1)
+    assert [d['donation_id'] for d in repo.donations_for_donor('DON-1')] == ['DN-1']
+
+
+def test_confirming_twice_conflicts(repo):
+    seed(repo)
+    confirm(repo)
+    with pytest.raises(ConflictError):
+        confirm(repo, donation_id='DN-2')
+    assert state(repo) == ('completed', 1, 'partial', 1, ['DN-1'], 0, 1)
+
+
+def test_confirm_conflicts_on_a_changed_request(repo):
+    seed(repo)
+    assignment = repo.get_assignment('ASGN-1')
+    request_data = repo.get_request('BR-1')
+    donor = repo.get_donor('DON-1')
+    # Another donation lands between the read and the write
+    repo.put_request({**request_data, 'fulfilled_units': 1, 'status': 'partial'})
+    with pytest.raises(ConflictError):
+        repo.confirm_donation(
+            {**assignment, 'status': 'completed'}, {**request_data, 'fulfilled_units': 1},
+            {**donor, 'total_donations': 1},
+            {'donation_id': 'DN-1', 'donor_id': 'DON-1', 'request_id': 'BR-1', 'units': 1,
+             'donation_date': f'{TODAY} 10:00:00'},
+            assignment_status='accepted', fulfilled_units=0, donor_donations=0)
+    assert state(repo) == ('accepted', 1, 'partial', 0, [], 0, 1)
+
+
+def test_confirm_conflicts_on_a_changed_donor(repo):
+    seed(repo)
+    assignment = repo.get_assignment('ASGN-1')
+    donor = repo.get_donor('DON-1')
+    repo.put_donor({**donor, 'total_donations': 4})
+    with pytest.raises(ConflictError):
+        repo.confirm_donation(
+            {**assignment, 'status': 'completed'},
+            {**repo.get_request('BR-1'), 'fulfilled_units': 1, 'status': 'partial'},
+            {**donor, 'total_donations': 1},
+            {'donation_id': 'DN-1', 'donor_id': 'DON-1', 'request_id': 'BR-1', 'units': 1,
+             'donation_date': f'{TODAY} 10:00:00'},
+            assignment_status='accepted', fulfilled_units=0, donor_donations=0)
+    assert state(repo) == ('accepted', 0, 'pending', 4, [], 1, 0)
+
+
+def test_requestor_confirmation_is_conditional(repo):
+    seed(repo)
+    confirmable = ('accepted', 'pending')
+    repo.put_assignment({**repo.get_assignment('ASGN-1'), 'status': 'confirmed_by_requestor'},
+                        assignment_statuses=confirmable)
+    assert repo.get_assignment('ASGN-1')['status'] == 'confirmed_by_requestor'
+    # A second confirmation (or one racing a completed donation) finds the status moved on
+    with pytest.raises(ConflictError):
+        repo.put_assignment({**repo.get_assignment('ASGN-1'), 'status': 'confirmed_by_requestor',
+                             'confirmed_at': 'late'}, assignment_statuses=confirmable)
+    assert 'confirmed_at' not in repo.get_assignment('ASGN-1')
+    with pytest.raises(ConflictError):
+        repo.put_assignment({'assignment_id': 'ASGN-X', 'donor_id': 'DON-1', 'request_id': 'BR-1',
+                             'status': 'confirmed_by_requestor'}, assignment_statuses=confirmable)
+    assert repo.get_assignment('ASGN-X') is None
+
+
+def test_concurrent_confirmations_land_once(repo):
+    seed(repo, units_needed=20, assignments=8)
+    barrier = threading.Barrier(8)
+    landed = []
+
+    def worker(i):
+        barrier.wait()
+        for attempt in range(50):
+            try:
+                confirm(repo, f'ASGN-{i % 4 + 1}', f'DN-{i}-{attempt}')
+                landed.append(i % 4 + 1)
+                return
+            except ConflictError:
+                if repo.get_assignment(f'ASGN-{i % 4 + 1}')['status'] != 'accepted':
+                    return
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Two threads per assignment: each assignment confirmed exactly once
+    assert sorted(landed) == [1, 2, 3, 4]
+    request_data = repo.get_request('BR-1')
+    assert request_data['fulfilled_units'] == 4 == len(repo.donations_for_request('BR-1'))
+    assert repo.get_donor('DON-1')['total_donations'] == 4
+    assert repo.count_requests_by_status('partial') == 1
+
+
+def test_route_reports_a_lost_confirmation_race(monkeypatch):
+    import app as bloodsync
+    repo = bloodsync.repo.repository
+    seed(repo)
+    put_assignment = repo.put_assignment
+
+    def donor_completes_first(assignment, assignment_statuses=None):
+        put_assignment({**repo.get_assignment(assignment['assignment_id']), 'status': 'completed'})
+        return put_assignment(assignment, assignment_statuses=assignment_statuses)
+
+    monkeypatch.setattr(repo, 'put_assignment', donor_completes_first)
+    client = bloodsync.app.test_client()
+    response = client.post('/request/BR-1/confirm-donor/ASGN-1')
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        assert session['_flashes'] == [('error', '✗ Cannot confirm assignment in completed status!')]
+    assert repo.get_assignment('ASGN-1')['status'] == 'completed'
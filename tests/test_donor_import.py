@@ -0,0 +1,90 @@
+import io
+import json
+import re
+from datetime import date, timedelta
+
+import pytest
+
+from donor_import import build_donor, import_donor_file
+from storage.memory import MemoryRepository
+
+REGISTERED_AT = '2026-06-01 09:30:00'
+
+ROW = {'name': 'Asha', 'email': 'asha@example.com', 'phone': '9876543210', 'age': '30',
+       'gender': 'Female', 'blood_group': ' b- ', 'weight': '58.5', 'address': '1 MG Road',
+       'city': 'Pune', 'state': 'Maharashtra', 'pincode': '411001'}
+
+
+def test_build_donor_applies_the_form_defaults():
+    donor = build_donor(dict(ROW), REGISTERED_AT)
+    assert donor['donor_id'].startswith('DON-')
+    assert (donor['blood_group'], donor['age'], donor['weight']) == ('B-', 30, 58.5)
+    assert donor['total_donations'] == 0 and donor['last_donation'] is None
+    assert donor['available'] and donor['status'] == 'active'
+    assert donor['medical_history'] == 'None' and donor['preferred_contact_time'] == 'Anytime'
+    assert donor['registered_at'] == REGISTERED_AT
+
+
+def test_build_donor_normalises_history():
+    donor = build_donor({**ROW, 'last_donation': '2026-1-5', 'total_donations': '3'}, REGISTERED_AT)
+    assert donor['last_donation'] == '2026-01-05'
+    assert donor['total_donations'] == 3
+    assert build_donor({**ROW, 'last_donation': '2026-06-01'}, REGISTERED_AT)['last_donation'] == '2026-06-01'
+
+
+@pytest.mark.parametrize('changes, message', [
+    ({'phone': ''}, 'Missing phone'),
+    ({'age': 'thirty'}, 'Age and weight must be numbers'),
+    ({'weight': None}, 'Missing weight'),
+    ({'age': '17'}, 'Donor age must be between 18 and 65 years!'),
+    ({'age': '66'}, 'Donor age must be between 18 and 65 years!'),
+    ({'weight': '49.9'}, 'weight must be at least 50kg'),
+    ({'blood_group': 'C+'}, "Unknown blood group 'C+'"),
+    ({'last_donation': '05/01/2026'}, "last_donation must be a YYYY-MM-DD date, not '05/01/2026'"),
+    ({'last_donation': '2026-02-30'}, 'last_donation must be a YYYY-MM-DD date'),
+    ({'last_donation': '2026-06-02'}, 'last_donation 2026-06-02 is in the future'),
+    ({'total_donations': 'many'}, "total_donations must be a whole number, not 'many'"),
+    ({'total_donations': '2.5'}, 'total_donations must be a whole number'),
+    ({'total_donations': '-1'}, 'total_donations must not be negative'),
+])
+def test_build_donor_rejects(changes, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        build_donor({**ROW, **changes}, REGISTERED_AT)
+
+
+def test_build_donor_rejects_non_objects():
+    with pytest.raises(ValueError, match='Malformed row'):
+        build_donor(['Asha', 30], REGISTERED_AT)
+
+
+def csv_file(rows):
+    fields = list(ROW) + ['last_donation', 'total_donations']
+    lines = [','.join(fields)] + [','.join(str(row.get(f, '')) for f in fields) for row in rows]
+    return io.BytesIO(('\r\n'.join(lines) + '\r\n').encode())
+
+
+def test_csv_import_writes_valid_rows_and_reports_the_rest():
+    repo = MemoryRepository()
+    future = (date.today() + timedelta(days=1)).isoformat()
+    rows = [ROW, {**ROW, 'age': '80'}, {**ROW, 'blood_group': 'O+'},
+            {**ROW, 'last_donation': future}, {**ROW, 'total_donations': 'x'}]
+    report = import_donor_file(repo, csv_file(rows), 'csv', batch_size=1)
+
+    assert (report.imported, report.rejected) == (2, 3)
+    assert [e['line'] for e in report.errors] == [3, 5, 6]
+    assert 'is in the future' in report.errors[1]['error']
+    assert 'total_donations' in report.errors[2]['error']
+    assert sorted(d['blood_group'] for d in repo.list_donors()) == ['B-', 'O+']
+    inventory = repo.get_inventory()
+    assert inventory['B-']['donor_count'] == 1 and inventory['O+']['donor_count'] == 1
+
+
+def test_jsonl_import_reports_bad_lines():
+    lines = [json.dumps(ROW), '{not json', '', json.dumps({**ROW, 'last_donation': 'yesterday'})]
+    repo = MemoryRepository()
+    report = import_donor_file(repo, io.BytesIO('\n'.join(lines).encode()), 'jsonl')
+    assert (report.imported, report.rejected) == (1, 2)
+    assert [e['line'] for e in report.errors] == [2, 4]
+    assert report.errors[0]['error'].startswith('Invalid JSON')
+    assert 'last_donation' in report.errors[1]['error']
+    assert repo.count_donors() == 1
@@ -0,0 +1,82 @@
+from datetime import date, timedelta
+
+from matching import EligibilityCache, compute_eligibility
+from storage.memory import MemoryRepository
+
+TODAY = date(2026, 6, 1)
+
+
+def donor(last_donation=None, **fields):
+    return {'donor_id': 'D1', 'name': 'D1', 'blood_group': 'O+', 'age': 30, 'weight': 70,
+            'available': True, 'status': 'active', 'total_donations': 0,
+            'last_donation': last_donation, **fields}
+
+
+def days_ago(days, today=TODAY):
+    return (today - timedelta(days=days)).isoformat()
+
+
+def test_cache_keeps_an_entry_for_the_same_version():
+    cache = EligibilityCache()
+    first = cache.get('D1', 1, donor(days_ago(10)), TODAY.toordinal())
+    # Same version: the record passed in is not looked at again
+    assert cache.get('D1', 1, donor(), TODAY.toordinal()) == first
+    assert not first.can_donate_now
+
+
+def test_cache_recomputes_a_new_version():
+    cache = EligibilityCache()
+    assert not cache.get('D1', 1, donor(days_ago(10)), TODAY.toordinal()).can_donate_now
+    assert cache.get('D1', 2, donor(), TODAY.toordinal()).can_donate_now
+
+
+def test_cache_recomputes_after_invalidate():
+    cache = EligibilityCache()
+    cache.get('D1', 1, donor(days_ago(10)), TODAY.toordinal())
+    cache.invalidate('D1')
+    assert cache.get('D1', 1, donor(), TODAY.toordinal()) == compute_eligibility(donor(), TODAY.toordinal())
+
+
+def test_cache_is_dropped_when_the_day_changes():
+    cache = EligibilityCache()
+    record = donor(days_ago(55))
+    assert not cache.get('D1', 1, record, TODAY.toordinal()).can_donate_now
+    tomorrow = TODAY.toordinal() + 1
+    assert cache.get('D1', 1, record, tomorrow) == compute_eligibility(record, tomorrow)
+    assert cache.get('D1', 1, record, tomorrow).can_donate_now
+
+
+def test_rewriting_a_donor_invalidates_its_eligibility():
+    repo = MemoryRepository()
+    repo.put_donor(donor(age=30))
+    eligible = repo.donor_eligibility('D1')
+    assert eligible.can_donate_now and eligible.match_score == 120
+
+    repo.put_donor(donor(date.today().isoformat(), age=30, total_donations=1))
+    deferred = repo.donor_eligibility('D1')
+    assert not deferred.can_donate_now
+    assert deferred == compute_eligibility(repo.get_donor('D1'))
+    assert not repo.has_eligible_donor('O+')
+
+
+def test_confirmed_donation_invalidates_the_donor():
+    repo = MemoryRepository()
+    repo.put_donor(donor())
+    repo.put_request({'request_id': 'BR-1', 'requestor_id': 'REQ-1', 'blood_group': 'O+',
+                      'units_needed': 2, 'fulfilled_units': 0, 'status': 'pending',
+                      'created_at': '2026-01-01 00:00:00'})
+    repo.put_assignment({'assignment_id': 'ASGN-1', 'donor_id': 'D1', 'request_id': 'BR-1',
+                         'status': 'accepted', 'units_offered': 1})
+    assert repo.donor_eligibility('D1').can_donate_now
+
+    repo.confirm_donation(
+        {'assignment_id': 'ASGN-1', 'donor_id': 'D1', 'request_id': 'BR-1', 'status': 'completed',
+         'units_offered': 1},
+        {**repo.get_request('BR-1'), 'fulfilled_units': 1, 'status': 'partial'},
+        {**repo.get_donor('D1'), 'total_donations': 1, 'last_donation': date.today().isoformat()},
+        {'donation_id': 'DN-1', 'donor_id': 'D1', 'request_id': 'BR-1', 'units': 1,
+         'donation_date': f'{date.today().isoformat()} 10:00:00'},
+        assignment_status='accepted', fulfilled_units=0, donor_donations=0)
+    assert not repo.donor_eligibility('D1').can_donate_now
+    assert not repo.has_eligible_donor('O+')
+
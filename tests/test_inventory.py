@@ -0,0 +1,125 @@
+import random
+import threading
+
+import pytest
+
+from storage import ConflictError
+
+
+def make_request(repo, request_id='BR-1', units_needed=4, blood_group='B+'):
+    repo.put_request({'request_id': request_id, 'requestor_id': 'REQ-1', 'patient_name': 'Ravi',
+                      'blood_group': blood_group, 'units_needed': units_needed, 'fulfilled_units': 0,
+                      'urgency': 'normal', 'status': 'pending', 'created_at': '2026-06-01 08:00:00'})
+    return repo.get_request(request_id)
+
+
+def withdraw(repo, request_data, units, withdrawal_id='DN-W1'):
+    """The withdrawal route's write for request_data as it was read"""
+    fulfilled = request_data.get('fulfilled_units', 0)
+    repo.use_inventory(
+        {**request_data, 'fulfilled_units': fulfilled + units,
+         'inventory_used': request_data.get('inventory_used', 0) + units,
+         'status': 'fulfilled' if fulfilled + units >= request_data['units_needed'] else 'partial'},
+        {'donation_id': withdrawal_id, 'blood_group': request_data['blood_group'], 'units': units,
+         'donation_date': '2026-06-01 10:00:00', 'donation_type': 'inventory_withdrawal',
+         'request_id': request_data['request_id'], 'donor_id': 'INVENTORY', 'status': 'completed'},
+        units, fulfilled_units=fulfilled)
+
+
+def run_threads(count, target):
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def run(index):
+        barrier.wait()
+        try:
+            target(index)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_adjust_returns_the_level_and_floors_at_zero(repo):
+    assert repo.adjust_inventory('A-', 5) == 5
+    assert repo.adjust_inventory('A-', -3) == 2
+    assert repo.adjust_inventory('A-', -10) == 0
+    assert repo.inventory_units('A-') == 0
+    assert repo.adjust_inventory('A-', 4) == 4
+
+
+def test_withdrawal_writes_stock_request_and_record(repo):
+    repo.adjust_inventory('B+', 10)
+    withdraw(repo, make_request(repo), 3)
+    assert repo.inventory_units('B+') == 7
+    request_data = repo.get_request('BR-1')
+    assert (request_data['fulfilled_units'], request_data['inventory_used'], request_data['status']) == \
+        (3, 3, 'partial')
+    assert [d['donation_id'] for d in repo.donations_for_request('BR-1')] == ['DN-W1']
+    assert repo.count_requests_by_status('partial') == 1
+
+
+def test_withdrawal_beyond_the_stock_conflicts(repo):
+    repo.adjust_inventory('B+', 2)
+    with pytest.raises(ConflictError):
+        withdraw(repo, make_request(repo), 3)
+    assert repo.inventory_units('B+') == 2
+    assert repo.get_request('BR-1')['fulfilled_units'] == 0
+    assert repo.donations_for_request('BR-1') == []
+    assert repo.count_requests_by_status('pending') == 1
+
+
+def test_withdrawal_for_a_changed_request_conflicts(repo):
+    repo.adjust_inventory('B+', 10)
+    seen = make_request(repo)
+    withdraw(repo, seen, 1, 'DN-W1')
+    # A second click with the request as it was first read
+    with pytest.raises(ConflictError):
+        withdraw(repo, seen, 1, 'DN-W2')
+    assert repo.inventory_units('B+') == 9
+    assert repo.get_request('BR-1')['fulfilled_units'] == 1
+    assert [d['donation_id'] for d in repo.donations_for_request('BR-1')] == ['DN-W1']
+
+
+def test_concurrent_adjustments_lose_nothing(repo):
+    start = repo.adjust_inventory('O-', 1000)
+    rng = random.Random(3)
+    deltas = [[rng.choice((1, 2, 3, -1, -2, -3)) for _ in range(15)] for _ in range(8)]
+    run_threads(len(deltas), lambda i: [repo.adjust_inventory('O-', d) for d in deltas[i]])
+    assert repo.inventory_units('O-') == start + sum(map(sum, deltas))
+
+
+def test_concurrent_overdraft_ends_at_zero(repo):
+    repo.adjust_inventory('O-', 30)
+    levels = []
+    run_threads(8, lambda i: levels.extend(repo.adjust_inventory('O-', -1 - i % 3) for _ in range(5)))
+    # 8 x 5 withdrawals of 1-3 units ask for 75: whatever the order, the floor is hit
+    assert repo.inventory_units('O-') == 0
+    # The stock only goes down, so no two withdrawals can leave the same non-zero level
+    left = [level for level in levels if level > 0]
+    assert len(left) == len(set(left))
+
+
+def test_concurrent_withdrawals_never_overdraw(repo):
+    repo.adjust_inventory('B+', 5)
+    requests = [make_request(repo, f'BR-{i}', units_needed=1) for i in range(10)]
+    taken = []
+
+    def worker(i):
+        try:
+            withdraw(repo, requests[i], 1, f'DN-W{i}')
+            taken.append(i)
+        except ConflictError:
+            pass
+
+    run_threads(len(requests), worker)
+    assert len(taken) == 5
+    assert repo.inventory_units('B+') == 0
+    assert sorted(r['request_id'] for r in repo.list_requests() if r['status'] == 'fulfilled') == \
+        sorted(f'BR-{i}' for i in taken)
+    assert repo.count_requests_by_status('fulfilled') == 5
@@ -0,0 +1,97 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from matching import DonorColumns, RankedMatches
+
+TODAY = date(2026, 6, 1).toordinal()
+
+
+def days_ago(days, today=None):
+    today = date.fromordinal(TODAY) if today is None else today
+    return (today - timedelta(days=days)).isoformat()
+
+
+def donor(donor_id, blood_group='O+', age=30, total_donations=0, last_donation=None, available=True):
+    return {'donor_id': donor_id, 'name': donor_id, 'blood_group': blood_group, 'age': age,
+            'weight': 70, 'city': 'Pune', 'state': 'Maharashtra', 'pincode': '411001',
+            'available': available, 'status': 'active', 'total_donations': total_donations,
+            'last_donation': last_donation}
+
+
+def tied_donors(today=None):
+    """Registration order, with the expected rank order of the compatible ones"""
+    donors = [
+        donor('D1'),                                                          # 120
+        donor('D2', total_donations=5, last_donation=days_ago(100, today)),   # 125
+        donor('D3', total_donations=5, last_donation=days_ago(200, today)),   # 125, older donation
+        donor('D4', total_donations=5, last_donation=days_ago(100, today)),   # 125, registered after D2
+        donor('D5', age=50),                                                  # 110
+        donor('D6', blood_group='AB+', total_donations=10),                   # incompatible with O+
+        donor('D7', total_donations=10, available=False),                     # not available
+    ]
+    return donors, ['D2', 'D4', 'D3', 'D1', 'D5']
+
+
+def ranked(donors, recipient='O+'):
+    columns = DonorColumns(capacity=2)
+    for seq, d in enumerate(donors):
+        columns.put(d['donor_id'], d, seq)
+    return RankedMatches(columns, columns.candidate_rows(recipient), today=TODAY)
+
+
+def test_rank_by_score_then_recent_donation_then_registration():
+    donors, expected = tied_donors()
+    matches = ranked(donors)
+    assert len(matches) == len(expected)
+    assert [donor_id for donor_id, _, _ in matches] == expected
+    assert [score for _, score, _ in matches] == [125, 125, 125, 120, 110]
+
+
+def test_pages_continue_the_ranking():
+    donors, expected = tied_donors()
+    matches = ranked(donors)
+    assert [d for d, _, _ in matches.page(0, 2)] == expected[:2]
+    assert [d for d, _, _ in matches.page(2, 2)] == expected[2:4]
+    assert [d for d, _, _ in matches.page(4, 2)] == expected[4:]
+    assert matches.page(5, 2) == []
+
+
+def test_top_k_agrees_with_a_full_sort():
+    rng = np.random.default_rng(7)
+    donors = [donor(f'D{i}', age=int(rng.integers(18, 66)), total_donations=int(rng.integers(0, 15)),
+                    last_donation=days_ago(int(rng.integers(0, 400))) if rng.random() < 0.8 else None)
+              for i in range(300)]
+    matches = ranked(donors)
+    columns = matches.columns
+    full = sorted(range(len(matches)), key=lambda i: (-int(matches.scores[i]),
+                                                      -int(columns.last_day[matches.rows[i]]),
+                                                      int(columns.seq[matches.rows[i]])))
+    expected = [columns.ids[matches.rows[i]] for i in full]
+    for k in (1, 10, 37):
+        assert [d for d, _, _ in ranked(donors).page(0, k)] == expected[:k]
+    assert [d for d, _, _ in matches] == expected
+
+
+def test_paging_a_stale_match_fails():
+    donors, _ = tied_donors()
+    matches = ranked(donors)
+    matches.columns.remove('D1')
+    with pytest.raises(RuntimeError):
+        matches.page(0, 2)
+
+
+def test_can_donate_now_follows_the_donation_gap():
+    matches = ranked([donor('RECENT', last_donation=days_ago(10)), donor('DUE', last_donation=days_ago(56))])
+    assert {d: can for d, _, can in matches} == {'RECENT': False, 'DUE': True}
+
+
+def test_repository_ranking(repo):
+    donors, expected = tied_donors(today=date.today())
+    for d in donors:
+        repo.put_donor(d)
+    assert [d for d, _, _ in repo.rank_donors('O+').page(0, 10)] == expected
+    assert [d for d, _, _ in repo.rank_donors('O+').page(1, 2)] == expected[1:3]
+    assert [d for d, _, _ in repo.rank_donors('O+', 'pune').page(0, 10)] == expected
+    assert repo.rank_donors('O+', 'Delhi').page(0, 10) == []